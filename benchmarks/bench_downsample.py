@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+描画前の間引き（LTTB）のベンチマーク（描画時間・PNG サイズ・見た目の差）
+
+- 合成の Ranked History（5k / 50k / 200k 試合、シーズン切替は多くても 8 回程度）を
+  間引きなし（downsample=0）と自動（downsample=None = 軸の横幅ピクセル数）で描いて比較
+- 描画は plot_rank_history（fast_layout=True。レイアウトが固定なので2枚の画素がそのまま比べられる）
+- 見た目の差: 2枚の PNG を画素ごとに比べ、どれかのチャネルが --tolerance を超えて違う画素の割合
+  （「線が描かれている画素」に対する割合も出す。間引きで消えた山・谷はここに出る）
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_downsample.py --out downsample.json
+  python benchmarks/bench_downsample.py --sizes 50000 --repeat 5 --keep-png dist/ds
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.image as mpimg  # noqa: E402
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import compare  # noqa: E402
+from sfbuff_mock_server import rank_points  # noqa: E402
+from sfbuff_rank_history import plot_rank_history  # noqa: E402
+
+SIZES = (5_000, 50_000, 200_000)
+STAMP = "2025-01-01 00:00:00 JST"  # 画素比較のため生成日時は固定
+
+
+def render(data: List[dict], out_path: str, downsample: Optional[int]) -> float:
+    t0 = time.perf_counter()
+    plot_rank_history(data, [50], out_path, ema_windows=[200], title="bench",
+                      generated_at_str=STAMP, fast_layout=True, downsample=downsample)
+    return time.perf_counter() - t0
+
+
+def pixel_diff(path_a: str, path_b: str, tolerance: float) -> Dict[str, float]:
+    a = mpimg.imread(path_a)[..., :3]
+    b = mpimg.imread(path_b)[..., :3]
+    if a.shape != b.shape:
+        return {"diff_ratio": 1.0, "diff_of_ink": 1.0}
+    diff = np.abs(a - b).max(axis=2) > tolerance
+    ink = (a.min(axis=2) < 0.95) | (b.min(axis=2) < 0.95)  # 白以外（線・文字）のある画素
+    return {
+        "diff_ratio": round(float(diff.mean()), 5),
+        "diff_of_ink": round(float(diff.sum() / max(1, ink.sum())), 5),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="描画前の間引き（LTTB）のベンチマーク")
+    ap.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="試合数（複数可）")
+    ap.add_argument("--repeat", type=int, default=3, help="各ケースの計測回数（デフォルト:3）")
+    ap.add_argument("--tolerance", type=float, default=0.1, help="画素の差とみなすチャネル差（0..1、デフォルト:0.1）")
+    ap.add_argument("--keep-png", help="比較した PNG を残すディレクトリ")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+
+    out_dir = args.keep_png or tempfile.mkdtemp(prefix="sfbuff_ds_")
+    os.makedirs(out_dir, exist_ok=True)
+
+    results: Dict[str, Dict[str, object]] = {}
+    for n in args.sizes:
+        data = [{"d": p["x"], "r": p["y"]} for p in rank_points(n, seed=n, season_every=max(2000, n // 8))]
+        paths = {}
+        for mode, ds in (("full", 0), ("auto", None)):
+            path = paths[mode] = os.path.join(out_dir, f"rank_{n}_{mode}.png")
+            render(data, path, ds)  # warmup
+            times = [render(data, path, ds) for _ in range(args.repeat)]
+            results[f"render:{n}:{mode}"] = {
+                "median": statistics.median(times),
+                "best": min(times),
+                "n": args.repeat,
+                "png_bytes": os.path.getsize(path),
+            }
+        parity = pixel_diff(paths["full"], paths["auto"], args.tolerance)
+        full, auto = results[f"render:{n}:full"], results[f"render:{n}:auto"]
+        auto.update(parity)
+        auto["speedup"] = round(full["median"] / auto["median"], 2)
+        print(f"{n:>8} matches  full {full['median'] * 1000:>8.1f} ms {full['png_bytes'] / 1024:>7.1f} KiB   "
+              f"auto {auto['median'] * 1000:>8.1f} ms {auto['png_bytes'] / 1024:>7.1f} KiB   "
+              f"x{auto['speedup']:<5}  diff {parity['diff_ratio'] * 100:.2f}% of pixels, "
+              f"{parity['diff_of_ink'] * 100:.2f}% of ink", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "matplotlib": matplotlib.__version__,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
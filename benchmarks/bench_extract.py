@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+抽出バックエンドのベンチマーク（fast vs bs4）
+
+- 保存済みページ（--dump-html 等で保存したもの）を引数で渡すとそれを計測
+- 引数なしなら合成ページ（Ranked History: 100 / 5k / 50k 点、Matchup: 30 相手 × C/M）を生成して計測
+- 各バックエンドの結果が一致することも確認する
+
+使い方:
+  python benchmarks/bench_extract.py
+  python benchmarks/bench_extract.py dist/page1.html dist/page2.html --repeat 5
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List, Tuple
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sfbuff_extract import extract_chart, extract_matchup_frame  # noqa: E402
+from sfbuff_matchup_chart import parse_matchup_table  # noqa: E402
+from sfbuff_mock_server import matchup_chart_page, rank_history_page  # noqa: E402
+
+
+# ---------------- 計測 ----------------
+def _best(fn: Callable[[], object], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def bench_page(name: str, page: str, repeat: int) -> None:
+    size_kb = len(page) / 1024
+    if "data-chartjs-data-value" in page:
+        fast = extract_chart(page, "fast")
+        slow = extract_chart(page, "bs4")
+        assert fast == slow, f"{name}: fast と bs4 の結果が一致しません"
+        t_fast = _best(lambda: extract_chart(page, "fast"), repeat)
+        t_slow = _best(lambda: extract_chart(page, "bs4"), repeat)
+        _report(name, "chart", size_kb, t_fast, t_slow)
+    if "matchups-matchup-chart" in page:
+        fast = parse_matchup_table(extract_matchup_frame(page, "fast"))
+        slow = parse_matchup_table(page)
+        assert fast == slow, f"{name}: fast と bs4 の表パース結果が一致しません"
+        t_fast = _best(lambda: parse_matchup_table(extract_matchup_frame(page, "fast")), repeat)
+        t_slow = _best(lambda: parse_matchup_table(page), repeat)
+        _report(name, "table", size_kb, t_fast, t_slow)
+
+
+def _report(name: str, kind: str, size_kb: float, t_fast: float, t_slow: float) -> None:
+    print(f"{name:<24} {kind:<6} {size_kb:>9.1f} KB  bs4 {t_slow * 1000:>9.2f} ms  "
+          f"fast {t_fast * 1000:>8.2f} ms  x{t_slow / t_fast:>6.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="抽出バックエンドのベンチマーク")
+    ap.add_argument("pages", nargs="*", help="保存済み HTML（省略時は合成ページ）")
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    pages: List[Tuple[str, str]] = []
+    for path in args.pages:
+        with open(path, "r", encoding="utf-8") as f:
+            pages.append((os.path.basename(path), f.read()))
+    if not pages:
+        pages = [(f"rank_{n}", rank_history_page(n)) for n in (100, 5_000, 50_000)]
+        pages.append(("matchup_30x2", matchup_chart_page(30)))
+
+    for name, page in pages:
+        bench_page(name, page, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
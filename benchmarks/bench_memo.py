@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+段階ごとのメモ化（sfbuff_memo）のベンチマーク: ロスター全員の描き直し
+
+- 合成の Ranked History を --players 人分（1人 --points 試合）JSON で用意し、sfbuff_render_batch.render_batch を
+  同じ --memo-dir で続けて呼ぶ
+  * cold: メモが空（全員描く）
+  * refresh: 入力もオプションも同じ（全員コピーだけ。これが「誰も対戦していない日の再生成」）
+  * changed: --changed 人だけ1試合増やす（その人だけ描く）
+  * restyle: 描画オプションだけ変える（全員描き直すが、平滑化はメモから読む。平滑化のヒットはワーカー側なので数は出さない）
+- refresh の PNG が cold と同じバイト列であることも確かめる
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_memo.py --out memo.json
+  python benchmarks/bench_memo.py --players 200 --points 5000 --workers 4
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import compare  # noqa: E402
+from sfbuff_mock_server import rank_points  # noqa: E402
+from sfbuff_render_batch import render_batch  # noqa: E402
+
+OPTS = {
+    "ma_windows": [50],
+    "ema_windows": [20],
+    "hide_raw": False,
+    "season_threshold": 40.0,
+    "generated_at_str": "2025-01-01 00:00:00 JST",
+    "hide_xaxis": False,
+    "downsample": None,
+}
+
+
+def write_inputs(in_dir: str, players: int, points: int) -> None:
+    os.makedirs(in_dir, exist_ok=True)
+    for i in range(players):
+        data = [{"d": p["x"], "r": p["y"]} for p in rank_points(points, seed=i)]
+        with open(os.path.join(in_dir, f"p{i:05d}.json"), "w", encoding="utf-8") as f:
+            json.dump(data, f)
+
+
+def add_match(path: str) -> None:
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.append({"d": data[-1]["d"] + 600_000, "r": data[-1]["r"] + 7})
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+
+
+def read_all(out_dir: str) -> Dict[str, bytes]:
+    out = {}
+    for p in sorted(glob.glob(os.path.join(out_dir, "*.png"))):
+        with open(p, "rb") as f:
+            out[os.path.basename(p)] = f.read()
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="段階ごとのメモ化（sfbuff_memo）のベンチマーク")
+    ap.add_argument("--players", type=int, default=1000, help="人数（デフォルト:1000）")
+    ap.add_argument("--points", type=int, default=2000, help="1人あたりの試合数（デフォルト:2000）")
+    ap.add_argument("--changed", type=int, default=10, help="changed で1試合増やす人数（デフォルト:10）")
+    ap.add_argument("--workers", type=int, default=None, help="描画のプロセス数（デフォルト: CPU 数）")
+    ap.add_argument("--keep", help="入力・PNG・メモを残すディレクトリ")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+
+    root = args.keep or tempfile.mkdtemp(prefix="sfbuff_memo_")
+    in_dir, out_dir, memo_dir = (os.path.join(root, d) for d in ("in", "png", "memo"))
+    for d in (out_dir, memo_dir):
+        shutil.rmtree(d, ignore_errors=True)
+    write_inputs(in_dir, args.players, args.points)
+    inputs = sorted(glob.glob(os.path.join(in_dir, "*.json")))
+
+    def run(name: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+        stats = render_batch(inputs, out_dir, opts, workers=args.workers, memo_dir=memo_dir)
+        r = {"median": stats["elapsed"], "best": stats["elapsed"], "n": 1,
+             "rendered": stats["rendered"], "reused": stats["reused"], "errors": len(stats["errors"])}
+        print(f"{name:<8} {stats['elapsed']:>8.2f}s  rendered={stats['rendered']:<5} reused={stats['reused']}",
+              file=sys.stderr)
+        return r
+
+    results: Dict[str, Dict[str, Any]] = {}
+    results["cold"] = run("cold", OPTS)
+    cold_png = read_all(out_dir)
+    results["refresh"] = run("refresh", OPTS)
+    same_png = read_all(out_dir) == cold_png
+    for path in inputs[:args.changed]:
+        add_match(path)
+    results["changed"] = run("changed", OPTS)
+    results["restyle"] = run("restyle", dict(OPTS, hide_raw=True))
+    print(f"refresh output identical to cold: {same_png}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "players": args.players,
+            "points": args.points,
+            "changed": args.changed,
+            "workers": args.workers,
+        },
+        "parity": {"refresh_png_identical": same_png},
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+    if not args.keep:
+        shutil.rmtree(root, ignore_errors=True)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+軽量描画（sfbuff_native_chart）と matplotlib 経路のベンチマーク
+
+- 1枚あたりの描画時間: 合成の Ranked History（--sizes 試合ずつ）を同じプロセスで続けて描く（import 済み）
+    * matplotlib: plot_rank_history(fast_layout=True)（--plot と同じ。PNG）
+    * native:png / native:svg: render_native
+- 起動込みの時間: 小さな履歴（--startup-points 試合）を1枚描くだけのプロセスを別に起動し、終了までを計測
+  （インタプリタ起動 + import + 描画。サムネイルを1枚ずつ作る使い方に相当）。
+  そのプロセスで matplotlib / NumPy が読み込まれたかも記録する
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_native.py --out native.json
+  python benchmarks/bench_native.py --sizes 500 --sizes 50000 --repeat 10
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from bench_suite import compare  # noqa: E402
+from sfbuff_mock_server import rank_points  # noqa: E402
+
+OPTS = {
+    "ma_windows": [50],
+    "ema_windows": [20],
+    "season_threshold": 40.0,
+    "generated_at_str": "2025-01-01 00:00:00 JST",
+}
+
+# 起動込みの計測で子プロセスに実行させるコード（{renderer} / {out} / {points} を埋める）
+STARTUP_CODE = """
+import sys
+from sfbuff_mock_server import rank_points
+data = [{{"d": p["x"], "r": p["y"]}} for p in rank_points({points}, seed=0)]
+opts = dict(ma_windows=[50], ema_windows=[20], generated_at_str="2025-01-01 00:00:00 JST")
+if "{renderer}" == "matplotlib":
+    from sfbuff_rank_history import plot_rank_history
+    plot_rank_history(data, out_path={out!r}, fast_layout=True, **opts)
+else:
+    from sfbuff_native_chart import render_native
+    render_native(data, out_path={out!r}, **opts)
+print(",".join(m for m in ("matplotlib", "numpy") if m in sys.modules), file=sys.stderr)
+"""
+
+
+def make_data(points: int) -> List[dict]:
+    return [{"d": p["x"], "r": p["y"]} for p in rank_points(points, seed=0)]
+
+
+def timeit(fn: Callable[[], Any], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"median": statistics.median(times), "best": min(times), "n": repeat}
+
+
+# ---------------- 1枚あたり ----------------
+def bench_per_chart(sizes: List[int], repeat: int, tmp: str) -> Dict[str, Dict[str, Any]]:
+    import matplotlib
+    matplotlib.use("Agg")
+    from sfbuff_native_chart import render_native
+    from sfbuff_rank_history import plot_rank_history
+
+    results: Dict[str, Dict[str, Any]] = {}
+    for n in sizes:
+        data = make_data(n)
+        cases = {
+            "matplotlib": (lambda p: plot_rank_history(data, out_path=p, fast_layout=True, **OPTS), ".png"),
+            "native:png": (lambda p: render_native(data, out_path=p, **OPTS), ".png"),
+            "native:svg": (lambda p: render_native(data, out_path=p, **OPTS), ".svg"),
+        }
+        for name, (fn, ext) in cases.items():
+            path = os.path.join(tmp, f"{name.replace(':', '_')}_{n}{ext}")
+            res = timeit(lambda: fn(path), repeat)
+            res["bytes"] = os.path.getsize(path)
+            results[f"chart:{name}:{n}"] = res
+            print(f"chart:{name:<12} {n:>7} pts {res['median'] * 1000:>9.1f} ms  {res['bytes']:>9} bytes",
+                  file=sys.stderr)
+    return results
+
+
+# ---------------- 起動込み ----------------
+def bench_startup(points: int, repeat: int, tmp: str) -> Dict[str, Dict[str, Any]]:
+    env = dict(os.environ, MPLBACKEND="Agg", PYTHONDONTWRITEBYTECODE="1")
+    results: Dict[str, Dict[str, Any]] = {}
+    for renderer, ext in (("matplotlib", ".png"), ("native", ".png"), ("native", ".svg")):
+        name = f"startup:{renderer}:{ext[1:]}"
+        code = STARTUP_CODE.format(renderer=renderer, out=os.path.join(tmp, f"startup_{renderer}{ext}"),
+                                   points=points)
+        loaded: List[str] = []
+
+        def run() -> None:
+            proc = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+            if proc.returncode != 0:
+                raise RuntimeError(f"{name} が失敗しました:\n{proc.stderr[-2000:]}")
+            lines = proc.stderr.strip().splitlines()
+            loaded[:] = [m for m in lines[-1].split(",") if m] if lines else []
+
+        res = timeit(run, repeat)
+        res["heavy"] = loaded
+        results[name] = res
+        print(f"{name:<24} {res['median'] * 1000:>9.1f} ms   heavy: {','.join(loaded) or '-'}", file=sys.stderr)
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description="軽量描画（sfbuff_native_chart）と matplotlib 経路のベンチマーク")
+    ap.add_argument("--sizes", type=int, action="append", default=[],
+                    help="1枚あたりの計測に使う試合数。複数指定可（デフォルト: 500, 5000, 50000）")
+    ap.add_argument("--repeat", type=int, default=5, help="各ケースの計測回数（デフォルト:5）")
+    ap.add_argument("--startup-points", type=int, default=200, help="起動込みの計測で描く試合数（デフォルト:200）")
+    ap.add_argument("--only", choices=["chart", "startup"], help="片方だけ実行")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+    sizes = args.sizes or [500, 5000, 50000]
+
+    tmp = tempfile.mkdtemp(prefix="sfbuff_native_")
+    results: Dict[str, Dict[str, Any]] = {}
+    if args.only != "startup":
+        results.update(bench_per_chart(sizes, args.repeat, tmp))
+    if args.only != "chart":
+        results.update(bench_startup(args.startup_points, args.repeat, tmp))
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "startup_points": args.startup_points,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Matchup の行表現のベンチマーク（dict 1つ / 行 と MatchupRow の比較）
+
+- 合成の行: ページ数 × 30 相手 × C/M（1ページ 60 行）。相手名は行ごとに新しい文字列で作る（表パーサの get_text と同じ状況）
+- メモリ: 全ページ分の行を保持したときの tracemalloc の増分（合計と1行あたり）
+- 時間: 行の生成 / merge_inputs（ページごと）/ save_csv / json.dumps / parse_matchup_table（合成ページ）
+- dict 側は従来の実装（行 = dict、merge も dict を返す）をこのファイル内に再現して比べる
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_rows.py --out rows.json
+  python benchmarks/bench_rows.py --pages 20000 --repeat 1
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from bench_suite import compare  # noqa: E402
+from sfbuff_core import merge_inputs  # noqa: E402
+from sfbuff_matchup_chart import parse_matchup_table, save_csv  # noqa: E402
+from sfbuff_mock_server import matchup_chart_page, matchup_rows  # noqa: E402
+from sfbuff_rows import MatchupRow, row_json_default  # noqa: E402
+from sfbuff_stream import MATCHUP_FIELDS, matchup_records, stream_records  # noqa: E402
+
+OPPONENTS = 30
+
+
+# ---------------- 合成データ ----------------
+def page_values(n_pages: int) -> List[List[tuple]]:
+    """ページごとの行の値（相手名は後で行ごとに複製する）。"""
+    base = matchup_rows(OPPONENTS, seed=1)
+    pages = []
+    for p in range(n_pages):
+        rows = []
+        for r in base:
+            t = r["total"] + 3 + p % 7
+            w = r["wins"] + p % 3
+            rows.append((r["opponent"], r["control"], t, w, t - w, 0, w - (t - w), round(w / t * 100, 1)))
+        pages.append(rows)
+    return pages
+
+
+def _fresh(s: str) -> str:
+    return "".join(list(s))  # 新しい str オブジェクト（パーサが行ごとに作るのと同じ）
+
+
+def build_dicts(pages: List[List[tuple]]) -> List[List[Dict[str, Any]]]:
+    return [[{"opponent": _fresh(o), "control": _fresh(c), "total": t, "wins": w, "losses": l, "draws": d,
+              "diff": df, "win_rate": wr} for o, c, t, w, l, d, df, wr in rows] for rows in pages]
+
+
+def build_rows(pages: List[List[tuple]]) -> List[List[MatchupRow]]:
+    return [[MatchupRow(_fresh(o), _fresh(c), t, w, l, d, df, wr) for o, c, t, w, l, d, df, wr in rows]
+            for rows in pages]
+
+
+def merge_dicts(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """従来の merge_inputs（dict を返す版）。"""
+    buckets: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        opp = r.get("opponent") or ""
+        b = buckets.setdefault(opp, {"opponent": opp, "total": 0, "wins": 0, "losses": 0, "draws": 0})
+        for k in ("total", "wins", "losses", "draws"):
+            v = r.get(k)
+            if isinstance(v, int):
+                b[k] = (b[k] or 0) + v
+    out = []
+    for opp, b in buckets.items():
+        total, wins, losses, draws = b["total"], b["wins"], b["losses"], b["draws"]
+        win_rate = (wins / total * 100.0) if total > 0 else None
+        out.append({"opponent": opp, "total": total, "wins": wins, "losses": losses, "draws": draws,
+                    "diff": wins - losses, "win_rate": round(win_rate, 2) if win_rate is not None else None})
+    out.sort(key=lambda x: x["opponent"])
+    return out
+
+
+# ---------------- 計測 ----------------
+def held_bytes(build: Callable[[], Any]) -> int:
+    """build() の結果を保持したままの tracemalloc の増分。"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del obj
+    return after - before
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict[str, float]:
+    fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"median": statistics.median(times), "best": min(times), "n": repeat}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Matchup の行表現（dict / MatchupRow）のベンチマーク")
+    ap.add_argument("--pages", type=int, default=5000, help="ページ数（1ページ = 30相手 × C/M）")
+    ap.add_argument("--repeat", type=int, default=3, help="各ケースの計測回数（デフォルト:3）")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+
+    pages = page_values(args.pages)
+    n_rows = sum(len(p) for p in pages)
+    tmp = tempfile.mkdtemp(prefix="sfbuff_rows_")
+    dict_pages = build_dicts(pages)
+    row_pages = build_rows(pages)
+    flat_dicts = [r for p in dict_pages for r in p]
+    flat_rows = [r for p in row_pages for r in p]
+    html_text = matchup_chart_page(OPPONENTS, seed=1)
+
+    memory = {
+        "dict": held_bytes(lambda: build_dicts(pages)),
+        "row": held_bytes(lambda: build_rows(pages)),
+    }
+    for kind, b in memory.items():
+        print(f"memory:{kind:<6} {b / 1024 / 1024:>9.1f} MiB  {b / n_rows:>7.1f} B/row  ({n_rows} rows)",
+              file=sys.stderr)
+
+    cases = [
+        ("build:dict", lambda: build_dicts(pages)),
+        ("build:row", lambda: build_rows(pages)),
+        ("merge:dict", lambda: [merge_dicts(p) for p in dict_pages]),
+        ("merge:row", lambda: [merge_inputs(p) for p in row_pages]),
+        ("save_csv:dict", lambda: save_csv(flat_dicts, os.path.join(tmp, "dict.csv"))),
+        ("save_csv:row", lambda: save_csv(flat_rows, os.path.join(tmp, "row.csv"))),
+        ("json:dict", lambda: json.dumps(flat_dicts, ensure_ascii=False)),
+        ("json:row", lambda: json.dumps(flat_rows, ensure_ascii=False, default=row_json_default)),
+        ("jsonl:dict", lambda: stream_records(os.devnull, MATCHUP_FIELDS, "jsonl",
+                                              matchup_records({}, flat_dicts), flush_every=1000)),
+        ("jsonl:row", lambda: stream_records(os.devnull, MATCHUP_FIELDS, "jsonl",
+                                             matchup_records({}, flat_rows), flush_every=1000)),
+        ("parse_matchup_table", lambda: parse_matchup_table(html_text)),
+    ]
+    results: Dict[str, Dict[str, Any]] = {}
+    for name, fn in cases:
+        results[name] = measure(fn, args.repeat)
+        print(f"{name:<24} {results[name]['median'] * 1000:>10.2f} ms", file=sys.stderr)
+
+    # 同じ内容になっていること（CSV はバイト単位で一致）
+    with open(os.path.join(tmp, "dict.csv"), "rb") as a, open(os.path.join(tmp, "row.csv"), "rb") as b:
+        same_csv = a.read() == b.read()
+    same_merge = all(merge_dicts(d) == merge_inputs(r) for d, r in zip(dict_pages[:100], row_pages[:100]))
+    print(f"parity: csv={same_csv} merge={same_merge}", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "pages": args.pages,
+            "rows": n_rows,
+        },
+        "memory_bytes": memory,
+        "parity": {"csv": same_csv, "merge": same_merge},
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+起動時間のベンチマーク（インタプリタ起動＋import のコストを経路ごとに計測）
+
+- 各ケースを別プロセスで実行し、終了までの時間（中央値 / 最小）を計測
+    * python -c pass（インタプリタだけ）/ import sfbuff_core
+    * --help（rank / matchup）
+    * JSON のみ（rank / matchup。ローカルサーバのページを取得して stdout へ）
+    * --plot（rank。matplotlib / NumPy まで読み込む経路）
+- 各ケースを1回 -X importtime 付きでも実行し、import の合計時間と読み込まれた重い依存
+  （requests / bs4 / lxml / numpy / matplotlib）を記録
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_startup.py --out startup.json
+  python benchmarks/bench_startup.py --baseline startup.json --threshold 0.25
+  python benchmarks/bench_startup.py --only help --repeat 20
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+
+from bench_suite import compare, serve_pages  # noqa: E402
+from sfbuff_mock_server import matchup_chart_page, rank_history_page  # noqa: E402
+
+HEAVY_MODULES = ("requests", "bs4", "lxml", "numpy", "matplotlib")
+
+
+# ---------------- ケース ----------------
+def build_cases(base_url: str, out_png: str) -> List[Tuple[str, List[str]]]:
+    py = [sys.executable]
+    rank = py + [os.path.join(ROOT, "sfbuff_rank_history.py")]
+    matchup = py + [os.path.join(ROOT, "sfbuff_matchup_chart.py")]
+    return [
+        ("python:pass", py + ["-c", "pass"]),
+        ("import:sfbuff_core", py + ["-c", "import sfbuff_core"]),
+        ("rank:--help", rank + ["--help"]),
+        ("matchup:--help", matchup + ["--help"]),
+        ("rank:json", rank + ["1", "-c", "5", "--base-url", base_url]),
+        ("matchup:json", matchup + ["1", "-c", "5", "--base-url", base_url]),
+        ("rank:--plot", rank + ["1", "-c", "5", "--base-url", base_url, "--plot", "--ma", "50", "--out", out_png]),
+    ]
+
+
+# ---------------- 計測 ----------------
+def _run(cmd: List[str], env: Dict[str, str]) -> subprocess.CompletedProcess:
+    proc = subprocess.run(cmd, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"{' '.join(cmd)} が失敗しました:\n{proc.stderr[-2000:]}")
+    return proc
+
+
+def measure(cmd: List[str], env: Dict[str, str], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        _run(cmd, env)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        _run(cmd, env)
+        times.append(time.perf_counter() - t0)
+    return {"median": statistics.median(times), "best": min(times), "n": repeat}
+
+
+def import_profile(cmd: List[str], env: Dict[str, str]) -> Dict[str, object]:
+    """-X importtime の出力から import の合計時間（ms）と読み込まれた重い依存を拾う。"""
+    proc = _run(cmd[:1] + ["-X", "importtime"] + cmd[1:], env)
+    total_us = 0
+    loaded = set()
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # ヘッダ行
+        name = parts[2].rstrip()
+        if not name.startswith("  "):
+            total_us += int(parts[1])  # 最上位の import だけ足す（累積値なので子は含まれている）
+        top = name.strip().split(".", 1)[0]
+        if top in HEAVY_MODULES:
+            loaded.add(top)
+    return {"import_ms": round(total_us / 1000.0, 2), "heavy": sorted(loaded)}
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SFBuff スクリプトの起動時間ベンチマーク")
+    ap.add_argument("--repeat", type=int, default=10, help="各ケースの計測回数（デフォルト:10）")
+    ap.add_argument("--only", help="ケース名にこの文字列を含むものだけ実行")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+
+    _, base = serve_pages({
+        "/fighters/1/ranked_history": rank_history_page(2_000),
+        "/fighters/1/matchup_chart": matchup_chart_page(30),
+    })
+    env = dict(os.environ, MPLBACKEND="Agg", PYTHONDONTWRITEBYTECODE="1")
+    out_png = os.path.join(tempfile.mkdtemp(prefix="sfbuff_startup_"), "plot.png")
+
+    results: Dict[str, Dict[str, object]] = {}
+    for name, cmd in build_cases(base, out_png):
+        if args.only and args.only not in name:
+            continue
+        res = measure(cmd, env, args.repeat)
+        res.update(import_profile(cmd, env))
+        results[name] = res
+        heavy = ",".join(res["heavy"]) or "-"
+        print(f"{name:<24} {res['median'] * 1000:>9.1f} ms   import {res['import_ms']:>8.1f} ms   heavy: {heavy}",
+              file=sys.stderr)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
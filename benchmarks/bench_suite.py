@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+オフライン・ベンチマークスイート（取得 / パース / 集計 / 平滑化 / 描画）
+
+- 合成ページ（sfbuff_mock_server のページ生成）をサイズ別に生成:
+    Ranked History 100 / 5k / 50k 試合、Matchup 1 / 30 相手 × C/M
+- --fixtures DIR を渡すと、保存済みの実ページ（ranked_history*.html / matchup_chart*.html）も対象に追加
+- scrape_rank_history はローカルの HTTP サーバ相手に計測（ネットワーク不要）
+- 結果は JSON（--out）。--baseline で前回結果と比較し、--threshold を超えて遅くなったら終了コード 1
+
+使い方:
+  python benchmarks/bench_suite.py --out bench.json
+  python benchmarks/bench_suite.py --baseline bench.json --threshold 0.25
+  python benchmarks/bench_suite.py --only parse_matchup_table --repeat 10
+"""
+
+import argparse
+import glob
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import sfbuff_matchup_chart as mc  # noqa: E402
+import sfbuff_rank_history as rh  # noqa: E402
+from sfbuff_extract import extract_chart  # noqa: E402
+from sfbuff_rolling import detect_seasons, rolling_stats  # noqa: E402
+from sfbuff_mock_server import matchup_chart_only_page, matchup_chart_page, rank_history_page  # noqa: E402
+
+RANK_SIZES = (100, 5_000, 50_000)
+MATCHUP_SIZES = (1, 30)
+
+
+# ---------------- ローカルサーバ ----------------
+class _PageHandler(BaseHTTPRequestHandler):
+    pages: Dict[str, bytes] = {}
+
+    def do_GET(self):
+        body = self.pages.get(self.path.split("?", 1)[0])
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def serve_pages(pages: Dict[str, str]) -> Tuple[ThreadingHTTPServer, str]:
+    """path → HTML を返すだけのサーバを別スレッドで起動。(server, base_url) を返す。"""
+    handler = type("Handler", (_PageHandler,), {"pages": {k: v.encode("utf-8") for k, v in pages.items()}})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+# ---------------- 計測 ----------------
+def measure(fn: Callable[[], object], repeat: int, warmup: int = 1) -> Dict[str, float]:
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return {"median": statistics.median(times), "best": min(times), "n": repeat}
+
+
+def _load_fixtures(fixtures_dir: Optional[str]) -> Tuple[Dict[str, str], Dict[str, str]]:
+    rank, matchup = {}, {}
+    if not fixtures_dir:
+        return rank, matchup
+    for path in sorted(glob.glob(os.path.join(fixtures_dir, "*.html"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+        if name.startswith("ranked_history"):
+            rank[f"recorded:{name}"] = text
+        elif name.startswith("matchup_chart"):
+            matchup[f"recorded:{name}"] = text
+    return rank, matchup
+
+
+def build_cases(fixtures_dir: Optional[str]) -> List[Tuple[str, Callable[[], object]]]:
+    cases: List[Tuple[str, Callable[[], object]]] = []
+
+    rank_pages = {f"synthetic:{n}": rank_history_page(n) for n in RANK_SIZES}
+    matchup_pages = {f"synthetic:{n}x2": matchup_chart_page(n) for n in MATCHUP_SIZES}
+    rec_rank, rec_matchup = _load_fixtures(fixtures_dir)
+    rank_pages.update(rec_rank)
+    matchup_pages.update(rec_matchup)
+
+    # --- fetch: scrape_rank_history（ローカルサーバ経由） ---
+    paths = {f"/fighters/{i}/ranked_history": page for i, page in enumerate(rank_pages.values())}
+    _, base = serve_pages(paths)
+    sess = rh.new_session()
+    for (name, _page), path in zip(rank_pages.items(), paths):
+        url = base + path
+        cases.append((f"scrape_rank_history[{name}]", lambda url=url: rh.scrape_rank_history(url, session=sess)))
+
+    # --- parse: parse_matchup_table / fetch_chart_json ---
+    for name, page in matchup_pages.items():
+        cases.append((f"parse_matchup_table[{name}]", lambda page=page: mc.parse_matchup_table(page)))
+    for n in MATCHUP_SIZES:
+        page = matchup_chart_only_page(n)
+        cases.append((f"fetch_chart_json[synthetic:{n}]", lambda page=page: mc.fetch_chart_json(page)))
+
+    # --- aggregate: merge_inputs ---
+    for name, page in matchup_pages.items():
+        rows = mc.parse_matchup_table(page)
+        cases.append((f"merge_inputs[{name}]", lambda rows=rows: mc.merge_inputs(rows)))
+
+    # --- smooth: moving_average / exponential_moving_average ---
+    series_by_size = {}
+    for name, page in rank_pages.items():
+        chart = extract_chart(page)
+        ds = chart["data"]["datasets"][0]["data"]
+        series_by_size[name] = [float(p["y"]) for p in ds if p.get("y") is not None]
+    for name, ys in series_by_size.items():
+        cases.append((f"moving_average[{name},n=50]", lambda ys=ys: rh.moving_average(ys, 50)))
+        cases.append((f"exponential_moving_average[{name},n=50]",
+                      lambda ys=ys: rh.exponential_moving_average(ys, 50)))
+        arr = np.asarray(ys)
+        cases.append((f"rolling_stats[{name},ma=10/50/200,ema=20/100]",
+                      lambda arr=arr: rolling_stats(arr, detect_seasons(arr, 40.0), [10, 50, 200], [20, 100])))
+
+    # --- render: plot_rank_history ---
+    import matplotlib
+    matplotlib.use("Agg")
+    out_dir = tempfile.mkdtemp(prefix="sfbuff_bench_")
+    for name, page in rank_pages.items():
+        data = [{"d": p["x"], "r": p["y"]}
+                for p in extract_chart(page)["data"]["datasets"][0]["data"] if p.get("y") is not None]
+        out = os.path.join(out_dir, "plot.png")
+        cases.append((f"plot_rank_history[{name}]",
+                       lambda data=data, out=out: rh.plot_rank_history(data, [50], out, ema_windows=[20],
+                                                                       generated_at_str="bench")))
+    return cases
+
+
+# ---------------- 比較 ----------------
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]],
+            threshold: float) -> List[str]:
+    """baseline より median が threshold（割合）以上遅くなったケースを列挙。"""
+    regressions = []
+    for name, cur in results.items():
+        old = baseline.get(name)
+        if not old or not old.get("median"):
+            continue
+        ratio = cur["median"] / old["median"]
+        if ratio > 1.0 + threshold:
+            regressions.append(f"{name}: {old['median'] * 1000:.2f} ms -> {cur['median'] * 1000:.2f} ms (x{ratio:.2f})")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="SFBuff スクレイパのオフライン・ベンチマーク")
+    ap.add_argument("--repeat", type=int, default=5, help="各ケースの計測回数（デフォルト:5）")
+    ap.add_argument("--only", help="ケース名にこの文字列を含むものだけ実行")
+    ap.add_argument("--fixtures", help="保存済みの実ページ(*.html)を置いたディレクトリ")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--baseline", help="比較対象の結果 JSON")
+    ap.add_argument("--threshold", type=float, default=0.20, help="許容する悪化率（デフォルト:0.20 = 20%%）")
+    args = ap.parse_args()
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, fn in build_cases(args.fixtures):
+        if args.only and args.only not in name:
+            continue
+        results[name] = measure(fn, args.repeat)
+        print(f"{name:<64} {results[name]['median'] * 1000:>10.2f} ms", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+    else:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get("results", {})
+        regressions = compare(results, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
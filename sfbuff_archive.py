@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History の列指向アーカイブ（memmap で読む）
+
+ディレクトリ構成:
+  index.json                    … キー → {"gen", "count", "rating_dtype", "first", "last", "updated_at"}
+  series/<キー>.<gen>.ts        … その系列の試合日時（epoch ミリ秒, int64）
+  series/<キー>.<gen>.rating    … その系列のレート（int32 か float32）
+  index.lock                    … 書き込み時のロックファイル
+
+- キーは (player, character)。系列ごとにファイルを分けるので、差し替えても使われない領域は残らない
+  * 保存済みの系列が新しい系列の先頭と一致すれば（試合が増えただけなら）末尾の差分だけを追記する
+  * それ以外（期間を変えた・過去の値が変わった）は次の世代のファイルに書き、index を差し替えてから前の世代を消す
+- index.json が唯一のコミット点。データは fsync してから index を os.replace するので、途中で落ちても
+  index が指すのは書き終わった行だけ（追記の途中で落ちた残りは次の書き込みで切り詰める）
+- 書き込みは index.lock で排他し、ロックを取ってから index を読み直す（複数プロセスが同じアーカイブに書いてよい）
+- 読み込みは np.memmap で必要な系列だけを写像し、日付範囲は searchsorted で切り出す（全体はロードしない）。
+  他のプロセスが index を書き換えていたら読み直す
+- 旧形式（全系列を ts.i64 / rating.bin に連結）もそのまま読める。書き込むと系列ごとのファイルに移し、
+  旧形式の系列がなくなったら連結ファイルを消す（compact() で一度に移せる）
+
+使い方:
+  arc = RankArchive("dist/archive")
+  arc.write("3629769034", 5, data)                # data = [{"d", "r"}, ...]
+  ts, r = arc.read("3629769034", 5, date_from="2025-05-01")
+  data = arc.read_records("3629769034", 5)
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sfbuff_filelock import file_lock
+from sfbuff_timecol import TimeColumn
+
+TS_DTYPE = np.dtype("<i8")
+RATING_DTYPES = {"i4": np.dtype("<i4"), "f4": np.dtype("<f4")}
+SERIES_DIR = "series"
+
+
+def series_key(player: str, character_id: Optional[int]) -> str:
+    return f"{player}:{'all' if character_id is None else int(character_id)}"
+
+
+def _day_start_ms(day: str, tz: Optional[str]) -> int:
+    d = datetime.strptime(day[:10], "%Y-%m-%d")
+    if tz:
+        try:
+            from zoneinfo import ZoneInfo
+            d = d.replace(tzinfo=ZoneInfo(tz))
+        except Exception:
+            pass
+    return int(d.timestamp() * 1000)
+
+
+def _write_synced(path: str, mode: str, payload: bytes, keep: Optional[int] = None) -> None:
+    """payload を書いて fsync。keep を渡すと先にその長さへ切り詰める（前回の書きかけを捨てる）。"""
+    with open(path, mode) as f:
+        if keep is not None:
+            f.truncate(keep)
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _remove_quietly(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass  # Windows で他のプロセスが memmap 中なら残る（compact() で消す）
+
+
+class RankArchive:
+    def __init__(self, root: str):
+        self.root = root
+        self.series_dir = os.path.join(root, SERIES_DIR)
+        os.makedirs(self.series_dir, exist_ok=True)
+        self.index_path = os.path.join(root, "index.json")
+        self.lock_path = os.path.join(root, "index.lock")
+        # 旧形式の連結ファイル
+        self.ts_path = os.path.join(root, "ts.i64")
+        self.rating_path = os.path.join(root, "rating.bin")
+        self._index_stamp: Optional[Tuple[int, int]] = None
+        self.index: Dict[str, Dict] = self._load_index()
+
+    # ---------------- index ----------------
+    def _stat_index(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.index_path)
+        except OSError:
+            return None
+        return st.st_ino, st.st_mtime_ns
+
+    def _load_index(self) -> Dict[str, Dict]:
+        stamp = self._stat_index()
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = {}
+        self._index_stamp = stamp
+        return index
+
+    def refresh(self) -> None:
+        """他のプロセスが index を書き換えていたら読み直す。"""
+        if self._stat_index() != self._index_stamp:
+            self.index = self._load_index()
+
+    def _save_index(self) -> None:
+        tmp = f"{self.index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        _write_synced(tmp, "wb", json.dumps(self.index, ensure_ascii=False, indent=1).encode("utf-8"))
+        os.replace(tmp, self.index_path)
+        self._index_stamp = self._stat_index()
+
+    def keys(self) -> List[str]:
+        self.refresh()
+        return sorted(self.index)
+
+    def _series_paths(self, key: str, gen: int) -> Tuple[str, str]:
+        stem = os.path.join(self.series_dir, f"{re.sub(r'[^0-9A-Za-z_-]', '_', key)}.{gen}")
+        return stem + ".ts", stem + ".rating"
+
+    def _stored_prefix(self, key: str, ent: Optional[Dict], ts_ms: np.ndarray, ratings: np.ndarray, code: str) -> Optional[int]:
+        """保存済みの系列が新しい系列の先頭と一致すればその行数（末尾だけ追記できる）、でなければ None。"""
+        if ent is None or "gen" not in ent or ent["rating_dtype"] != code or ent["count"] > len(ts_ms):
+            return None
+        n = ent["count"]
+        if n == 0:
+            return 0
+        # memmap ではなくコピーで読む（このあと同じファイルを切り詰めて追記するため）
+        ts_path, r_path = self._series_paths(key, ent["gen"])
+        old_ts = np.fromfile(ts_path, dtype=TS_DTYPE, count=n)
+        old_r = np.fromfile(r_path, dtype=RATING_DTYPES[code], count=n)
+        if len(old_ts) != n or len(old_r) != n or not (np.array_equal(old_ts, ts_ms[:n]) and np.array_equal(old_r, ratings[:n])):
+            return None
+        return n
+
+    # ---------------- 書き込み ----------------
+    def write_arrays(self, key: str, ts_ms: np.ndarray, ratings: np.ndarray) -> None:
+        """系列を丸ごと書き込む（既存のキーは差し替え。先頭が保存済みと同じなら増えた分だけ追記）。"""
+        ts_ms = np.asarray(ts_ms, dtype=TS_DTYPE)
+        ratings = np.asarray(ratings)
+        if len(ts_ms) != len(ratings):
+            raise ValueError("ts と rating の長さが一致しません。")
+        if len(ts_ms) > 1 and np.any(np.diff(ts_ms) < 0):
+            order = np.argsort(ts_ms, kind="stable")
+            ts_ms, ratings = ts_ms[order], ratings[order]
+
+        is_int = ratings.dtype.kind in "iu" or bool(np.all(np.mod(ratings, 1) == 0))
+        code = "i4" if is_int and (len(ratings) == 0 or np.abs(ratings).max() < 2 ** 31) else "f4"
+        rdt = RATING_DTYPES[code]
+        ratings = ratings.astype(rdt)
+
+        with file_lock(self.lock_path):
+            self.index = self._load_index()
+            old = self.index.get(key)
+            start = self._stored_prefix(key, old, ts_ms, ratings, code)
+            if start is not None and start == len(ts_ms):
+                return  # 増えた試合なし
+            if start is not None:
+                gen = old["gen"]
+                ts_path, r_path = self._series_paths(key, gen)
+                _write_synced(ts_path, "ab", ts_ms[start:].tobytes(), keep=start * TS_DTYPE.itemsize)
+                _write_synced(r_path, "ab", ratings[start:].tobytes(), keep=start * rdt.itemsize)
+            else:
+                gen = old.get("gen", 0) + 1 if old else 1
+                ts_path, r_path = self._series_paths(key, gen)
+                _write_synced(ts_path, "wb", ts_ms.tobytes())
+                _write_synced(r_path, "wb", ratings.tobytes())
+
+            self.index[key] = {
+                "gen": gen,
+                "count": int(len(ts_ms)),
+                "rating_dtype": code,
+                "first": int(ts_ms[0]) if len(ts_ms) else None,
+                "last": int(ts_ms[-1]) if len(ts_ms) else None,
+                "updated_at": time.time(),
+            }
+            self._save_index()
+            if start is None and old is not None and "gen" in old:
+                for path in self._series_paths(key, old["gen"]):
+                    _remove_quietly(path)
+            self._drop_legacy_if_unused()
+
+    def write(self, player: str, character_id: Optional[int], data: List[dict]) -> None:
+        """[{"d", "r"}, ...] を書き込む。"""
+        ts = TimeColumn.from_values([p["d"] for p in data]).ms
+        ratings = np.asarray([p["r"] for p in data])
+        self.write_arrays(series_key(player, character_id), ts, ratings)
+
+    # ---------------- 読み込み ----------------
+    def _map(self, key: str, ent: Dict) -> Tuple[np.ndarray, np.ndarray]:
+        n = ent["count"]
+        rdt = RATING_DTYPES[ent["rating_dtype"]]
+        if n == 0:
+            return np.empty(0, TS_DTYPE), np.empty(0, rdt)
+        if "gen" in ent:
+            (ts_path, r_path), off = self._series_paths(key, ent["gen"]), 0
+        else:
+            ts_path, r_path, off = self.ts_path, self.rating_path, ent["offset"]
+        ts = np.memmap(ts_path, dtype=TS_DTYPE, mode="r", offset=off * TS_DTYPE.itemsize, shape=(n,))
+        r = np.memmap(r_path, dtype=rdt, mode="r", offset=off * rdt.itemsize, shape=(n,))
+        return ts, r
+
+    def _memmap(self, key: str) -> Tuple[np.ndarray, np.ndarray]:
+        self.refresh()
+        ent = self.index.get(key)
+        if ent is None:
+            raise KeyError(f"アーカイブに系列がありません: {key}")
+        try:
+            return self._map(key, ent)
+        except FileNotFoundError:
+            # 読む直前に他のプロセスが次の世代へ書き直した
+            self.index = self._load_index()
+            if key not in self.index:
+                raise KeyError(f"アーカイブに系列がありません: {key}")
+            return self._map(key, self.index[key])
+
+    def read_key(self, key: str,
+                 date_from: Optional[str] = None,
+                 date_to: Optional[str] = None,
+                 tz: Optional[str] = "Asia/Tokyo") -> Tuple[np.ndarray, np.ndarray]:
+        """(ts_ms, ratings) を memmap のビューで返す。date_from/to（YYYY-MM-DD, tz の日付で両端含む）で絞り込み。"""
+        ts, r = self._memmap(key)
+        lo, hi = 0, len(ts)
+        if date_from:
+            lo = int(np.searchsorted(ts, _day_start_ms(date_from, tz), side="left"))
+        if date_to:
+            end = datetime.strptime(date_to[:10], "%Y-%m-%d") + timedelta(days=1)
+            hi = int(np.searchsorted(ts, _day_start_ms(end.strftime("%Y-%m-%d"), tz), side="left"))
+        return ts[lo:hi], r[lo:hi]
+
+    def read(self, player: str, character_id: Optional[int], **kwargs) -> Tuple[np.ndarray, np.ndarray]:
+        return self.read_key(series_key(player, character_id), **kwargs)
+
+    def read_columns(self, player: str, character_id: Optional[int], **kwargs) -> Tuple[TimeColumn, np.ndarray]:
+        """(TimeColumn, ratings) で返す（日時は変換済みなので再パース不要）。"""
+        ts, r = self.read(player, character_id, **kwargs)
+        return TimeColumn(ts), r
+
+    def read_records(self, player: str, character_id: Optional[int], **kwargs) -> List[dict]:
+        """従来の [{"d": epoch ms, "r": rating}, ...] 形式で返す。"""
+        ts, r = self.read(player, character_id, **kwargs)
+        return [{"d": d, "r": v} for d, v in zip(ts.tolist(), r.tolist())]
+
+    # ---------------- 保守 ----------------
+    def _drop_legacy_if_unused(self) -> None:
+        """旧形式の系列が index に残っていなければ連結ファイルを消す（ロック中に呼ぶ）。"""
+        if any("gen" not in ent for ent in self.index.values()):
+            return
+        for path in (self.ts_path, self.rating_path):
+            if os.path.exists(path):
+                _remove_quietly(path)
+
+    def compact(self) -> None:
+        """旧形式の系列を系列ごとのファイルに移し、index から参照されていないファイルを消す。"""
+        self.refresh()
+        for key, ent in list(self.index.items()):
+            if "gen" not in ent:
+                ts, r = (np.array(a) for a in self._map(key, ent))
+                self.write_arrays(key, ts, r)
+        with file_lock(self.lock_path):
+            self.index = self._load_index()
+            live = {os.path.basename(p) for k, ent in self.index.items() if "gen" in ent
+                    for p in self._series_paths(k, ent["gen"])}
+            for name in os.listdir(self.series_dir):
+                if name not in live:
+                    _remove_quietly(os.path.join(self.series_dir, name))
+            self._drop_legacy_if_unused()
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SFBuff 用ディスクHTTPキャッシュ（両スクリプト共通）
+
+- キーは正規化URL（クエリをソート・フラグメント除去）＋ timezone cookie
+- played_to が（timezone cookie のタイムゾーンで）今日より前の「閉じた期間」は二度と変わらないので無期限に再利用
+- それ以外は ttl 秒以内ならそのまま、過ぎたら ETag / Last-Modified で条件付き再検証（304 ならキャッシュを返す）
+- 合計サイズが max_bytes を超えたら最終アクセスの古い順（LRU）に EVICT_TO の割合まで削除。最終アクセスは本体ファイルの mtime
+- index はヒットのたびには書き直さない。保存が INDEX_SAVE_EVERY 件たまるか INDEX_SAVE_INTERVAL 秒経ったとき、
+  clear() のとき、close() / 終了時にだけ書く（本体の書き込みはロックの外）。
+  書く前に落ちたプロセスの本体は index に載らないので、起動時に ORPHAN_AGE 秒より古いものを消す
+- 同じディレクトリを複数プロセス（batch と watch、API サーバと CLI など）で共有してよい。
+  index はロックファイルを取ってからディスク上のものと突き合わせて書き戻す
+- hits / revalidated / misses / bytes_saved などの統計を stats で参照可能
+
+使い方:
+  cache = HttpCache("~/.cache/sfbuff")
+  sess = CachedSession(new_session(), cache)
+  resp = sess.get(url, timeout=20)   # requests.Response 互換
+  print(cache.stats)
+"""
+
+import atexit
+import hashlib
+import json
+import os
+import threading
+import time
+import urllib.parse
+from datetime import date
+from typing import Any, Dict, Optional, Set
+
+from sfbuff_core import site_today
+from sfbuff_filelock import file_lock
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_TTL = 300.0
+
+# index を書き戻す間隔（保存件数 / 秒）。件数は index の 1/4 と大きい方（書き戻しは index の大きさに比例するので）
+INDEX_SAVE_EVERY = 64
+INDEX_SAVE_INTERVAL = 5.0
+# 上限を超えたら max_bytes のこの割合まで削除する（保存のたびに削除が走らないように）
+EVICT_TO = 0.9
+# index に載っていない本体・書きかけのファイルをこの秒数を過ぎたら消す（index を書く前に落ちたプロセスの残り）
+ORPHAN_AGE = 3600.0
+
+
+# ---------------- キー生成 ----------------
+def normalize_url(url: str) -> str:
+    """スキーム/ホストを小文字化、クエリをソート、フラグメントを除去。"""
+    p = urllib.parse.urlsplit(url)
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(p.query, keep_blank_values=True)), safe="~")
+    return urllib.parse.urlunsplit((p.scheme.lower(), p.netloc.lower(), p.path or "/", query, ""))
+
+
+def cache_key(url: str, tz: Optional[str]) -> str:
+    return hashlib.sha256(f"{normalize_url(url)}\n{tz or ''}".encode("utf-8")).hexdigest()
+
+
+def is_closed_window(url: str, today: Optional[date] = None, tz: Optional[str] = None) -> bool:
+    """
+    played_to が今日より前なら「閉じた期間」（内容が今後変わらない）。
+    今日は tz（timezone cookie）での日付。このマシンの日付ではない（マシンの方が進んでいると開いた期間を閉じたとみなす）。
+    """
+    qs = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))
+    played_to = qs.get("played_to")
+    if not played_to:
+        return False
+    try:
+        return date.fromisoformat(played_to[:10]) < (today or site_today(tz))
+    except ValueError:
+        return False
+
+
+# ---------------- キャッシュ本体 ----------------
+class HttpCache:
+    """ディスク上のキャッシュ。複数スレッドの CachedSession から共有してよい。"""
+
+    def __init__(self, cache_dir: str,
+                 max_bytes: int = DEFAULT_MAX_BYTES,
+                 ttl: float = DEFAULT_TTL):
+        self.cache_dir = os.path.expanduser(cache_dir)
+        self.max_bytes = int(max_bytes)
+        self.ttl = float(ttl)
+        self.stats: Dict[str, int] = {
+            "hits": 0, "revalidated": 0, "misses": 0,
+            "bytes_saved": 0, "bytes_fetched": 0, "evictions": 0,
+        }
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._index_path = os.path.join(self.cache_dir, "index.json")
+        self._lock_path = os.path.join(self.cache_dir, "index.lock")
+        self._index: Dict[str, Dict[str, Any]] = self._load_index()
+        # 前回 index を書いてから消したキー（他のプロセスの index と突き合わせるときに落とす）
+        self._removed: Set[str] = set()
+        # 前回 index を書いてから保存したキー（まだディスクの index に無いのは当然なので消されたとみなさない）
+        self._stored: Set[str] = set()
+        self._saved_once = os.path.exists(self._index_path)
+        self._dirty = False
+        self._remove_orphans()
+        self._total = self.total_bytes()
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        atexit.register(self.close)
+
+    # --- index 永続化 ---
+    def _load_index(self, check_bodies: bool = True) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not check_bodies:
+            return index
+        # 本体ファイルが消えているエントリは捨てる
+        return {k: e for k, e in index.items() if os.path.exists(self._body_path(k))}
+
+    def _save_index_locked(self) -> None:
+        """ディスク上の index（他のプロセスが書いたもの）と突き合わせて、上限を超えていれば削除してから書き戻す。"""
+        with file_lock(self._lock_path):
+            # 本体の有無は見ない（件数分の stat を避ける。本体が無ければ参照時に取り直すだけ）
+            merged = self._load_index(check_bodies=False)
+            for key in self._removed:
+                merged.pop(key, None)
+            for key, entry in self._index.items():
+                other = merged.get(key)
+                if other is None and key not in self._stored and self._saved_once:
+                    continue  # ディスクの index にあったのに無い = 他のプロセスが削除した
+                if other is None or float(other.get("stored_at") or 0) <= float(entry.get("stored_at") or 0):
+                    merged[key] = entry
+            self._index = merged
+            self._total = self.total_bytes()
+            self._evict_locked()
+            tmp = f"{self._index_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._index))  # dumps は C の encoder（dump はファイルへ細切れに書くので遅い）
+            os.replace(tmp, self._index_path)
+        self._removed.clear()
+        self._stored.clear()
+        self._saved_once = True
+        self._dirty = False
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+
+    def _remove_orphans(self) -> None:
+        """index に無い本体・書きかけの一時ファイルのうち古いものを消す（新しいものは他のプロセスが書き戻す前かもしれない）。"""
+        cutoff = time.time() - ORPHAN_AGE
+        with os.scandir(self.cache_dir) as it:
+            for ent in it:
+                if ent.name.endswith(".body"):
+                    if ent.name[:-len(".body")] in self._index:
+                        continue
+                elif not ent.name.endswith(".tmp"):
+                    continue
+                try:
+                    if ent.stat().st_mtime < cutoff:
+                        os.remove(ent.path)
+                except OSError:
+                    pass
+
+    def close(self) -> None:
+        """再検証で更新した分など、まだ書いていない index を書き戻す。"""
+        with self._lock:
+            if self._dirty:
+                self._save_index_locked()
+
+    def _body_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key + ".body")
+
+    def total_bytes(self) -> int:
+        return sum(int(e.get("size") or 0) for e in self._index.values())
+
+    # --- 参照 ---
+    def lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._index.get(key)
+            return dict(entry) if entry else None
+
+    def read_body(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._body_path(key), "rb") as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def is_fresh(self, entry: Dict[str, Any], now: Optional[float] = None) -> bool:
+        if entry.get("closed"):
+            return True
+        return ((now or time.time()) - float(entry.get("stored_at") or 0)) < self.ttl
+
+    def touch(self, key: str, served_bytes: int, revalidated: bool = False) -> None:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return
+            try:
+                os.utime(self._body_path(key))  # 最終アクセス（LRU）は本体の mtime
+            except OSError:
+                pass
+            if revalidated:
+                entry["stored_at"] = time.time()
+                self._dirty = True
+                self.stats["revalidated"] += 1
+            else:
+                self.stats["hits"] += 1
+            self.stats["bytes_saved"] += served_bytes
+
+    # --- 保存 / 削除 ---
+    def store(self, key: str, url: str, body: bytes, headers: Dict[str, str], closed: bool) -> None:
+        tmp = f"{self._body_path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, self._body_path(key))
+        entry = {
+            "url": url,
+            "size": len(body),
+            "etag": headers.get("ETag"),
+            "last_modified": headers.get("Last-Modified"),
+            "content_type": headers.get("Content-Type"),
+            "closed": bool(closed),
+            "stored_at": time.time(),
+        }
+        with self._lock:
+            old = self._index.get(key)
+            self._total += len(body) - (int(old.get("size") or 0) if old else 0)
+            self._index[key] = entry
+            self._removed.discard(key)
+            self._stored.add(key)
+            self.stats["misses"] += 1
+            self.stats["bytes_fetched"] += len(body)
+            self._dirty = True
+            self._unsaved += 1
+            self._evict_locked()
+            if (self._unsaved >= max(INDEX_SAVE_EVERY, len(self._index) // 4)
+                    or time.monotonic() - self._saved_at >= INDEX_SAVE_INTERVAL):
+                self._save_index_locked()
+
+    def _last_access(self, key: str) -> float:
+        try:
+            return os.path.getmtime(self._body_path(key))
+        except OSError:
+            return 0.0
+
+    def _evict_locked(self) -> None:
+        if self._total <= self.max_bytes:
+            return
+        target = int(self.max_bytes * EVICT_TO)
+        for key in sorted(self._index, key=self._last_access):
+            if self._total <= target:
+                break
+            self._total -= int(self._index[key].get("size") or 0)
+            self._dirty = True
+            del self._index[key]
+            self._removed.add(key)
+            try:
+                os.remove(self._body_path(key))
+            except OSError:
+                pass
+            self.stats["evictions"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.update({k: e for k, e in self._load_index().items() if k not in self._index})
+            for key in list(self._index):
+                try:
+                    os.remove(self._body_path(key))
+                except OSError:
+                    pass
+                self._removed.add(key)
+            self._index.clear()
+            self._total = 0
+            self._save_index_locked()
+
+
+# ---------------- Session ラッパ ----------------
+def _cached_response(url: str, body: bytes, entry: Dict[str, Any]):
+    """キャッシュの本文から requests.Response を組み立てる（requests はヒットしたときに読み込む）。"""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    resp = requests.Response()
+    resp._content = body
+    resp.status_code = 200
+    resp.url = url
+    resp.headers = CaseInsensitiveDict({"Content-Type": entry.get("content_type") or "text/html; charset=utf-8"})
+    resp.encoding = "utf-8"
+    resp.from_cache = True
+    return resp
+
+
+class CachedSession:
+    """
+    requests.Session を包んで get() にキャッシュを挟む。
+    get 以外（headers / cookies 等）は元の Session へ委譲。
+    """
+
+    def __init__(self, session, cache: HttpCache):
+        self.session = session
+        self.cache = cache
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url: str, **kwargs):
+        tz = self.session.cookies.get("timezone")
+        key = cache_key(url, tz)
+        entry = self.cache.lookup(key)
+        body = self.cache.read_body(key) if entry else None
+
+        if entry and body is not None and self.cache.is_fresh(entry):
+            self.cache.touch(key, len(body))
+            return _cached_response(url, body, entry)
+
+        headers = dict(kwargs.pop("headers", None) or {})
+        if entry and body is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        resp = self.session.get(url, headers=headers or None, **kwargs)
+        if resp.status_code == 304 and entry and body is not None:
+            self.cache.touch(key, len(body), revalidated=True)
+            return _cached_response(url, body, entry)
+
+        if resp.status_code == 200:
+            self.cache.store(key, url, resp.content, resp.headers, closed=is_closed_window(url, tz=tz))
+        resp.from_cache = False
+        return resp
+
+
+def format_stats(stats: Dict[str, int]) -> str:
+    return ("[cache] hits={hits} revalidated={revalidated} misses={misses} "
+            "bytes_saved={bytes_saved} bytes_fetched={bytes_fetched} evictions={evictions}").format(**stats)
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+
+"""
+共通の軽量コア（URL組み立て・パース後の整形・集計）
+
+- 標準ライブラリだけで import できる（requests / bs4 / NumPy / matplotlib は読み込まない）
+- Matchup の行は sfbuff_rows.MatchupRow（__slots__ のコンパクトな行。dict と同じように読める）
+- sfbuff_rank_history / sfbuff_matchup_chart はここの関数を使い、従来の名前で再エクスポートしている
+- 重い依存が要る関数（scrape_rank_history / parse_page / plot_rank_history など）もここから取れるが、
+  属性に初めて触れたときに該当モジュールを読み込む（import sfbuff_core だけでは読み込まない）
+
+使い方:
+  from sfbuff_core import rank_history_url, matchup_chart_url, merge_inputs
+  from sfbuff_core import parse_page          # この時点で sfbuff_matchup_chart を読み込む
+"""
+
+import importlib
+import urllib.parse
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sfbuff_rows import MatchupRow
+
+RANK_BASE_URL = "https://sfbuff.site"
+MATCHUP_BASE_URL = "https://www.sfbuff.site"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"
+
+
+# ---------------- URL組み立て ----------------
+def _rebase_url(url: str, base_url: str) -> str:
+    """URL のスキーム＋ホスト部分を base_url に差し替える。"""
+    src = urllib.parse.urlsplit(url)
+    dst = urllib.parse.urlsplit(base_url)
+    return urllib.parse.urlunsplit((dst.scheme, dst.netloc, dst.path.rstrip("/") + src.path, src.query, ""))
+
+
+def _fighter_url(player_or_url: str, page: str, qs: Dict[str, str],
+                 default_base: str, base_url: Optional[str]) -> str:
+    if player_or_url.startswith("http"):
+        return _rebase_url(player_or_url, base_url) if base_url else player_or_url
+    query = urllib.parse.urlencode(qs, safe="~")
+    base = (base_url or default_base).rstrip("/")
+    return f"{base}/fighters/{player_or_url}/{page}" + ("?" + query if query else "")
+
+
+def rank_history_url(player_or_url: str,
+                     character_id: Optional[int] = None,
+                     date_from: Optional[str] = None,
+                     date_to: Optional[str] = None,
+                     base_url: Optional[str] = None) -> str:
+    """
+    プレイヤーIDから ranked_history の検索条件付きURLを生成（既にURLならそのまま返す）。
+    base_url を指定するとホストを差し替える（ローカルの代替サーバ向け。URL 指定時も差し替え）。
+    """
+    qs = {}
+    if character_id is not None:
+        qs["home_character_id"] = str(character_id)
+    if date_from:
+        qs["played_from"] = date_from
+    if date_to:
+        qs["played_to"] = date_to
+    return _fighter_url(player_or_url, "ranked_history", qs, RANK_BASE_URL, base_url)
+
+
+def matchup_chart_url(player_or_url: str,
+                      character_id: Optional[int] = None,
+                      home_input_type_id: Optional[int] = None,
+                      battle_type_id: Optional[int] = 1,
+                      date_from: Optional[str] = None,
+                      date_to: Optional[str] = None,
+                      base_url: Optional[str] = None) -> str:
+    """
+    プレイヤーIDから matchup_chart のURLを構築。既にURLならそのまま返す。
+    base_url を指定するとホストを差し替える（ローカルの代替サーバ向け。URL 指定時も差し替え）。
+    """
+    qs = {}
+    if character_id is not None:
+        qs["home_character_id"] = str(character_id)
+    if home_input_type_id is not None:
+        qs["home_input_type_id"] = str(home_input_type_id)
+    if battle_type_id is not None:
+        qs["battle_type_id"] = str(battle_type_id)
+    if date_from:
+        qs["played_from"] = date_from
+    if date_to:
+        qs["played_to"] = date_to
+    return _fighter_url(player_or_url, "matchup_chart", qs, MATCHUP_BASE_URL, base_url)
+
+
+# ---------------- セッション ----------------
+def new_session(tz: str = "Asia/Tokyo"):
+    """UA と timezone cookie を設定済みの requests.Session を返す（requests はここで読み込む）。"""
+    import requests
+    sess = requests.Session()
+    sess.headers.update({"User-Agent": USER_AGENT})
+    sess.cookies.set("timezone", tz)
+    return sess
+
+
+def site_today(tz: Optional[str] = "Asia/Tokyo") -> date:
+    """
+    サイト側（timezone cookie の tz）での今日の日付。「期間が閉じたか」の判定用。
+    tz が使えないときは、どのタイムゾーンでもまだ来ていない日にならないよう UTC-12 の日付を返す。
+    """
+    if tz:
+        try:
+            from zoneinfo import ZoneInfo
+            return datetime.now(ZoneInfo(tz)).date()
+        except Exception:
+            pass
+    return (datetime.now(timezone.utc) - timedelta(hours=12)).date()
+
+
+# ---------------- Ranked History ----------------
+def rank_points(chart: Dict[str, Any]) -> List[dict]:
+    """
+    Chart.js の設定から MR（無ければ LP）のデータセットを選び、[{"d": 日時, "r": レート}, ...] にする。
+    y が None の点（試合はあるがレートが動いていない等）は除く。
+    """
+    return rank_series(chart)[1]
+
+
+def rank_series(chart: Dict[str, Any]) -> Tuple[str, List[dict]]:
+    """rank_points と同じ点を、選んだ系列の種類（"MR" / "LP"）と一緒に返す。"""
+    datasets = chart.get("data", {}).get("datasets", [])
+
+    # MR(マスターレート)のデータセットを優先的に探す
+    # yAxisID が 'mr' を含むもの、またはラベルが 'MR' のものを探す
+    ds = next((d for d in datasets if "mr" in d.get("yAxisID", "").lower() or d.get("label") == "MR"), None)
+
+    # もしMRが見つからない（ダイヤ以下など）場合は LP を探す
+    kind = "MR"
+    if not ds:
+        ds = next((d for d in datasets if "lp" in d.get("yAxisID", "").lower() or d.get("label") == "LP"), None)
+        kind = "LP"
+
+    if not ds or "data" not in ds:
+        raise RuntimeError("有効なMRまたはLPのデータセットが見つかりませんでした。")
+
+    return kind, [{"d": p["x"], "r": p["y"]} for p in ds["data"] if p.get("y") is not None]
+
+
+def _parse_dt(val) -> datetime:
+    """x が ISO文字列 / エポック（μs/ms/秒）のどれでも解釈（必要時に使用）。"""
+    # 数値
+    if isinstance(val, (int, float)):
+        ts = float(val)
+        if ts >= 1e15:      # microseconds
+            ts /= 1_000_000.0
+        elif ts >= 1e12:    # milliseconds
+            ts /= 1_000.0
+        # else: seconds
+        return datetime.fromtimestamp(ts)
+    # 文字列
+    if isinstance(val, str):
+        s = val.strip()
+        if s.isdigit():
+            ts = float(s)
+            if ts >= 1e15:
+                ts /= 1_000_000.0
+            elif ts >= 1e12:
+                ts /= 1_000.0
+            return datetime.fromtimestamp(ts)
+        try:
+            return datetime.fromisoformat(s.replace("Z", "+00:00"))
+        except Exception:
+            pass
+        try:
+            return datetime.strptime(s[:10], "%Y-%m-%d")
+        except Exception:
+            pass
+    raise ValueError(f"日時の解釈に失敗しました: {val!r}")
+
+
+def moving_average(series: List[float], n: int) -> List[Optional[float]]:
+    """直近 n 試合の単純移動平均（不足部は None）。"""
+    if n <= 0:
+        raise ValueError("移動平均の窓幅 n は 1 以上で指定してください。")
+    ma: List[Optional[float]] = [None] * len(series)
+    if not series:
+        return ma
+    csum = [0.0]
+    for v in series:
+        csum.append(csum[-1] + float(v))
+    for i in range(n - 1, len(series)):
+        s = csum[i + 1] - csum[i + 1 - n]
+        ma[i] = s / n
+    return ma
+
+
+def exponential_moving_average(series: List[float], n: int) -> List[Optional[float]]:
+    """EMA(n)（見やすさ重視で全点に値を出す）。"""
+    if n <= 0:
+        raise ValueError("EMA の窓幅 n は 1 以上で指定してください。")
+    if not series:
+        return []
+    alpha = 2.0 / (n + 1.0)
+    ema: List[Optional[float]] = [None] * len(series)
+    s0 = sum(series[:n]) / n if len(series) >= n else float(series[0])
+    ema[0] = s0
+    for i in range(1, len(series)):
+        prev = ema[i - 1] if ema[i - 1] is not None else s0
+        ema[i] = (series[i] - prev) * alpha + prev
+    return ema
+
+
+def split_seasons_by_jump(ys: List[float], threshold: float) -> List[Tuple[int, int]]:
+    """
+    前試合との差が threshold 以上（絶対値）なら、そこでシーズン切替とみなす。
+    返り値: [(start_idx, end_idx_excl), ...] 例: [(0, 120), (120, 245), ...]
+    """
+    if not ys:
+        return []
+    spans: List[Tuple[int, int]] = []
+    start = 0
+    for i in range(1, len(ys)):
+        if abs(ys[i] - ys[i - 1]) >= threshold:
+            if i - start > 0:
+                spans.append((start, i))  # [start, i)
+            start = i
+    spans.append((start, len(ys)))
+    return spans
+
+
+# ---------------- 描画レイアウト ----------------
+# Ranked History の図の大きさと固定レイアウト時の余白（matplotlib 版の fast_layout と sfbuff_native_chart で共通。
+# 11x5 inch 前提。下は日付ラベル、右下はスタンプ用）
+FIGSIZE = (11, 5)
+DPI = 120
+FAST_LAYOUT_MARGINS = dict(left=0.065, right=0.985, top=0.965, bottom=0.30)
+
+
+# ---------------- Matchup ----------------
+def _to_int(s) -> Optional[int]:
+    try:
+        if s is None:
+            return None
+        t = str(s).strip()
+        if t == "-" or t == "":
+            return None
+        return int(t.replace(",", ""))
+    except Exception:
+        return None
+
+
+def _to_float(s) -> Optional[float]:
+    try:
+        if s is None:
+            return None
+        t = str(s).strip().replace("%", "")
+        if t == "-" or t == "":
+            return None
+        return float(t)
+    except Exception:
+        return None
+
+
+def normalize_chart_to_rows(chart: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    Chart をロング形式へ変換（フォールバック用・簡易）。
+    値は 'value' に入れる。入力タイプや勝敗の内訳はChart側にないことが多い。
+    """
+    rows: List[Dict[str, Any]] = []
+    data = chart.get("data", {})
+    labels = data.get("labels", None)
+    datasets = data.get("datasets", [])
+    if labels and datasets:
+        for ds in datasets:
+            series = ds.get("label") or "series"
+            vals = ds.get("data", [])
+            if len(vals) == len(labels):
+                for lab, val in zip(labels, vals):
+                    rows.append({
+                        "opponent": str(lab),
+                        "series": series,
+                        "value": _to_float(val) or _to_int(val),
+                    })
+    return rows
+
+
+def merge_inputs(rows: List[Dict[str, Any]]) -> List[MatchupRow]:
+    """
+    control 列（C/M）を統合。
+    合算の上で WinRate と Diff を再計算。返す行は control 列の無い MatchupRow。
+    """
+    buckets: Dict[str, List[int]] = {}  # opponent -> [total, wins, losses, draws]
+
+    for r in rows:
+        if type(r) is MatchupRow:
+            # 属性で直接読む（Mapping 経由の get より速い）
+            opp = r.opponent or ""
+            vals = (r.total, r.wins, r.losses, r.draws)
+        else:
+            opp = r.get("opponent") or ""
+            vals = (r.get("total"), r.get("wins"), r.get("losses"), r.get("draws"))
+        b = buckets.get(opp)
+        if b is None:
+            b = buckets[opp] = [0, 0, 0, 0]
+        # 合算（None は無視）
+        for i, v in enumerate(vals):
+            if isinstance(v, int):
+                b[i] += v
+
+    out: List[MatchupRow] = []
+    for opp, (total, wins, losses, draws) in buckets.items():
+        diff = wins - losses
+        win_rate = (wins / total * 100.0) if total > 0 else None
+
+        out.append(MatchupRow(opp, total=total, wins=wins, losses=losses, draws=draws, diff=diff,
+                              win_rate=round(win_rate, 2) if win_rate is not None else None))
+    # 相手名でソートしておくと使いやすい
+    out.sort(key=lambda x: x.opponent)
+    return out
+
+
+# ---------------- 遅延再エクスポート ----------------
+# 名前 → 定義しているモジュール。属性に初めて触れたときだけ import する
+_LAZY = {
+    "scrape_rank_history": "sfbuff_rank_history",
+    "plot_rank_history": "sfbuff_rank_history",
+    "draw_rank_history": "sfbuff_rank_history",
+    "parse_page": "sfbuff_matchup_chart",
+    "parse_matchup_table": "sfbuff_matchup_chart",
+    "fetch_chart_json": "sfbuff_matchup_chart",
+    "extract_chart": "sfbuff_extract",
+    "HttpClient": "sfbuff_http",
+    "MatchupCube": "sfbuff_cube",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_LAZY))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+
+"""
+Matchup 集計キューブ（次元つき集計＋増分ロールアップ）
+
+- 次元: player / character（自キャラ）/ input_type（自分の入力タイプ）/ opponent / control（表の C/M）/ period（取得期間）
+- 次元の値は次元ごとに整数コードへインターン（同じ文字列を何度も持たない）
+- 集計値（total / wins / losses / draws）は次元コードの組ごとに array.array（int64）へ積む
+- よく使う group-by は add_rollup() で登録しておくと、行の取り込み時に一緒に加算される（問い合わせ時の走査なし）
+- 登録していない group-by も、生の行ではなく集計済みセルから作る
+- diff / win_rate は問い合わせ時に合算値から再計算（merge_inputs と同じ式）
+
+取り込みは加算のみ（同じページを2回入れると2倍になる）。期間ごとに別クエリで取ったものを積む想定。
+
+使い方:
+  cube = MatchupCube(rollups=[("opponent",), ("character", "opponent")])
+  cube.add_rows(rows, player="3629769034", character=5, input_type=0, period="2025-08-01..2025-08-31")
+  cube.group_by(["opponent"])                                  # 全期間・C/M 合算の相手別
+  cube.group_by(["period", "opponent"], where={"opponent": "Ken"})
+"""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+DIMENSIONS = ("player", "character", "input_type", "opponent", "control", "period")
+MEASURES = ("total", "wins", "losses", "draws")
+DERIVED = ("diff", "win_rate")
+
+
+def period_label(date_from: Optional[str], date_to: Optional[str]) -> str:
+    """取得期間を period 次元の値にする（"YYYY-MM-DD..YYYY-MM-DD"、未指定側は空）。"""
+    return f"{date_from or ''}..{date_to or ''}"
+
+
+class _Table:
+    """次元コードの組 → セル番号、セルごとの集計値は列ごとの array。"""
+
+    def __init__(self):
+        self.index: Dict[Tuple[int, ...], int] = {}
+        self.keys: List[Tuple[int, ...]] = []
+        self.total = array("q")
+        self.wins = array("q")
+        self.losses = array("q")
+        self.draws = array("q")
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, key: Tuple[int, ...], total: int, wins: int, losses: int, draws: int) -> None:
+        i = self.index.get(key)
+        if i is None:
+            self.index[key] = len(self.keys)
+            self.keys.append(key)
+            self.total.append(total)
+            self.wins.append(wins)
+            self.losses.append(losses)
+            self.draws.append(draws)
+            return
+        self.total[i] += total
+        self.wins[i] += wins
+        self.losses[i] += losses
+        self.draws[i] += draws
+
+    def project(self, pos: Tuple[int, ...], cond: Dict[int, set]) -> "_Table":
+        """pos の次元だけ残して合算した新しい表（cond={位置: コード集合} で絞り込み）。"""
+        acc: Dict[Tuple[int, ...], List[int]] = {}
+        conds = list(cond.items())
+        for key, t, w, l, d in zip(self.keys, self.total, self.wins, self.losses, self.draws):
+            if conds and not all(key[p] in codes for p, codes in conds):
+                continue
+            k = tuple([key[p] for p in pos])
+            a = acc.get(k)
+            if a is None:
+                acc[k] = [t, w, l, d]
+            else:
+                a[0] += t
+                a[1] += w
+                a[2] += l
+                a[3] += d
+        out = _Table()
+        for k, (t, w, l, d) in acc.items():
+            out.add(k, t, w, l, d)
+        return out
+
+
+class MatchupCube:
+    def __init__(self, rollups: Iterable[Sequence[str]] = ()):
+        self._codes: Dict[str, Dict[Any, int]] = {d: {} for d in DIMENSIONS}
+        self._values: Dict[str, List[Any]] = {d: [] for d in DIMENSIONS}
+        self._cells = _Table()
+        self._rollups: Dict[Tuple[int, ...], _Table] = {}
+        self.rows_ingested = 0
+        for dims in rollups:
+            self.add_rollup(dims)
+
+    def __len__(self) -> int:
+        return len(self._cells)
+
+    # ---------------- 次元 ----------------
+    @staticmethod
+    def _positions(dims: Sequence[str]) -> Tuple[int, ...]:
+        unknown = [d for d in dims if d not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"未知の次元です: {', '.join(unknown)}（{', '.join(DIMENSIONS)}）")
+        return tuple(DIMENSIONS.index(d) for d in dims)
+
+    def _intern(self, dim: str, value: Any) -> int:
+        codes = self._codes[dim]
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(self._values[dim])
+            self._values[dim].append(value)
+        return code
+
+    def values(self, dim: str) -> List[Any]:
+        """dim に現れた値（出現順）。"""
+        return list(self._values[dim])
+
+    # ---------------- ロールアップ ----------------
+    def add_rollup(self, dims: Sequence[str]) -> None:
+        """dims での group-by を以後の取り込みと一緒に保守する（既存セルからは1回だけ作る）。"""
+        pos = self._positions(dims)
+        if pos in self._rollups:
+            return
+        self._rollups[pos] = self._cells.project(pos, {})
+
+    # ---------------- 取り込み ----------------
+    def add_row(self, row: Dict[str, Any], **tags: Any) -> None:
+        """
+        parse_matchup_table / merge_inputs の1行を取り込む。
+        行に無い次元（player / character / input_type / period 等）は tags で渡す。None の集計値は 0 扱い。
+        """
+        key = tuple([self._intern(d, tags[d] if d in tags else row.get(d)) for d in DIMENSIONS])
+        t, w, l, d = (int(row.get(m) or 0) for m in MEASURES)
+        self._cells.add(key, t, w, l, d)
+        for pos, table in self._rollups.items():
+            table.add(tuple([key[p] for p in pos]), t, w, l, d)
+        self.rows_ingested += 1
+
+    def add_rows(self, rows: Iterable[Dict[str, Any]], **tags: Any) -> int:
+        n = 0
+        for row in rows:
+            self.add_row(row, **tags)
+            n += 1
+        return n
+
+    def add_result(self, result: Dict[str, Any]) -> int:
+        """sfbuff_matchup_batch.fetch_query の結果（{"query", "rows", ...}）を取り込む。"""
+        q = result["query"]
+        return self.add_rows(result.get("rows") or [],
+                             player=q.get("player"),
+                             character=q.get("character"),
+                             input_type=q.get("input_type"),
+                             period=period_label(q.get("from"), q.get("to")))
+
+    # ---------------- 問い合わせ ----------------
+    def _where_codes(self, where: Optional[Dict[str, Any]]) -> Optional[Dict[int, set]]:
+        if not where:
+            return {}
+        out: Dict[int, set] = {}
+        for dim, want in where.items():
+            (p,) = self._positions([dim])
+            wants = want if isinstance(want, (list, tuple, set, frozenset)) else [want]
+            codes = {self._codes[dim][v] for v in wants if v in self._codes[dim]}
+            if not codes:
+                return None  # 一致する値が無い
+            out[p] = codes
+        return out
+
+    def group_by(self,
+                 dims: Sequence[str],
+                 where: Optional[Dict[str, Any]] = None,
+                 sort: bool = True) -> List[Dict[str, Any]]:
+        """
+        dims ごとに合算して [{次元..., total, wins, losses, draws, diff, win_rate}, ...] を返す。
+        where は {次元: 値 or 値のリスト}。dims が登録済みロールアップで、where の次元が dims に含まれていれば
+        ロールアップをそのまま読む。それ以外は集計済みセルから作る。
+        """
+        pos = self._positions(dims)
+        cond = self._where_codes(where)
+        if cond is None:
+            return []
+
+        table = self._rollups.get(pos)
+        if table is not None and all(p in pos for p in cond):
+            # ロールアップのキーは dims の順。条件の位置を dims 内の位置に直す
+            local = {pos.index(p): codes for p, codes in cond.items()}
+            picked = [(key, i) for i, key in enumerate(table.keys)
+                      if all(key[j] in codes for j, codes in local.items())]
+            grouped = table
+        else:
+            grouped = self._cells.project(pos, cond)
+            picked = list(zip(grouped.keys, range(len(grouped))))
+
+        out = [self._record(dims, key, grouped, i) for key, i in picked]
+        if sort:
+            out.sort(key=lambda r: tuple((r[d] is None, str(r[d])) for d in dims))
+        return out
+
+    def _record(self, dims: Sequence[str], key: Tuple[int, ...], table: _Table, i: int) -> Dict[str, Any]:
+        rec: Dict[str, Any] = {d: self._values[d][c] for d, c in zip(dims, key)}
+        total, wins, losses, draws = table.total[i], table.wins[i], table.losses[i], table.draws[i]
+        rec.update({
+            "total": total,
+            "wins": wins,
+            "losses": losses,
+            "draws": draws,
+            "diff": wins - losses,
+            "win_rate": round(wins / total * 100.0, 2) if total > 0 else None,
+        })
+        return rec
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+
+"""
+描画用の間引き（LTTB: Largest-Triangle-Three-Buckets）
+
+- 折れ線を「図の横幅のピクセル数」程度の点に減らしてから matplotlib に渡す
+  （11x5 inch / 120 dpi の図に 5 万点を描いても、ほとんどの線分は 1 ピクセル未満）
+- LTTB は各バケツから「前に選んだ点・次のバケツの平均」と作る三角形が最大の点を選ぶので、山と谷が残りやすい
+  点が多いときは先に細かいバケツごとの最小・最大だけに絞ってから LTTB をかける（MinMaxLTTB）。
+  さらに区間全体の最大・最小の点は必ず残す
+- シーズン（rolling_stats の区間）をつないだ1本として間引き、各区間の先頭・末尾・最大・最小の点は必ず残す
+  → シーズン境界の位置と、境界での線の切れ目は変わらない。区間ごとの点数は長さにほぼ比例
+
+使い方:
+  idx = lttb_indices(xs, ys, 1200)
+  segs = downsample_segments([(xs_a, ys_a), (xs_b, ys_b)], 1200)
+"""
+
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+Series = Tuple[np.ndarray, np.ndarray]  # (xs, ys)
+
+# 点数が「目標 × この倍率」以下なら間引かない（効果が小さく、形の差も気にならない範囲）
+AUTO_FACTOR = 8
+
+# LTTB の前に最小・最大で絞るときのバケツ数（目標点数の何倍か）
+MINMAX_RATIO = 4
+
+# _lttb で三角形の頂点（前のバケツで選んだ点）を選び直す回数の上限（選択が変わらなくなったら打ち切る）
+LTTB_PASSES = 16
+
+
+def _minmax_indices(y: np.ndarray, n_buckets: int) -> np.ndarray:
+    """y を n_buckets 個の連続区間に分け、各区間の最小・最大の添字（昇順、先頭と末尾を含む）。"""
+    n = len(y)
+    size = -(-n // n_buckets)
+    padded = np.full(size * n_buckets, np.nan)
+    padded[:n] = y
+    rows = padded.reshape(n_buckets, size)
+    valid = ~np.all(np.isnan(rows), axis=1)
+    base = np.arange(n_buckets)[valid] * size
+    rows = rows[valid]
+    lo = base + np.nanargmin(rows, axis=1)
+    hi = base + np.nanargmax(rows, axis=1)
+    return np.unique(np.concatenate(([0, n - 1], lo, hi)))
+
+
+# ---------------- LTTB ----------------
+def lttb_indices(xs: np.ndarray, ys: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    残す点の添字（昇順、先頭・末尾・最大・最小を含む）。len(xs) <= n_out なら全点。
+    n_out 点の LTTB に最大・最小を足すので、結果は最大 n_out + 2 点。
+    """
+    n = len(xs)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    y = np.asarray(ys, dtype=np.float64)
+    if n > n_out * MINMAX_RATIO * 2:
+        cand = _minmax_indices(y, n_out * MINMAX_RATIO)
+        idx = cand[_lttb(np.asarray(xs)[cand], y[cand], n_out)]
+    else:
+        idx = _lttb(xs, y, n_out)
+    return np.union1d(idx, [int(y.argmax()), int(y.argmin())])
+
+
+def _lttb(xs: np.ndarray, ys: np.ndarray, n_out: int, passes: int = LTTB_PASSES) -> np.ndarray:
+    """
+    LTTB（Steinarsson 2013）を全バケツまとめて計算する版。
+    本来の LTTB は「1つ前のバケツで選んだ点」を三角形の頂点にするため逐次処理になるが、
+    ここでは1回目は前のバケツの平均、2回目以降は前回の選択結果を頂点にして全バケツを一括で選び直す。
+    逐次版の結果はこの繰り返しの不動点なので、選択が変わらなくなった時点で逐次版と一致する
+    （passes で打ち切った場合はほぼ一致）。Python のループ回数がバケツ数に比例しない。
+    """
+    n = len(xs)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    if n_out < 3:
+        return np.array([0, n - 1])
+
+    x = np.asarray(xs, dtype=np.float64)
+    y = np.asarray(ys, dtype=np.float64)
+    # 先頭・末尾を除いた n-2 点を n_out-2 個のバケツに分ける
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    lo = edges[:-1]
+    hi = np.maximum(edges[1:], lo + 1)
+    # 各バケツの平均（次のバケツの代表点に使う）は累積和でまとめて出す
+    cx = np.concatenate(([0.0], np.cumsum(x)))
+    cy = np.concatenate(([0.0], np.cumsum(y)))
+    counts = hi - lo
+    avg_x = (cx[hi] - cx[lo]) / counts
+    avg_y = (cy[hi] - cy[lo]) / counts
+    # 最後のバケツの「次」は末尾の点
+    next_x = np.append(avg_x[1:], x[-1])[:, None]
+    next_y = np.append(avg_y[1:], y[-1])[:, None]
+
+    # バケツ × 最大幅の2次元に並べる（幅の足りない行ははみ出した列を無効にする）
+    width = int(counts.max())
+    cols = lo[:, None] + np.arange(width)[None, :]
+    valid = cols < hi[:, None]
+    cols = np.minimum(cols, n - 2)
+    bx, by = x[cols], y[cols]
+    rows = np.arange(len(lo))
+
+    prev_x = np.append(x[0], avg_x[:-1])[:, None]
+    prev_y = np.append(y[0], avg_y[:-1])[:, None]
+    sel = None
+    for _ in range(max(1, passes)):
+        # 三角形の面積（の2倍）。定数倍は argmax に影響しない
+        area = np.abs((prev_x - next_x) * (by - prev_y) - (prev_x - bx) * (next_y - prev_y))
+        area[~valid] = -1.0
+        new = cols[rows, area.argmax(axis=1)]
+        if sel is not None and np.array_equal(new, sel):
+            break
+        sel = new
+        prev_x = np.append(x[0], x[sel[:-1]])[:, None]
+        prev_y = np.append(y[0], y[sel[:-1]])[:, None]
+    return np.concatenate(([0], sel, [n - 1]))
+
+
+def downsample(xs: np.ndarray, ys: np.ndarray, n_out: int) -> Series:
+    """(xs, ys) を n_out 点程度に間引く（少なければそのまま）。"""
+    if len(xs) <= n_out:
+        return xs, ys
+    idx = lttb_indices(xs, ys, n_out)
+    return xs[idx], ys[idx]
+
+
+def downsample_segments(segs: Sequence[Series], n_out: int, factor: float = AUTO_FACTOR) -> List[Series]:
+    """
+    区間（シーズン）ごとの折れ線をまとめて n_out 点程度にする。区間をつないだ1本として1回だけ間引き
+    （点数は自然に区間の長さに比例する）、どの区間も先頭・末尾・最大・最小は必ず残して区間ごとに戻す。
+    合計が n_out × factor 以下なら何もしない（factor=1 なら n_out を超えたら必ず間引く）。
+    """
+    total = sum(len(xs) for xs, _ in segs)
+    if n_out <= 0 or total <= n_out * factor:
+        return list(segs)
+    offsets = np.cumsum([0] + [len(xs) for xs, _ in segs])
+    x = np.concatenate([np.asarray(xs, dtype=np.float64) for xs, _ in segs])
+    y = np.concatenate([np.asarray(ys, dtype=np.float64) for _, ys in segs])
+    keep = [lttb_indices(x, y, n_out)]
+    for a, b in zip(offsets[:-1], offsets[1:]):
+        if b > a:
+            seg = y[a:b]
+            keep.append([a, b - 1, a + int(seg.argmax()), a + int(seg.argmin())])
+    keep = np.unique(np.concatenate(keep))
+    bounds = np.searchsorted(keep, offsets)
+    out: List[Series] = []
+    for i, (xs, ys) in enumerate(segs):
+        idx = keep[bounds[i]:bounds[i + 1]] - offsets[i]
+        out.append((xs[idx], ys[idx]))
+    return out
+
+
+def figure_width_px(fig, ax=None) -> int:
+    """間引きの目標点数にする横幅（ピクセル）。ax があれば軸の幅、無ければ図全体の幅。"""
+    if ax is not None:
+        pos = ax.get_position()
+        return max(1, int(fig.get_figwidth() * pos.width * fig.dpi))
+    return max(1, int(fig.get_figwidth() * fig.dpi))
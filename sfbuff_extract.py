@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+ページからの抽出バックエンド（差し替え可能）
+
+- "fast": BeautifulSoup の木を作らず、文字列走査で必要な部分だけ取り出す
+    * Ranked History: div の data-chartjs-data-value 属性だけを切り出してデコード
+    * Matchup: <turbo-frame id="matchups-matchup-chart"> の範囲だけを切り出す
+- "bs4":  従来どおり BeautifulSoup で全体をパース
+- "auto": fast を試し、取れなければ bs4 にフォールバック
+
+表の断片を BeautifulSoup に渡すときは、lxml が入っていればそちらを使う（無ければ html.parser）。
+bs4 / lxml は bs4 バックエンドや表のパースで初めて必要になったときに読み込む（fast だけなら読み込まない）。
+"""
+
+import html
+import importlib.util
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+from sfbuff_profile import stage
+
+
+CHART_ATTR = "data-chartjs-data-value"
+MATCHUP_FRAME_ID = "matchups-matchup-chart"
+
+# 入っているかだけ見る（import はしない。BeautifulSoup が使うときに読み込む）
+TABLE_PARSER = "lxml" if importlib.util.find_spec("lxml") is not None else "html.parser"
+
+
+# ---------------- デコード ----------------
+# Rails が属性値に使う実体参照だけなら str.replace で済む（それ以外が混ざる時だけ html.unescape）
+_OTHER_ENTITY = re.compile(r"&(?!quot;|amp;|lt;|gt;|#39;|#x27;)")
+
+
+def fast_unescape(raw: str) -> str:
+    if "&" not in raw:
+        return raw
+    if _OTHER_ENTITY.search(raw):
+        return html.unescape(raw)
+    return (raw.replace("&quot;", '"')
+               .replace("&#39;", "'")
+               .replace("&#x27;", "'")
+               .replace("&lt;", "<")
+               .replace("&gt;", ">")
+               .replace("&amp;", "&"))
+
+
+# ---------------- fast バックエンド ----------------
+def _scan_attr(html_text: str, attr: str, tag: str = "div") -> Optional[str]:
+    """最初に現れる <tag ... attr="..."> の属性値（未デコード）を返す。"""
+    needle = attr + "="
+    pos = 0
+    while True:
+        i = html_text.find(needle, pos)
+        if i < 0:
+            return None
+        pos = i + len(needle)
+        # 属性名の直前は空白であること（data-chartjs-data-value-foo 等の誤検出防止）
+        if i == 0 or not html_text[i - 1].isspace():
+            continue
+        # 属するタグが目的の tag か確認
+        lt = html_text.rfind("<", 0, i)
+        if lt < 0 or html_text.rfind(">", lt, i) >= 0:
+            continue
+        name = html_text[lt + 1:lt + 1 + len(tag) + 1]
+        if name[:len(tag)].lower() != tag or not (name[len(tag):] or " ").isspace():
+            continue
+        quote = html_text[pos:pos + 1]
+        if quote not in ('"', "'"):
+            end = min(j for j in (html_text.find(" ", pos), html_text.find(">", pos), len(html_text)) if j >= 0)
+            return html_text[pos:end]
+        end = html_text.find(quote, pos + 1)
+        if end < 0:
+            return None
+        return html_text[pos + 1:end]
+
+
+def _fast_chart_raw(html_text: str) -> Optional[str]:
+    raw = _scan_attr(html_text, CHART_ATTR)
+    return fast_unescape(raw) if raw is not None else None
+
+
+def _fast_matchup_frame(html_text: str) -> Optional[str]:
+    m = re.search(r"<turbo-frame\b[^>]*\bid=[\"']" + re.escape(MATCHUP_FRAME_ID) + r"[\"'][^>]*>", html_text)
+    if not m:
+        return None
+    # 入れ子の turbo-frame を数えて対応する閉じタグまで
+    depth = 1
+    pos = m.end()
+    tag_re = re.compile(r"<(/?)turbo-frame\b", re.I)
+    while depth > 0:
+        t = tag_re.search(html_text, pos)
+        if t is None:
+            return None
+        depth += -1 if t.group(1) else 1
+        pos = t.end()
+    close = html_text.find(">", pos)
+    return html_text[m.start():(close + 1 if close >= 0 else len(html_text))]
+
+
+# ---------------- bs4 バックエンド ----------------
+def _bs4_chart_raw(html_text: str) -> Optional[str]:
+    import bs4
+    soup = bs4.BeautifulSoup(html_text, "html.parser")
+    div = soup.select_one(f"div[{CHART_ATTR}]")
+    if not div:
+        return None
+    return html.unescape(div.get(CHART_ATTR))
+
+
+def _bs4_matchup_frame(html_text: str) -> Optional[str]:
+    import bs4
+    soup = bs4.BeautifulSoup(html_text, "html.parser")
+    frame = soup.find("turbo-frame", {"id": MATCHUP_FRAME_ID})
+    return str(frame) if frame is not None else None
+
+
+# ---------------- 選択 ----------------
+BACKENDS: Dict[str, Dict[str, Callable[[str], Optional[str]]]] = {
+    "fast": {"chart": _fast_chart_raw, "frame": _fast_matchup_frame},
+    "bs4": {"chart": _bs4_chart_raw, "frame": _bs4_matchup_frame},
+}
+
+
+def _run(kind: str, html_text: str, backend: str) -> Optional[str]:
+    if backend == "auto":
+        out = BACKENDS["fast"][kind](html_text)
+        return out if out is not None else BACKENDS["bs4"][kind](html_text)
+    if backend not in BACKENDS:
+        raise ValueError(f"未知の抽出バックエンド: {backend!r}（{', '.join(['auto'] + list(BACKENDS))}）")
+    return BACKENDS[backend][kind](html_text)
+
+
+def extract_chart_text(html_text: str, backend: str = "auto") -> Optional[str]:
+    """data-chartjs-data-value の中身（実体参照デコード済みの JSON 文字列）。無ければ None。"""
+    return _run("chart", html_text, backend)
+
+
+def extract_chart(html_text: str, backend: str = "auto") -> Optional[Dict[str, Any]]:
+    """data-chartjs-data-value を JSON として読み込んで返す。無ければ None。"""
+    with stage("parse.extract", len(html_text)):
+        raw = extract_chart_text(html_text, backend)
+    if raw is None:
+        return None
+    with stage("parse.json", len(raw)):
+        return json.loads(raw)
+
+
+def extract_matchup_frame(html_text: str, backend: str = "auto") -> Optional[str]:
+    """matchups-matchup-chart の turbo-frame 部分の HTML。無ければ None。"""
+    return _run("frame", html_text, backend)
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+
+"""
+複数プロセスから同じディレクトリ（アーカイブ・キャッシュ）を書き換えるときの排他ロック
+
+- ロックファイルに OS のロックをかける（POSIX は fcntl.flock、Windows は msvcrt.locking）
+- プロセスが落ちればロックは OS が外すので、ロックファイルは残っていても問題ない
+
+使い方:
+  with file_lock("dist/archive/index.lock"):
+      ...index を読み直して更新し、書き戻す...
+"""
+
+import contextlib
+import os
+import time
+from typing import Iterator
+
+
+@contextlib.contextmanager
+def file_lock(path: str) -> Iterator[None]:
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if os.name == "nt":
+            import msvcrt
+            while True:
+                try:
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)  # LK_LOCK は約10秒で諦めるので取れるまで繰り返す
+            try:
+                yield
+            finally:
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+
+"""
+共有 HTTP クライアント（接続プール＋レート制限＋リトライ）
+
+- スレッドごとに requests.Session を1つ持ち、keep-alive の接続プールを使い回す
+- 全体／ホストごとのリクエストレートをトークンバケットで制限（req/s, 0 や None なら無制限）
+- GET は 429 / 5xx / 接続エラー / 読み込み途中の切断 でリトライ
+  待ち時間は Retry-After があればそれに従い（短くしない）、無ければジッタ付きの指数バックオフ
+  Retry-After が max_retry_after（--max-retry-after）を超えたら待たずにその応答を返す
+- 1リクエストごとの所要時間を記録し、件数・リトライ数・p50/p95 を stats で返す
+- requests.Session と同じ get() / headers / cookies を持つので、CachedSession で包める
+- snapshots（SnapshotStore）を渡すと、取得できた 200 の本文を内容ハッシュで重複排除して保存する
+- requests は最初の Session を作るときに読み込む（--help や取得しない経路では読み込まない）
+
+使い方:
+  client = HttpClient(rate=5, per_host_rate=2, retries=4)
+  resp = client.get(url)                      # timeout は client.timeout
+  print(format_http_stats(client.stats()), file=sys.stderr)
+"""
+
+import math
+import random
+import threading
+import time
+import urllib.parse
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from sfbuff_core import USER_AGENT
+from sfbuff_profile import PROFILER
+
+# リトライ対象のステータス
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+def retry_exceptions() -> Tuple[type, ...]:
+    """リトライ対象の例外（接続失敗・タイムアウト・本文の途中切断）。requests はここで読み込む。"""
+    import requests
+    return (
+        requests.ConnectionError,
+        requests.Timeout,
+        requests.exceptions.ChunkedEncodingError,
+    )
+
+
+# ---------------- レート制限 ----------------
+class TokenBucket:
+    """rate 回/秒、最大 burst 回まで溜められるトークンバケット。rate が 0 / None なら素通し。"""
+
+    def __init__(self, rate: Optional[float], burst: Optional[float] = None):
+        self.rate = float(rate or 0)
+        self.capacity = float(burst if burst else max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """トークンを1つ取る（足りなければ待つ）。待った秒数を返す。"""
+        if self.rate <= 0:
+            return 0.0
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1.0:
+                    self.tokens -= 1.0
+                    return waited
+                delay = (1.0 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """全体のバケット＋ホストごとのバケット。"""
+
+    def __init__(self, rate: Optional[float] = None, per_host_rate: Optional[float] = None,
+                 burst: Optional[float] = None):
+        self.global_bucket = TokenBucket(rate, burst)
+        self.per_host_rate = per_host_rate
+        self.burst = burst
+        self.hosts: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def acquire(self, url: str) -> float:
+        waited = 0.0
+        if self.per_host_rate:
+            host = urllib.parse.urlsplit(url).netloc
+            with self.lock:
+                bucket = self.hosts.get(host)
+                if bucket is None:
+                    bucket = self.hosts[host] = TokenBucket(self.per_host_rate, self.burst)
+            waited += bucket.acquire()
+        waited += self.global_bucket.acquire()
+        return waited
+
+
+# ---------------- リトライ ----------------
+def retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Retry-After（秒数 or HTTP-date）を秒に。小数の秒数も受け付け、負の値は 0。解釈できなければ None。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        seconds = float(value)
+    except ValueError:
+        pass
+    else:
+        return max(0.0, seconds) if math.isfinite(seconds) else None
+    import email.utils
+    try:
+        dt = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if dt is None:
+        return None
+    return max(0.0, dt.timestamp() - time.time())
+
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """attempt 回目（0 始まり）の待ち時間。指数バックオフ＋フルジッタ。"""
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ---------------- クライアント ----------------
+class HttpClient:
+    """
+    スレッドごとの Session（接続プール）＋共有のレート制限・リトライ・所要時間の記録。
+    get 以外（headers / cookies 等）は呼び出しスレッドの Session へ委譲。
+    """
+
+    def __init__(self,
+                 tz: str = "Asia/Tokyo",
+                 rate: Optional[float] = None,
+                 per_host_rate: Optional[float] = None,
+                 burst: Optional[float] = None,
+                 retries: int = 3,
+                 backoff: float = 0.5,
+                 max_backoff: float = 30.0,
+                 max_retry_after: Optional[float] = None,
+                 timeout: float = 20,
+                 pool_size: int = 16,
+                 keep_latencies: int = 10000,
+                 snapshots=None):
+        self.tz = tz
+        self.limiter = RateLimiter(rate, per_host_rate, burst)
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_retry_after = max_retry_after
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.snapshots = snapshots
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._latencies: deque = deque(maxlen=keep_latencies)
+        self._stats = {"requests": 0, "retries": 0, "errors": 0, "throttled_sec": 0.0, "backoff_sec": 0.0,
+                       "gave_up": 0}
+
+    # ---------------- Session ----------------
+    def _session(self):
+        sess = getattr(self._local, "sess", None)
+        if sess is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+            sess = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+            sess.mount("http://", adapter)
+            sess.mount("https://", adapter)
+            sess.headers.update({"User-Agent": USER_AGENT})
+            sess.cookies.set("timezone", self.tz)
+            self._local.sess = sess
+        return sess
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._session(), name)
+
+    # ---------------- GET ----------------
+    def get(self, url: str, **kwargs):
+        """
+        レート制限を守って GET。429/5xx/接続エラーはリトライし、最後の結果（requests.Response か例外）を返す。
+        Retry-After はそのまま待つ。max_retry_after を超える指定ならリトライせずにその応答を返す。
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        sess = self._session()
+        retry_on = retry_exceptions()
+        attempt = 0
+        while True:
+            waited = self.limiter.acquire(url)
+            t0 = time.perf_counter()
+            try:
+                resp = sess.get(url, **kwargs)
+            except retry_on:
+                self._record(time.perf_counter() - t0, waited, error=True)
+                if attempt >= self.retries:
+                    raise
+                self._sleep(backoff_delay(attempt, self.backoff, self.max_backoff))
+                attempt += 1
+                continue
+            elapsed = time.perf_counter() - t0
+            self._record(elapsed, waited, error=resp.status_code in RETRY_STATUSES)
+            if PROFILER.enabled:
+                PROFILER.record("fetch", elapsed, len(resp.content))
+            if resp.status_code not in RETRY_STATUSES or attempt >= self.retries:
+                if self.snapshots is not None and resp.status_code == 200:
+                    self.snapshots.put(url, resp.content, tz=self.tz)
+                return resp
+            delay = retry_after_seconds(resp.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt, self.backoff, self.max_backoff)
+            elif self.max_retry_after is not None and delay > self.max_retry_after:
+                with self._lock:
+                    self._stats["gave_up"] += 1
+                return resp
+            resp.close()
+            self._sleep(delay)
+            attempt += 1
+
+    def _sleep(self, delay: float) -> None:
+        with self._lock:
+            self._stats["retries"] += 1
+            self._stats["backoff_sec"] += delay
+        time.sleep(delay)
+
+    def _record(self, elapsed: float, waited: float, error: bool) -> None:
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["throttled_sec"] += waited
+            if error:
+                self._stats["errors"] += 1
+            self._latencies.append(elapsed)
+
+    # ---------------- 統計 ----------------
+    def stats(self) -> Dict[str, Any]:
+        """件数・リトライ数・待ち時間と、所要時間の p50 / p95 / max（秒）。"""
+        with self._lock:
+            out: Dict[str, Any] = dict(self._stats)
+            lat = sorted(self._latencies)
+        out["throttled_sec"] = round(out["throttled_sec"], 3)
+        out["backoff_sec"] = round(out["backoff_sec"], 3)
+        if lat:
+            out["p50"] = round(lat[len(lat) // 2], 4)
+            out["p95"] = round(lat[min(len(lat) - 1, int(len(lat) * 0.95))], 4)
+            out["max"] = round(lat[-1], 4)
+        else:
+            out["p50"] = out["p95"] = out["max"] = None
+        return out
+
+    def latencies(self):
+        """記録した所要時間（秒）のリスト（古い順、最大 keep_latencies 件）。"""
+        with self._lock:
+            return list(self._latencies)
+
+
+_defaults: Dict[str, HttpClient] = {}
+_defaults_lock = threading.Lock()
+
+
+def default_client(tz: str = "Asia/Tokyo") -> HttpClient:
+    """session 未指定の呼び出し用に、tz ごとの HttpClient をプロセス内で1つだけ作って使い回す。"""
+    with _defaults_lock:
+        client = _defaults.get(tz)
+        if client is None:
+            client = _defaults[tz] = HttpClient(tz=tz)
+        return client
+
+
+def format_http_stats(stats: Dict[str, Any]) -> str:
+    lat = " ".join(f"{k}={'-' if stats[k] is None else str(stats[k]) + 's'}" for k in ("p50", "p95", "max"))
+    return ("[http] requests={requests} retries={retries} errors={errors} gave_up={gave_up} "
+            "throttled={throttled_sec}s backoff={backoff_sec}s ").format(**stats) + "latency " + lat
+
+
+def add_http_args(ap) -> None:
+    """CLI 共通のオプション（--rate / --per-host-rate / --retries / --max-retry-after / --timeout / --snapshot-dir）。"""
+    ap.add_argument("--rate", type=float, default=None, help="全体のリクエスト上限 回/秒（デフォルト: 無制限）")
+    ap.add_argument("--per-host-rate", type=float, default=None, help="ホストごとのリクエスト上限 回/秒")
+    ap.add_argument("--retries", type=int, default=3, help="429/5xx/接続エラー時のリトライ回数（デフォルト:3）")
+    ap.add_argument("--max-retry-after", type=float, default=None,
+                    help="Retry-After がこの秒数を超えたら待たずに諦める（デフォルト: 指定どおり待つ）")
+    ap.add_argument("--timeout", type=float, default=20, help="1リクエストのタイムアウト秒（デフォルト:20）")
+    ap.add_argument("--snapshot-dir",
+                    help="取得したページを圧縮・重複排除して保存するディレクトリ（sfbuff_snapshots.py で再パース）")
+
+
+def client_from_args(args, tz: str = "Asia/Tokyo", **kwargs) -> HttpClient:
+    """add_http_args で追加したオプションから HttpClient を作る。"""
+    if getattr(args, "snapshot_dir", None) and "snapshots" not in kwargs:
+        from sfbuff_snapshots import SnapshotStore
+        kwargs["snapshots"] = SnapshotStore(args.snapshot_dir)
+    return HttpClient(tz=tz, rate=args.rate, per_host_rate=args.per_host_rate,
+                      retries=args.retries, max_retry_after=getattr(args, "max_retry_after", None),
+                      timeout=args.timeout, **kwargs)
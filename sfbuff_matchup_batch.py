@@ -0,0 +1,366 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SFBuff Matchup バッチクローラ
+
+- manifest(JSON) の「プレイヤー × home_character_id × home_input_type_id × 期間」を展開し、
+  スレッドプールで並列に matchup_chart を取得
+- 通信は sfbuff_http.HttpClient を全スレッドで共有（接続プール、全体/ホストごとのレート制限、429/5xx のリトライ）
+- 各ページは sfbuff_matchup_chart.rows_from_html（表パース → Chartフォールバック → 任意で C/M 統合）で処理
+- 結果は元クエリ付きで JSON 出力（stdout または --out）、スループット(pages/s)を stderr に表示
+- --format jsonl/csv なら、取得できたページから順に行をクエリ条件付き・固定列で流す（全件をメモリに溜めない）
+- --group-by なら、行を sfbuff_cube.MatchupCube に取り込んで指定次元の集計（diff / win_rate 再計算済み）を出す
+
+manifest 例:
+  {
+    "players": ["3629769034", "123456789"],
+    "characters": [5, 1],
+    "input_types": [0, 1],
+    "battle_type": 1,
+    "windows": [{"from": "2025-08-01", "to": "2025-08-31"}]
+  }
+  - characters / input_types / windows は省略可（省略時は条件なし）
+  - "queries": [{...}, ...] で個別クエリを直接並べることも可能
+
+使い方:
+  python sfbuff_matchup_batch.py manifest.json --workers 8 --merge-inputs --out dist/batch.json
+  python sfbuff_matchup_batch.py manifest.json --format jsonl | jq -c 'select(.diff < -5)'
+  python sfbuff_matchup_batch.py manifest.json --group-by character,opponent --format csv --out dist/by_opp.csv
+  python sfbuff_matchup_batch.py manifest.json --workers 16 --rate 8 --retries 5   # 8 req/s に抑え、429/5xx は再試行
+  python sfbuff_matchup_batch.py manifest.json --base-url http://127.0.0.1:8000   # ローカルの代替サーバ向け
+"""
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sfbuff_cache import CachedSession, HttpCache, format_stats
+from sfbuff_http import HttpClient, add_http_args, client_from_args, default_client, format_http_stats
+from sfbuff_rows import row_json_default
+from sfbuff_matchup_chart import build_url, parse_page
+from sfbuff_profile import PROFILER, stage
+
+
+# ---------------- manifest 展開 ----------------
+def load_manifest(path: str) -> Dict[str, Any]:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def expand_manifest(manifest: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    manifest を個別クエリのリストへ展開。
+    クエリは {"player", "character", "input_type", "battle_type", "from", "to"} の dict。
+    """
+    queries: List[Dict[str, Any]] = []
+
+    # 個別指定
+    for q in manifest.get("queries") or []:
+        queries.append({
+            "player": str(q["player"]),
+            "character": q.get("character"),
+            "input_type": q.get("input_type"),
+            "battle_type": q.get("battle_type", manifest.get("battle_type", 1)),
+            "from": q.get("from"),
+            "to": q.get("to"),
+        })
+
+    # 直積
+    players = [str(p) for p in manifest.get("players") or []]
+    characters = manifest.get("characters") or [None]
+    input_types = manifest.get("input_types") or [None]
+    windows = manifest.get("windows") or [{}]
+    battle_type = manifest.get("battle_type", 1)
+
+    for player, ch, it, win in itertools.product(players, characters, input_types, windows):
+        queries.append({
+            "player": player,
+            "character": ch,
+            "input_type": it,
+            "battle_type": battle_type,
+            "from": win.get("from"),
+            "to": win.get("to"),
+        })
+    return queries
+
+
+def query_url(q: Dict[str, Any], base_url: Optional[str] = None) -> str:
+    return build_url(
+        q["player"],
+        character_id=q.get("character"),
+        home_input_type_id=q.get("input_type"),
+        battle_type_id=q.get("battle_type"),
+        date_from=q.get("from"),
+        date_to=q.get("to"),
+        base_url=base_url,
+    )
+
+
+# ---------------- 並列取得 ----------------
+def fetch_query(q: Dict[str, Any],
+                merge: bool = False,
+                base_url: Optional[str] = None,
+                client: Optional[HttpClient] = None,
+                cache: Optional[HttpCache] = None,
+                with_chart: bool = False) -> Dict[str, Any]:
+    """
+    1クエリ分を取得・パース。失敗しても例外にせず error に詰めて返す。
+    client は全スレッドで共有する HttpClient（接続プール・レート制限・リトライ）。
+    with_chart=True なら同じパース結果から Chart も抽出して "chart" に入れる。
+    """
+    url = query_url(q, base_url)
+    result: Dict[str, Any] = {"query": q, "url": url, "rows": [], "error": None}
+    sess = client if client is not None else default_client()
+    if cache is not None:
+        sess = CachedSession(sess, cache)
+    try:
+        resp = sess.get(url)
+        resp.raise_for_status()
+        with stage("decode", len(resp.content)):
+            html_text = resp.text
+        rows, chart = parse_page(html_text, merge=merge, with_chart=with_chart)
+        result["rows"] = rows
+        if with_chart:
+            result["chart"] = chart
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    return result
+
+
+def iter_batch(queries: List[Dict[str, Any]],
+               workers: int = 8,
+               merge: bool = False,
+               base_url: Optional[str] = None,
+               client: Optional[HttpClient] = None,
+               cache: Optional[HttpCache] = None,
+               with_chart: bool = False) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    queries を上限 workers 本のスレッドで並列取得し、終わった順に (入力位置, 結果) を返す。
+    投入は同時実行数の数倍までに抑えるので、呼び出し側が逐次書き出せば結果はメモリに溜まらない。
+    """
+    workers = max(1, workers)
+    if client is None:
+        client = HttpClient(pool_size=workers)
+    pending = iter(enumerate(queries))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futs = {}
+
+        def _submit(limit: int) -> None:
+            for i, q in itertools.islice(pending, limit):
+                futs[ex.submit(fetch_query, q, merge, base_url, client, cache, with_chart)] = i
+
+        _submit(workers * 4)
+        while futs:
+            done, _ = wait(futs, return_when=FIRST_COMPLETED)
+            for fut in done:
+                yield futs.pop(fut), fut.result()
+            _submit(len(done))
+
+
+def _batch_stats(pages: int, errors: int, elapsed: float) -> Dict[str, Any]:
+    return {
+        "pages": pages,
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 2) if elapsed > 0 else None,
+    }
+
+
+def run_batch(queries: List[Dict[str, Any]],
+              workers: int = 8,
+              merge: bool = False,
+              base_url: Optional[str] = None,
+              client: Optional[HttpClient] = None,
+              cache: Optional[HttpCache] = None,
+              with_chart: bool = False) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    queries を上限 workers 本のスレッドで並列取得。
+    返り値: (結果リスト（入力順）, 統計 {"pages", "errors", "elapsed", "pages_per_sec"})
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(queries)
+    t0 = time.perf_counter()
+    for i, res in iter_batch(queries, workers, merge, base_url, client, cache, with_chart):
+        results[i] = res
+    elapsed = time.perf_counter() - t0
+
+    done = [r for r in results if r is not None]
+    return done, _batch_stats(len(done), sum(1 for r in done if r["error"]), elapsed)
+
+
+def stream_batch(queries: List[Dict[str, Any]],
+                 out: Optional[str],
+                 fmt: str = "jsonl",
+                 workers: int = 8,
+                 merge: bool = False,
+                 base_url: Optional[str] = None,
+                 client: Optional[HttpClient] = None,
+                 cache: Optional[HttpCache] = None) -> Dict[str, Any]:
+    """
+    取得できたページから順に、Matchup の行をクエリ条件付きで out（None / "-" は stdout）へ書き出す。
+    行は固定列（sfbuff_stream.MATCHUP_FIELDS）。失敗したクエリは stderr に出す。
+    返り値は run_batch と同じ統計に "records"（書いた行数）を足したもの。
+    """
+    from sfbuff_stream import MATCHUP_FIELDS, RecordWriter, matchup_records, open_output
+
+    pages = errors = 0
+    t0 = time.perf_counter()
+    with open_output(out) as f:
+        w = RecordWriter(f, MATCHUP_FIELDS, fmt=fmt)
+        for _, res in iter_batch(queries, workers, merge, base_url, client, cache):
+            pages += 1
+            if res["error"]:
+                errors += 1
+                print(f"[batch] {res['url']}: {res['error']}", file=sys.stderr)
+                continue
+            with stage("write", rows=len(res["rows"])):
+                w.write_many(matchup_records(res["query"], res["rows"]))
+                w.flush()  # ページ単位で下流に渡す
+        w.close()
+    stats = _batch_stats(pages, errors, time.perf_counter() - t0)
+    stats["records"] = w.count
+    return stats
+
+
+def aggregate_batch(queries: List[Dict[str, Any]],
+                    rollups: List[List[str]],
+                    workers: int = 8,
+                    merge: bool = False,
+                    base_url: Optional[str] = None,
+                    client: Optional[HttpClient] = None,
+                    cache: Optional[HttpCache] = None):
+    """
+    取得できたページから順に MatchupCube へ取り込む（行はメモリに溜めない）。
+    rollups は取り込み時に一緒に集計しておく group-by の次元リスト。
+    返り値: (cube, run_batch と同じ統計 + "failed"（取得・パースに失敗したクエリ [{"query", "url", "error"}]）)
+    """
+    from sfbuff_cube import MatchupCube
+
+    cube = MatchupCube(rollups=rollups)
+    pages = 0
+    failed: List[Dict[str, Any]] = []
+    t0 = time.perf_counter()
+    for _, res in iter_batch(queries, workers, merge, base_url, client, cache):
+        pages += 1
+        if res["error"]:
+            failed.append({"query": res["query"], "url": res["url"], "error": res["error"]})
+            print(f"[batch] {res['url']}: {res['error']}", file=sys.stderr)
+            continue
+        with stage("aggregate.cube", rows=len(res["rows"])):
+            cube.add_result(res)
+    stats = _batch_stats(pages, len(failed), time.perf_counter() - t0)
+    stats["failed"] = failed
+    return cube, stats
+
+
+# ---------------- CLI ----------------
+def _print_stats(stats: Dict[str, Any], client: HttpClient, cache: Optional[HttpCache]) -> None:
+    rows = f" / {stats['records']} rows" if "records" in stats else ""
+    print(f"[batch] {stats['pages']} pages{rows} in {stats['elapsed']:.2f}s "
+          f"({stats['pages_per_sec']} pages/s), errors={stats['errors']}", file=sys.stderr)
+    print(format_http_stats(client.stats()), file=sys.stderr)
+    if cache is not None:
+        print(format_stats(cache.stats), file=sys.stderr)
+    if client.snapshots is not None:
+        from sfbuff_snapshots import format_snapshot_stats
+        print(format_snapshot_stats(client.snapshots.stats), file=sys.stderr)
+
+
+def _write_profile(args, stats: Dict[str, Any], client: HttpClient) -> None:
+    """--profile（JSON）と --metrics（Prometheus テキスト）を書き出す。"""
+    if args.profile:
+        PROFILER.write_report(args.profile)
+    if args.metrics:
+        extra = {"batch_pages": stats["pages"], "batch_errors": stats["errors"],
+                 "batch_elapsed_seconds": stats["elapsed"]}
+        extra.update({f"http_{k}": v for k, v in client.stats().items() if v is not None})
+        PROFILER.write_prometheus(args.metrics, extra=extra)
+
+
+def _cli():
+    ap = argparse.ArgumentParser(description="SFBuff Matchup バッチクローラ")
+    ap.add_argument("manifest", help="manifest JSON のパス")
+    ap.add_argument("--workers", type=int, default=8, help="同時取得数（デフォルト:8）")
+    ap.add_argument("--merge-inputs", action="store_true",
+                    help="C/M を統合（合算してDiff/WinRateを再計算）")
+    ap.add_argument("--with-chart", action="store_true",
+                    help="表に加えて埋め込み Chart も同じパースで抽出し、結果の chart に入れる")
+    ap.add_argument("--base-url", help="https://www.sfbuff.site の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    ap.add_argument("--out", help="結果 JSON の保存先（省略時は stdout）")
+    ap.add_argument("--format", default="json", choices=["json", "jsonl", "csv"],
+                    help="出力形式（json=結果を配列1つ、jsonl/csv=取得できた順に行を固定列で流す）")
+    ap.add_argument("--group-by",
+                    help="行の代わりに集計結果を出す次元（カンマ区切り。player,character,input_type,opponent,control,period）")
+    add_http_args(ap)
+    ap.add_argument("--profile", help="段階ごとの所要時間・バイト数・行数を JSON で保存（- で stderr）")
+    ap.add_argument("--metrics", help="同じ計測を Prometheus のテキスト形式で保存")
+    ap.add_argument("--cache-dir", help="HTTPキャッシュの保存先（指定時のみ有効）")
+    ap.add_argument("--cache-max-mb", type=float, default=256, help="キャッシュの上限サイズ MB（デフォルト:256）")
+    ap.add_argument("--cache-ttl", type=float, default=300, help="未確定期間の再検証間隔 秒（デフォルト:300）")
+
+    args = ap.parse_args()
+
+    queries = expand_manifest(load_manifest(args.manifest))
+    if not queries:
+        ap.error("manifest からクエリが1件も得られませんでした")
+
+    if args.profile or args.metrics:
+        PROFILER.enable()
+    client = client_from_args(args, pool_size=max(16, args.workers))
+    cache = None
+    if args.cache_dir:
+        cache = HttpCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl)
+
+    if args.with_chart and (args.format != "json" or args.group_by):
+        ap.error("--with-chart は --format json（--group-by なし）のときだけ使えます")
+
+    if args.group_by:
+        from sfbuff_cube import DERIVED, DIMENSIONS, MEASURES
+        dims = [d.strip() for d in args.group_by.split(",") if d.strip()]
+        unknown = [d for d in dims if d not in DIMENSIONS]
+        if unknown:
+            ap.error(f"--group-by の次元が不明です: {', '.join(unknown)}")
+        cube, stats = aggregate_batch(queries, [dims], workers=args.workers, merge=args.merge_inputs,
+                                      base_url=args.base_url, client=client, cache=cache)
+        grouped = cube.group_by(dims)
+        if args.format == "json":
+            from sfbuff_stream import open_output
+            with open_output(args.out) as f:
+                json.dump(grouped, f, ensure_ascii=False)
+        else:
+            from sfbuff_stream import stream_records
+            stream_records(args.out, list(dims) + list(MEASURES + DERIVED), args.format, grouped)
+        stats["records"] = len(grouped)
+        _print_stats(stats, client, cache)
+        _write_profile(args, stats, client)
+        return
+
+    if args.format != "json":
+        stats = stream_batch(queries, args.out, fmt=args.format, workers=args.workers, merge=args.merge_inputs,
+                             base_url=args.base_url, client=client, cache=cache)
+        _print_stats(stats, client, cache)
+        _write_profile(args, stats, client)
+        return
+
+    results, stats = run_batch(queries, workers=args.workers, merge=args.merge_inputs,
+                               base_url=args.base_url, client=client, cache=cache,
+                               with_chart=args.with_chart)
+
+    with stage("write", rows=sum(len(r["rows"]) for r in results)):
+        if args.out:
+            os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(results, f, ensure_ascii=False, default=row_json_default)
+        else:
+            json.dump(results, sys.stdout, ensure_ascii=False, default=row_json_default)
+    _print_stats(stats, client, cache)
+    _write_profile(args, stats, client)
+
+
+if __name__ == "__main__":
+    _cli()
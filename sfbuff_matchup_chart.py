@@ -10,9 +10,9 @@ SFBuff Matchup Chart/Table Scraper (table-first)
 機能:
 - まずページ内の「マッチアップ表（table）」をパース
 - 表が無い/読めない場合のみ、埋め込み Chart.js をフォールバックで抽出
-- 出力はロング形式（1行=相手×入力タイプor統合）
+- 出力はロング形式（1行=相手×入力タイプor統合）。表の行は sfbuff_rows.MatchupRow（dict と同じように読める）
 - --merge-inputs で C/M を統合（Total/Wins/Losses/Draws を合算、Diff/WinRate を再計算）
-- JSON は stdout、--csv でCSV保存
+- JSON は stdout（--format jsonl/csv で1行ずつ）、--csv でCSV保存
 - --dump-html / --dump-raw-chart あり（デバッグ用）
 
 注意:
@@ -21,71 +21,32 @@ SFBuff Matchup Chart/Table Scraper (table-first)
 """
 
 import argparse
-import bs4
 import csv
 import html
 import json
 import os
 import re
 import sys
-import urllib.parse
-from typing import Any, Dict, List, Optional, Tuple
-
-import requests
-
-
-# ---------------- URL組み立て ----------------
-def build_url(player_or_url: str,
-              character_id: Optional[int] = None,
-              home_input_type_id: Optional[int] = None,
-              battle_type_id: Optional[int] = 1,
-              date_from: Optional[str] = None,
-              date_to: Optional[str] = None) -> str:
-    """プレイヤーIDから matchup_chart のURLを構築。既にURLならそのまま返す。"""
-    if player_or_url.startswith("http"):
-        return player_or_url
-
-    qs = {}
-    if character_id is not None:
-        qs["home_character_id"] = str(character_id)
-    if home_input_type_id is not None:
-        qs["home_input_type_id"] = str(home_input_type_id)
-    if battle_type_id is not None:
-        qs["battle_type_id"] = str(battle_type_id)
-    if date_from:
-        qs["played_from"] = date_from
-    if date_to:
-        qs["played_to"] = date_to
-
-    query = urllib.parse.urlencode(qs, safe="~")
-    return f"https://www.sfbuff.site/fighters/{player_or_url}/matchup_chart" + ("?" + query if query else "")
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+# bs4 / requests は使う経路（表のパース・取得）に入ったときだけ読み込む
+from sfbuff_core import (  # noqa: F401  (従来の名前で再エクスポート)
+    MATCHUP_BASE_URL as BASE_URL,
+    _rebase_url,
+    _to_float,
+    _to_int,
+    merge_inputs,
+    new_session,
+    normalize_chart_to_rows,
+)
+from sfbuff_core import matchup_chart_url as build_url
+from sfbuff_extract import BACKENDS, TABLE_PARSER, extract_matchup_frame
+from sfbuff_http import add_http_args, client_from_args, format_http_stats
+from sfbuff_profile import PROFILER, stage
+from sfbuff_rows import MatchupRow, row_fields, row_json_default
 
 
 # ---------------- 共通ヘルパ ----------------
-def _to_int(s) -> Optional[int]:
-    try:
-        if s is None:
-            return None
-        t = str(s).strip()
-        if t == "-" or t == "":
-            return None
-        return int(t.replace(",", ""))
-    except Exception:
-        return None
-
-
-def _to_float(s) -> Optional[float]:
-    try:
-        if s is None:
-            return None
-        t = str(s).strip().replace("%", "")
-        if t == "-" or t == "":
-            return None
-        return float(t)
-    except Exception:
-        return None
-
-
 def _clean_text(el) -> str:
     if el is None:
         return ""
@@ -94,10 +55,44 @@ def _clean_text(el) -> str:
     return txt
 
 
+# ---------------- パース済みドキュメント ----------------
+class MatchupDocument:
+    """
+    1ページを1回だけパースして、表パーサと Chart 抽出で使い回すための入れ物。
+    soup は初回アクセス時に作る（表が高速パスで取れた場合はパースしない）。
+    """
+
+    def __init__(self, html_text: str):
+        self.html_text = html_text
+        self._soup = None
+
+    @property
+    def soup(self):
+        if self._soup is None:
+            import bs4
+            self._soup = bs4.BeautifulSoup(self.html_text, TABLE_PARSER)
+        return self._soup
+
+
+def parse_document(html_text: str) -> MatchupDocument:
+    return MatchupDocument(html_text)
+
+
+def _as_soup(page: Union[str, MatchupDocument]):
+    """生HTML（従来互換）/ MatchupDocument / パース済み bs4 要素 のどれでも受け付ける。"""
+    if isinstance(page, MatchupDocument):
+        return page.soup
+    import bs4
+    if isinstance(page, bs4.element.Tag):
+        return page
+    return bs4.BeautifulSoup(page, TABLE_PARSER)
+
+
 # ---------------- 表パーサ ----------------
-def parse_matchup_table(html_text: str) -> List[Dict[str, Any]]:
+def parse_matchup_table(html_text: Union[str, MatchupDocument]) -> List[MatchupRow]:
     """
     <turbo-frame id="matchups-matchup-chart"> 配下の table をパース。
+    html_text は生HTMLのほか MatchupDocument も可（パース済みの木を再利用）。
     列は:
       0: VS(相手)
       1: Control (C/M)
@@ -109,7 +104,7 @@ def parse_matchup_table(html_text: str) -> List[Dict[str, Any]]:
       7: Ratio (%)  ※ <span>に入る
       8: Chartリンク（無視 or 吐きたいならURLも取れる）
     """
-    soup = bs4.BeautifulSoup(html_text, "html.parser")
+    soup = _as_soup(html_text)
     frame = soup.find("turbo-frame", {"id": "matchups-matchup-chart"})
     if frame is None:
         # ページによっては直接 table があるかもしれないので全体から探す
@@ -121,7 +116,7 @@ def parse_matchup_table(html_text: str) -> List[Dict[str, Any]]:
     if table is None:
         return []
 
-    rows: List[Dict[str, Any]] = []
+    rows: List[MatchupRow] = []
 
     tbody = table.find("tbody")
     if tbody is None:
@@ -160,17 +155,16 @@ def parse_matchup_table(html_text: str) -> List[Dict[str, Any]]:
 
         win_rate = _to_float(ratio)
 
-        rows.append({
-            "opponent": opponent,
-            "control": control,          # "C" / "M" / など
-            "total": total,
-            "wins": wins,
-            "losses": losses,
-            "draws": draws,
-            "diff": diff_val,
-            "win_rate": win_rate,        # 単位は % と想定（None の場合も）
-            # "chart": chart_url,
-        })
+        rows.append(MatchupRow(
+            opponent,
+            control,          # "C" / "M" / など
+            total,
+            wins,
+            losses,
+            draws,
+            diff_val,
+            win_rate,         # 単位は % と想定（None の場合も）
+        ))
 
     return rows
 
@@ -215,8 +209,9 @@ def _assemble_chart_from_parts(el) -> Optional[Dict[str, Any]]:
     return None
 
 
-def fetch_chart_json(html_text: str) -> Optional[Dict[str, Any]]:
-    soup = bs4.BeautifulSoup(html_text, "html.parser")
+def fetch_chart_json(html_text: Union[str, MatchupDocument]) -> Optional[Dict[str, Any]]:
+    """埋め込み Chart.js の設定を探す。生HTMLのほか MatchupDocument も可。"""
+    soup = _as_soup(html_text)
     candidates: List[Dict[str, Any]] = []
 
     for el in soup.find_all(True, attrs={"data-controller": True}):
@@ -232,91 +227,90 @@ def fetch_chart_json(html_text: str) -> Optional[Dict[str, Any]]:
     return candidates[-1] if candidates else None
 
 
-def normalize_chart_to_rows(chart: Dict[str, Any]) -> List[Dict[str, Any]]:
+# ---------------- ページ → 行 ----------------
+def parse_page(html_text: str,
+               merge: bool = False,
+               extractor: str = "auto",
+               with_chart: bool = False) -> Tuple[List[Dict[str, Any]], Optional[Dict[str, Any]]]:
     """
-    Chart をロング形式へ変換（フォールバック用・簡易）。
-    値は 'value' に入れる。入力タイプや勝敗の内訳はChart側にないことが多い。
+    1ページ分のHTMLから (出力行, Chart) を作る。ページ全体のパースは最大1回。
+    表 → (無ければ) Chart フォールバック → (任意で) C/M 統合 → diff 昇順ソート。
+    with_chart=True なら表が取れても Chart を同じパース結果から抽出して返す。
     """
-    rows: List[Dict[str, Any]] = []
-    data = chart.get("data", {})
-    labels = data.get("labels", None)
-    datasets = data.get("datasets", [])
-    if labels and datasets:
-        for ds in datasets:
-            series = ds.get("label") or "series"
-            vals = ds.get("data", [])
-            if len(vals) == len(labels):
-                for lab, val in zip(labels, vals):
-                    rows.append({
-                        "opponent": str(lab),
-                        "series": series,
-                        "value": _to_float(val) or _to_int(val),
-                    })
-    return rows
+    doc = parse_document(html_text)
 
+    # 1) 表を優先してパース（turbo-frame 部分だけ切り出せればそこだけを BeautifulSoup に渡す）
+    with stage("parse.table", len(html_text)) as st:
+        frame = extract_matchup_frame(html_text, backend="fast") if extractor != "bs4" else None
+        rows = parse_matchup_table(frame if frame is not None else doc)
+        st.rows = len(rows)
 
-# ---------------- C/M 統合（合算） ----------------
-def merge_inputs(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
-    """
-    control 列（C/M）を統合。
-    合算の上で WinRate と Diff を再計算。
-    """
-    buckets: Dict[str, Dict[str, Optional[float]]] = {}  # opponent -> aggregated stats
-
-    for r in rows:
-        opp = r.get("opponent") or ""
-        b = buckets.setdefault(opp, {
-            "opponent": opp,
-            "total": 0,
-            "wins": 0,
-            "losses": 0,
-            "draws": 0,
-        })
-        # 合算（None は無視）
-        for k in ("total", "wins", "losses", "draws"):
-            v = r.get(k)
-            if isinstance(v, int):
-                b[k] = (b[k] or 0) + v
-
-    out: List[Dict[str, Any]] = []
-    for opp, b in buckets.items():
-        total = int(b.get("total") or 0)
-        wins = int(b.get("wins") or 0)
-        losses = int(b.get("losses") or 0)
-        draws = int(b.get("draws") or 0)
-        diff = wins - losses
-        win_rate = (wins / total * 100.0) if total > 0 else None
-
-        out.append({
-            "opponent": opp,
-            "total": total,
-            "wins": wins,
-            "losses": losses,
-            "draws": draws,
-            "diff": diff,
-            "win_rate": round(win_rate, 2) if win_rate is not None else None,
-        })
-    # 相手名でソートしておくと使いやすい
-    out.sort(key=lambda x: x["opponent"])
-    return out
+    # 2) 表が見つからない／空なら、Chart をフォールバックで試す
+    chart = None
+    if with_chart or not rows:
+        with stage("parse.chart"):
+            chart = fetch_chart_json(doc)
+            if not rows:
+                rows = normalize_chart_to_rows(chart) if chart else []
+
+    # 3) 統合オプション
+    with stage("aggregate", rows=len(rows)):
+        if merge:
+            # 表パース結果には control 列(C/M)があるので合算集計
+            rows = merge_inputs(rows)
+        else:
+            # 非統合の場合は “control” が無い行（フォールバック由来）もありうる
+            # 使いやすさのためソート
+            rows.sort(key=lambda r: (r.get("opponent") or "", r.get("control") or ""))
+
+        # diff（勝ち-負け）が小さい順（負けが多い相手ほど上に）
+        rows.sort(key=lambda r: (r.get("diff") if r.get("diff") is not None else 0))
+    return rows, chart
+
+
+def rows_from_html(html_text: str,
+                   merge: bool = False,
+                   dump_raw: Optional[str] = None,
+                   extractor: str = "auto") -> List[Dict[str, Any]]:
+    """1ページ分のHTMLから出力行を作る（_cli / バッチ共通）。"""
+    rows, chart = parse_page(html_text, merge=merge, extractor=extractor)
+    if dump_raw and chart:
+        os.makedirs(os.path.dirname(dump_raw) or ".", exist_ok=True)
+        with open(dump_raw, "w", encoding="utf-8") as f:
+            json.dump(chart, f, ensure_ascii=False, indent=2)
+    return rows
 
 
 # ---------------- CSV 出力 ----------------
-def save_csv(rows: List[Dict[str, Any]], path: str) -> None:
+def save_csv(rows: List[Dict[str, Any]], path: str, fieldnames: Optional[List[str]] = None) -> None:
+    """
+    rows を CSV に保存。fieldnames を渡せばその列で書く（行を事前に走査しない。無いキーは空欄、余分なキーは捨てる）。
+    省略時は、行が全部 MatchupRow なら型の列、そうでなければ全行のキーを出現順に集めて列にする。
+    """
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
-    if not rows:
+    if not rows and fieldnames is None:
         with open(path, "w", newline="", encoding="utf-8") as f:
             f.write("")
         return
 
-    fieldnames: List[str] = []
-    for r in rows:
-        for k in r.keys():
-            if k not in fieldnames:
-                fieldnames.append(k)
+    if fieldnames is None:
+        fields = row_fields(rows)
+        if fields is not None:
+            # MatchupRow は列が決まっているので、dict を経由せず属性を直接書く（None は空欄になる）
+            from operator import attrgetter
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                w = csv.writer(f)
+                w.writerow(fields)
+                w.writerows(map(attrgetter(*fields), rows))
+            return
+        fieldnames = []
+        for r in rows:
+            for k in r.keys():
+                if k not in fieldnames:
+                    fieldnames.append(k)
 
     with open(path, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=fieldnames)
+        w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
         w.writeheader()
         w.writerows(rows)
 
@@ -335,8 +329,18 @@ def _cli():
     ap.add_argument("--merge-inputs", action="store_true",
                     help="C/M を統合（合算してDiff/WinRateを再計算）")
     ap.add_argument("--csv", dest="csv_path", help="CSVの保存先パス（指定時のみ書き出し）")
+    ap.add_argument("--format", default="json", choices=["json", "jsonl", "csv"],
+                    help="stdout の形式（jsonl/csv は固定列＋クエリ条件付きで1行ずつ流す）")
     ap.add_argument("--dump-raw-chart", dest="dump_raw", help="見つかったChart JSONを保存（フォールバック用）")
     ap.add_argument("--dump-html", dest="dump_html", help="取得HTMLを保存（デバッグ用）")
+    ap.add_argument("--base-url", help=f"{BASE_URL} の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    ap.add_argument("--extractor", default="auto", choices=["auto"] + list(BACKENDS),
+                    help="表の切り出し方式（auto=高速スキャン→失敗時BeautifulSoup）")
+    add_http_args(ap)
+    ap.add_argument("--profile", help="段階ごとの所要時間・バイト数・行数を JSON で保存（- で stderr）")
+    ap.add_argument("--cache-dir", help="HTTPキャッシュの保存先（指定時のみ有効）")
+    ap.add_argument("--cache-max-mb", type=float, default=256, help="キャッシュの上限サイズ MB（デフォルト:256）")
+    ap.add_argument("--cache-ttl", type=float, default=300, help="未確定期間の再検証間隔 秒（デフォルト:300）")
 
     args = ap.parse_args()
 
@@ -347,15 +351,31 @@ def _cli():
         battle_type_id=args.battle_type_id,
         date_from=args.date_from,
         date_to=args.date_to,
+        base_url=args.base_url,
     )
 
+    if args.profile:
+        PROFILER.enable()
+
     # 取得
-    sess = requests.Session()
-    sess.headers.update({"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"})
-    sess.cookies.set("timezone", "Asia/Tokyo")
-    resp = sess.get(url, timeout=20)
+    sess = client = client_from_args(args)
+    cache = None
+    if args.cache_dir:
+        from sfbuff_cache import CachedSession, HttpCache, format_stats
+        cache = HttpCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl)
+        sess = CachedSession(sess, cache)
+    resp = sess.get(url)
     resp.raise_for_status()
-    html_text = resp.text
+    with stage("decode", len(resp.content)):
+        html_text = resp.text
+    if cache is not None:
+        print(format_stats(cache.stats), file=sys.stderr)
+    http_stats = client.stats()
+    if http_stats["retries"] or http_stats["gave_up"]:
+        print(format_http_stats(http_stats), file=sys.stderr)
+    if client.snapshots is not None:
+        from sfbuff_snapshots import format_snapshot_stats
+        print(format_snapshot_stats(client.snapshots.stats), file=sys.stderr)
 
     # 要求があればHTMLダンプ
     if args.dump_html:
@@ -363,36 +383,24 @@ def _cli():
         with open(args.dump_html, "w", encoding="utf-8") as f:
             f.write(html_text)
 
-    # 1) 表を優先してパース
-    rows = parse_matchup_table(html_text)
+    rows = rows_from_html(html_text, merge=args.merge_inputs, dump_raw=args.dump_raw,
+                          extractor=args.extractor)
 
-    # 2) 表が見つからない／空なら、Chart をフォールバックで試す
-    if not rows:
-        chart = fetch_chart_json(html_text)
-        if args.dump_raw and chart:
-            os.makedirs(os.path.dirname(args.dump_raw) or ".", exist_ok=True)
-            with open(args.dump_raw, "w", encoding="utf-8") as f:
-                json.dump(chart, f, ensure_ascii=False, indent=2)
-        rows = normalize_chart_to_rows(chart) if chart else []
-
-    # 3) 統合オプション
-    if args.merge_inputs:
-        # 表パース結果には control 列(C/M)があるので合算集計
-        rows = merge_inputs(rows)
-    else:
-        # 非統合の場合は “control” が無い行（フォールバック由来）もありうる
-        # 使いやすさのためソート
-        rows.sort(key=lambda r: (r.get("opponent") or "", r.get("control") or ""))
-
-    # diff（勝ち-負け）が小さい順（負けが多い相手ほど上に）
-    rows.sort(key=lambda r: (r.get("diff") if r.get("diff") is not None else 0))
-    
-    # 4) JSON を標準出力へ
-    json.dump(rows, sys.stdout, ensure_ascii=False)
+    # 4) 標準出力へ（json は従来どおり配列1つ、jsonl/csv は1行ずつ）
+    with stage("write", rows=len(rows)):
+        if args.format == "json":
+            json.dump(rows, sys.stdout, ensure_ascii=False, default=row_json_default)
+        else:
+            from sfbuff_stream import MATCHUP_FIELDS, matchup_records, query_from_url, stream_records
+            stream_records(None, MATCHUP_FIELDS, args.format, matchup_records(query_from_url(url), rows))
 
     # 5) CSV 保存
     if args.csv_path:
-        save_csv(rows, args.csv_path)
+        with stage("write.csv", rows=len(rows)):
+            save_csv(rows, args.csv_path)
+
+    if args.profile:
+        PROFILER.write_report(args.profile)
 
 
 if __name__ == "__main__":
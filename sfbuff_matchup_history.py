@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Matchup の時系列（週 / 月ごとの窓に分けて並列取得）
+
+- --from / --to の期間を週（月曜始まり）か月の窓に分割し、窓ごとの matchup_chart を
+  sfbuff_matchup_batch のスレッドプールで同時に取得・パース
+- 窓ごとの行を sfbuff_cube.MatchupCube に period 次元付きで取り込み、相手ごと（--by-control なら相手×C/M）の
+  時系列 wins / losses / draws / diff / win_rate を出す（試合の無い窓は 0 件として埋める）
+- 取得に失敗した窓は 0 件と区別できるよう、値を null にして "error" に理由を入れる。
+  失敗した窓があれば出力を書いたうえで終了コード 1
+- 取得は HTTP キャッシュ経由。played_to が今日より前の窓は「閉じた期間」として無期限に再利用されるので、
+  2回目以降は今日を含む窓だけを取りに行く
+
+使い方:
+  python sfbuff_matchup_history.py 3629769034 -c 5 --from 2025-05-01 --to 2025-08-31 --step month
+  python sfbuff_matchup_history.py 3629769034 -c 5 --from 2025-07-01 --step week --format csv > dist/weekly.csv
+"""
+
+import argparse
+import calendar
+import json
+import sys
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sfbuff_cache import HttpCache
+from sfbuff_cube import DERIVED, MEASURES, MatchupCube, period_label
+from sfbuff_http import HttpClient, add_http_args, client_from_args
+from sfbuff_matchup_batch import _print_stats, _write_profile, aggregate_batch
+from sfbuff_profile import PROFILER, stage
+
+STEPS = ("week", "month")
+DEFAULT_CACHE_DIR = "dist/matchup_cache"
+
+Window = Tuple[str, str]
+
+
+# ---------------- 期間の分割 ----------------
+def split_windows(date_from: str, date_to: str, step: str = "week") -> List[Window]:
+    """
+    [date_from, date_to]（両端含む）を週（月曜始まり）または暦月の窓に分割。
+    端の窓は期間に合わせて切り詰める。返り値: [("YYYY-MM-DD", "YYYY-MM-DD"), ...] 古い順。
+    """
+    if step not in STEPS:
+        raise ValueError(f"未対応の step です: {step}（{', '.join(STEPS)}）")
+    start = date.fromisoformat(date_from[:10])
+    end = date.fromisoformat(date_to[:10])
+    if end < start:
+        raise ValueError(f"期間が逆です: {date_from} > {date_to}")
+
+    windows: List[Window] = []
+    cur = start
+    while cur <= end:
+        if step == "week":
+            last = cur + timedelta(days=6 - cur.weekday())
+        else:
+            last = cur.replace(day=calendar.monthrange(cur.year, cur.month)[1])
+        last = min(last, end)
+        windows.append((cur.isoformat(), last.isoformat()))
+        cur = last + timedelta(days=1)
+    return windows
+
+
+def window_queries(player: str,
+                   windows: List[Window],
+                   character: Optional[int] = None,
+                   input_type: Optional[int] = None,
+                   battle_type: Optional[int] = 1) -> List[Dict[str, Any]]:
+    """窓ごとのクエリ（sfbuff_matchup_batch と同じ形）。"""
+    return [{
+        "player": str(player),
+        "character": character,
+        "input_type": input_type,
+        "battle_type": battle_type,
+        "from": w_from,
+        "to": w_to,
+    } for w_from, w_to in windows]
+
+
+# ---------------- 時系列 ----------------
+def matchup_series(cube: MatchupCube,
+                   windows: List[Window],
+                   by_control: bool = False,
+                   failed: Optional[Dict[Window, str]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    cube から相手ごとの時系列を作る。キーは相手名（by_control なら "相手 (C)" 形式）。
+    各要素は {"from", "to", total, wins, losses, draws, diff, win_rate}（窓の古い順、試合の無い窓も含む）。
+    failed（窓 → エラー）に入っている窓は値をすべて None にし、"error" を付ける。
+    """
+    failed = failed or {}
+    dims = ["opponent", "control", "period"] if by_control else ["opponent", "period"]
+    cells: Dict[Tuple, Dict[str, Any]] = {}
+    names: List[Tuple] = []
+    for rec in cube.group_by(dims):
+        name = tuple(rec[d] for d in dims[:-1])
+        if name not in cells:
+            names.append(name)
+        cells[name + (rec["period"],)] = rec
+
+    out: Dict[str, List[Dict[str, Any]]] = {}
+    for name in sorted(set(names), key=lambda n: tuple(str(v or "") for v in n)):
+        label = name[0] if not by_control or name[1] is None else f"{name[0]} ({name[1]})"
+        series = []
+        for w_from, w_to in windows:
+            rec = cells.get(name + (period_label(w_from, w_to),))
+            point = {"from": w_from, "to": w_to}
+            if (w_from, w_to) in failed:
+                point.update({k: None for k in MEASURES + DERIVED})
+                point["error"] = failed[(w_from, w_to)]
+            elif rec is None:
+                point.update({"total": 0, "wins": 0, "losses": 0, "draws": 0, "diff": 0, "win_rate": None})
+            else:
+                point.update({k: rec[k] for k in MEASURES + DERIVED})
+            series.append(point)
+        out[label] = series
+    return out
+
+
+def fetch_matchup_history(player: str,
+                          date_from: str,
+                          date_to: str,
+                          step: str = "week",
+                          character: Optional[int] = None,
+                          input_type: Optional[int] = None,
+                          battle_type: Optional[int] = 1,
+                          by_control: bool = False,
+                          workers: int = 8,
+                          base_url: Optional[str] = None,
+                          client: Optional[HttpClient] = None,
+                          cache: Optional[HttpCache] = None):
+    """
+    期間を窓に分けて並列取得し、(相手ごとの時系列, 窓のリスト, 取得統計) を返す。
+    by_control=False なら C/M を合算した時系列。取得に失敗した窓は統計の "failed" にも入る。
+    """
+    windows = split_windows(date_from, date_to, step)
+    queries = window_queries(player, windows, character, input_type, battle_type)
+    dims = ["opponent", "control", "period"] if by_control else ["opponent", "period"]
+    cube, stats = aggregate_batch(queries, [dims], workers=workers, base_url=base_url,
+                                  client=client, cache=cache)
+    failed = {(f["query"]["from"], f["query"]["to"]): f["error"] for f in stats["failed"]}
+    return matchup_series(cube, windows, by_control=by_control, failed=failed), windows, stats
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="SFBuff Matchup の週 / 月ごとの時系列")
+    ap.add_argument("player", help="プレイヤーID")
+    ap.add_argument("-c", "--character", type=int, help="home_character_id の値")
+    ap.add_argument("--home-input", type=int, dest="home_input_type_id",
+                    help="home_input_type_id (0=Classic, 1=Modern 等、サイト表記に準拠)")
+    ap.add_argument("--battle-type", type=int, dest="battle_type_id", default=1,
+                    help="battle_type_id (例: 1=Ranked) デフォルト:1")
+    ap.add_argument("--from", dest="date_from", required=True, help="開始日 YYYY-MM-DD")
+    ap.add_argument("--to", dest="date_to", help="終了日 YYYY-MM-DD（省略時は今日）")
+    ap.add_argument("--step", default="week", choices=STEPS, help="窓の単位（デフォルト: week）")
+    ap.add_argument("--by-control", action="store_true", help="C/M を分けた時系列にする（デフォルトは合算）")
+    ap.add_argument("--workers", type=int, default=8, help="同時取得数（デフォルト:8）")
+    ap.add_argument("--format", default="json", choices=["json", "jsonl", "csv"],
+                    help="json=相手ごとの時系列、jsonl/csv=1行=相手×窓")
+    ap.add_argument("--out", help="保存先（省略時は stdout）")
+    ap.add_argument("--base-url", help="https://www.sfbuff.site の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    add_http_args(ap)
+    ap.add_argument("--profile", help="段階ごとの所要時間・バイト数・行数を JSON で保存（- で stderr）")
+    ap.add_argument("--metrics", help="同じ計測を Prometheus のテキスト形式で保存")
+    ap.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                    help=f"HTTPキャッシュの保存先（閉じた窓の再利用に使う。デフォルト: {DEFAULT_CACHE_DIR}）")
+    ap.add_argument("--cache-max-mb", type=float, default=256, help="キャッシュの上限サイズ MB（デフォルト:256）")
+    ap.add_argument("--cache-ttl", type=float, default=300, help="未確定期間の再検証間隔 秒（デフォルト:300）")
+
+    args = ap.parse_args()
+    date_to = args.date_to or datetime.today().strftime("%Y-%m-%d")
+    try:
+        split_windows(args.date_from, date_to, args.step)
+    except ValueError as e:
+        ap.error(str(e))
+
+    if args.profile or args.metrics:
+        PROFILER.enable()
+    client = client_from_args(args, pool_size=max(16, args.workers))
+    cache = HttpCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl)
+
+    series, windows, stats = fetch_matchup_history(
+        args.player, args.date_from, date_to, step=args.step,
+        character=args.character, input_type=args.home_input_type_id, battle_type=args.battle_type_id,
+        by_control=args.by_control, workers=args.workers, base_url=args.base_url,
+        client=client, cache=cache,
+    )
+
+    from sfbuff_stream import open_output, stream_records
+    with stage("write"):
+        if args.format == "json":
+            with open_output(args.out) as f:
+                errors = [{"from": f["query"]["from"], "to": f["query"]["to"], "error": f["error"]}
+                          for f in stats["failed"]]
+                json.dump({"windows": windows, "series": series, "errors": errors}, f, ensure_ascii=False)
+        else:
+            recs = ({"opponent": name, **point} for name, points in series.items() for point in points)
+            stats["records"] = stream_records(args.out, ("opponent", "from", "to") + MEASURES + DERIVED + ("error",),
+                                              args.format, recs)
+    print(f"[history] {len(windows)} windows ({args.step}), {len(series)} opponents", file=sys.stderr)
+    _print_stats(stats, client, cache)
+    _write_profile(args, stats, client)
+    if stats["errors"]:
+        print(f"[history] {stats['errors']} windows failed (their points are null)", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    _cli()
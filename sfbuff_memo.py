@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+
+"""
+パイプライン（取得 → パース → 平滑化 → 描画）の段階ごとのメモ化（入力の内容ハッシュがキー）
+
+ディレクトリ構成:
+  parse/ab/<key>.json   … ページ本文 → 点列 [{"d", "r"}, ...]
+  smooth/ab/<key>.npz   … 点列 + 窓幅 + シーズン閾値 → シーズン区間と SMA/EMA
+  render/ab/<key>.png   … 点列 + 描画オプション → PNG（SVG で出したものは .svg）
+
+- キーは「段階名・その段階のコードの指紋・入力」の sha256。入力が同じなら前回の出力をそのまま使う
+  * parse: ページ本文のバイト列 + 抽出方式
+  * smooth: 点列のハッシュ + --ma / --ema + --season-threshold
+  * render: 点列のハッシュ + 描画オプション（生成日時のスタンプは含めない。ヒットしたら前回描いたときの時刻のまま）
+- コードの指紋は段階ごとに関係するモジュールのソース（と matplotlib のバージョン）のハッシュ。
+  描画や平滑化のコードを直したら自動で別キーになるので、古い出力を消す必要はない
+- 上限や削除はない（ディレクトリごと消してよい。次回は全部作り直すだけ）
+- 取得そのものは省かない。閉じた期間の再取得は --cache-dir（HttpCache）で、変わらないページはここで省ける
+
+使い方:
+  memo = StageMemo("dist/memo")
+  key = memo.key("render", digest_data(data), {"ma_windows": [50]})
+  if not memo.copy_out("render", key, ".png", "out.png"):
+      ...描画して out.png を保存...
+      memo.save_file("render", key, ".png", "out.png")
+  print(format_memo_stats(memo.stats))
+"""
+
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import threading
+from typing import Any, Dict, Optional
+
+STAGES = ("parse", "smooth", "render")
+
+# 形式を変えたら上げる（全段階のキーが変わる）
+MEMO_VERSION = 1
+
+# 段階ごとに出力を左右するモジュール（ソースのハッシュをキーに混ぜる）
+STAGE_MODULES = {
+    "parse": ("sfbuff_extract", "sfbuff_core"),
+    "smooth": ("sfbuff_rolling",),
+    "render": ("sfbuff_rank_history", "sfbuff_rolling", "sfbuff_downsample", "sfbuff_timecol",
+               "sfbuff_native_chart", "sfbuff_core"),
+}
+
+# 描画のキーに含めないオプション（出力の中身を決めない / 毎回変わる）
+RENDER_KEY_EXCLUDE = frozenset(("generated_at_str", "show", "out_path"))
+
+
+# ---------------- ハッシュ ----------------
+def digest_bytes(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+
+def digest_file(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def digest_data(data: Any) -> str:
+    """JSON にできる値（点列など）のハッシュ。"""
+    return digest_bytes(json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+
+
+def render_key_options(opts: Dict[str, Any]) -> Dict[str, Any]:
+    """描画オプションのうちキーに使うもの（生成日時などを除く）。"""
+    return {k: v for k, v in opts.items() if k not in RENDER_KEY_EXCLUDE}
+
+
+def _code_fingerprint(stage: str) -> str:
+    """段階に関係するモジュールのソースのハッシュ（import はしない）。"""
+    h = hashlib.sha256()
+    for name in STAGE_MODULES.get(stage, ()):
+        spec = importlib.util.find_spec(name)
+        origin = spec.origin if spec is not None else None
+        if origin and os.path.exists(origin):
+            with open(origin, "rb") as f:
+                h.update(f.read())
+        h.update(b"\0")
+    if stage == "render":
+        try:
+            from importlib.metadata import version
+            h.update(version("matplotlib").encode("ascii"))
+        except Exception:
+            pass
+    return h.hexdigest()
+
+
+# ---------------- 保存先 ----------------
+class StageMemo:
+    """段階ごとの出力の保存先。複数スレッド・複数プロセスから同じディレクトリを使ってよい。"""
+
+    def __init__(self, root: str):
+        self.root = os.path.expanduser(root)
+        self.stats: Dict[str, Dict[str, int]] = {s: {"hits": 0, "misses": 0} for s in STAGES}
+        self._fingerprints: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.root, exist_ok=True)
+
+    def fingerprint(self, stage: str) -> str:
+        fp = self._fingerprints.get(stage)
+        if fp is None:
+            fp = self._fingerprints[stage] = _code_fingerprint(stage)
+        return fp
+
+    def key(self, stage: str, *parts: Any) -> str:
+        """段階名・コードの指紋・入力（bytes はそのまま、それ以外は JSON）から作るキー。"""
+        h = hashlib.sha256(f"{stage}\n{MEMO_VERSION}\n{self.fingerprint(stage)}\n".encode("utf-8"))
+        for p in parts:
+            if isinstance(p, (bytes, bytearray, memoryview)):
+                h.update(p)
+            else:
+                h.update(json.dumps(p, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8"))
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def path(self, stage: str, key: str, ext: str) -> str:
+        return os.path.join(self.root, stage, key[:2], key + ext)
+
+    def _count(self, stage: str, hit: bool) -> None:
+        with self._lock:
+            self.stats[stage]["hits" if hit else "misses"] += 1
+
+    def _tmp_path(self, path: str) -> str:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+    # --- JSON（parse） ---
+    def load_json(self, stage: str, key: str) -> Optional[Any]:
+        try:
+            with open(self.path(stage, key, ".json"), "r", encoding="utf-8") as f:
+                obj = json.load(f)
+        except (OSError, ValueError):
+            self._count(stage, False)
+            return None
+        self._count(stage, True)
+        return obj
+
+    def save_json(self, stage: str, key: str, obj: Any) -> None:
+        path = self.path(stage, key, ".json")
+        tmp = self._tmp_path(path)
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(obj, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    # --- NumPy 配列（smooth） ---
+    def load_arrays(self, stage: str, key: str) -> Optional[Dict[str, Any]]:
+        import numpy as np
+        try:
+            with np.load(self.path(stage, key, ".npz")) as z:
+                arrays = {name: z[name] for name in z.files}
+        except (OSError, ValueError):
+            self._count(stage, False)
+            return None
+        self._count(stage, True)
+        return arrays
+
+    def save_arrays(self, stage: str, key: str, arrays: Dict[str, Any]) -> None:
+        import numpy as np
+        path = self.path(stage, key, ".npz")
+        tmp = self._tmp_path(path)
+        with open(tmp, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, path)
+
+    # --- ファイル（render） ---
+    def copy_out(self, stage: str, key: str, ext: str, dest: str) -> bool:
+        """保存済みの出力があれば dest にコピーして True。"""
+        try:
+            shutil.copyfile(self.path(stage, key, ext), dest)
+        except OSError:
+            self._count(stage, False)
+            return False
+        self._count(stage, True)
+        return True
+
+    def save_file(self, stage: str, key: str, ext: str, src: str) -> None:
+        path = self.path(stage, key, ext)
+        tmp = self._tmp_path(path)
+        shutil.copyfile(src, tmp)
+        os.replace(tmp, path)
+
+
+def format_memo_stats(stats: Dict[str, Dict[str, int]]) -> str:
+    parts = [f"{s}={v['hits']}/{v['hits'] + v['misses']}" for s, v in stats.items() if v["hits"] or v["misses"]]
+    return "[memo] hits/lookups " + (" ".join(parts) or "-")
@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SFBuff ローカル代替サーバ（負荷試験・オフライン開発用）
+
+- /fighters/{id}/ranked_history : data-chartjs-data-value を持つ div（MR の点列）
+- /fighters/{id}/matchup_chart  : <turbo-frame id="matchups-matchup-chart"> 配下の table
+- home_character_id / home_input_type_id / played_from / played_to を解釈
+  （同じ条件なら毎回同じ内容。played_from/to は timezone cookie の日付で絞り込み）
+- ETag を付け、If-None-Match が一致すれば 304
+- 障害注入: 遅延、429（Retry-After 付き）、5xx、途中で切れたボディ
+- --live-rate を指定すると、起動後も時間経過に応じて試合が増えていく（差分同期の確認用）
+
+使い方:
+  python sfbuff_mock_server.py --port 8000 --latency 0.05 --rate-429 0.05
+  python sfbuff_rank_history.py 123 -c 5 --base-url http://127.0.0.1:8000
+  python sfbuff_matchup_chart.py 123 -c 5 --base-url http://127.0.0.1:8000
+
+コードから:
+  server, base_url = start_mock_server(latency=0.01)
+  ...
+  server.shutdown()
+"""
+
+import argparse
+import hashlib
+import html
+import json
+import random
+import re
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+
+CHARACTERS = [
+    "Ryu", "Luke", "Jamie", "Chun-Li", "Guile", "Kimberly", "Juri", "Ken",
+    "Blanka", "Dhalsim", "E.Honda", "Dee Jay", "Manon", "Marisa", "JP", "Zangief",
+    "Lily", "Cammy", "Rashid", "A.K.I.", "Ed", "Akuma", "M.Bison", "Terry",
+    "Mai", "Elena", "Sagat", "C.Viper", "Alex", "Ingrid",
+]
+
+MATCH_INTERVAL_MS = 600_000  # 1試合 = 10分間隔
+
+_FILLER = "<div class=\"nav\"><ul>" + "<li><a href=\"#\">menu</a></li>" * 20 + "</ul></div>\n"
+
+
+def _seed(*parts) -> int:
+    return zlib.crc32("|".join(str(p) for p in parts).encode("utf-8"))
+
+
+# ---------------- ページ生成 ----------------
+def rank_points(n: int, seed: int = 0, season_every: int = 2000,
+                t0_ms: int = 1_714_500_000_000) -> List[dict]:
+    """ランダムウォークの MR 点列。season_every 試合ごとに大きくジャンプ（シーズン切替）。"""
+    rnd = random.Random(seed)
+    y = 1500.0
+    pts = []
+    for i in range(n):
+        if i and season_every and i % season_every == 0:
+            y = 1500.0 + rnd.uniform(-60, 60)  # リセット
+        y += rnd.choice((-1, 1)) * rnd.uniform(5, 20)
+        pts.append({"x": t0_ms + i * MATCH_INTERVAL_MS, "y": round(y)})
+    return pts
+
+
+def rank_history_page(n: int = 0, seed: int = 0, points: Optional[List[dict]] = None) -> str:
+    chart = {
+        "type": "line",
+        "data": {"datasets": [{"label": "MR", "yAxisID": "mr",
+                               "data": points if points is not None else rank_points(n, seed)}]},
+        "options": {"parsing": False},
+    }
+    return ("<!DOCTYPE html><html><head><title>Ranked History</title></head><body>" + _FILLER * 40 +
+            '<turbo-frame id="ranked-history">'
+            f'<div data-controller="chartjs" data-chartjs-data-value="{html.escape(json.dumps(chart))}"></div>'
+            "</turbo-frame>" + _FILLER * 10 + "</body></html>")
+
+
+def matchup_rows(n_opponents: int, seed: int = 0, scale: float = 1.0) -> List[dict]:
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n_opponents):
+        name = CHARACTERS[i % len(CHARACTERS)] + ("" if i < len(CHARACTERS) else f" {i // len(CHARACTERS)}")
+        for ctl in ("C", "M"):
+            total = int(rnd.randint(0, 60) * scale)
+            wins = rnd.randint(0, total)
+            draws = rnd.randint(0, min(2, total - wins))
+            losses = total - wins - draws
+            rows.append({"opponent": name, "control": ctl, "total": total,
+                         "wins": wins, "losses": losses, "draws": draws})
+    return rows
+
+
+def matchup_chart_page(n_opponents: int = 30, seed: int = 0,
+                       rows: Optional[List[dict]] = None) -> str:
+    rows = rows if rows is not None else matchup_rows(n_opponents, seed)
+    trs = []
+    for r in rows:
+        diff = r["wins"] - r["losses"]
+        ratio = f"{r['wins'] / r['total'] * 100:.1f}" if r["total"] else "-"
+        diff_s = f"{diff:+d}" if r["total"] else "-"
+        trs.append(
+            f"<tr><td><a href=\"#\">{html.escape(r['opponent'])}</a></td><td>{r['control']}</td>"
+            f"<td>{r['total']}</td><td>{r['wins']}</td><td>{r['losses']}</td><td>{r['draws']}</td>"
+            f"<td><span class=\"{'text-success' if diff >= 0 else 'text-danger'}\">{diff_s}</span></td>"
+            f"<td><span>{ratio}</span></td><td><a href=\"#\">Chart</a></td></tr>")
+    tot = [sum(r[k] for r in rows) for k in ("total", "wins", "losses", "draws")]
+    trs.append(f"<tr><td colspan=\"2\"></td><td>{tot[0]}</td><td>{tot[1]}</td><td>{tot[2]}</td><td>{tot[3]}</td>"
+               f"<td>{tot[1] - tot[2]:+d}</td><td>-</td><td></td></tr>")
+    return ("<!DOCTYPE html><html><body>" + _FILLER * 40 +
+            '<turbo-frame id="matchups-matchup-chart"><table class="table"><thead><tr>'
+            "<th>VS</th><th></th><th>Total</th><th>W</th><th>L</th><th>D</th><th>Σ</th><th>%</th><th></th>"
+            "</tr></thead><tbody>" + "".join(trs) + "</tbody></table></turbo-frame>" +
+            _FILLER * 10 + "</body></html>")
+
+
+def matchup_chart_only_page(n_opponents: int = 30, seed: int = 0) -> str:
+    """表が無く Chart.js だけがあるページ（fetch_chart_json フォールバック経路用）。"""
+    rows = matchup_rows(n_opponents, seed)
+    labels = sorted({r["opponent"] for r in rows})
+    wins = {lab: sum(r["wins"] for r in rows if r["opponent"] == lab) for lab in labels}
+    losses = {lab: sum(r["losses"] for r in rows if r["opponent"] == lab) for lab in labels}
+    chart = {"data": {"labels": labels, "datasets": [
+        {"label": "Wins", "data": [wins[lab] for lab in labels]},
+        {"label": "Losses", "data": [losses[lab] for lab in labels]},
+    ]}}
+    return ("<!DOCTYPE html><html><body>" + _FILLER * 40 +
+            f'<div data-controller="chartjs" data-chartjs-data-value="{html.escape(json.dumps(chart))}"></div>' +
+            _FILLER * 10 + "</body></html>")
+
+
+# ---------------- サーバ ----------------
+class MockConfig:
+    """サーバ全体の設定（ハンドラから参照）。"""
+
+    def __init__(self,
+                 matches: int = 5000,
+                 opponents: int = 30,
+                 live_rate: float = 0.0,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 rate_429: float = 0.0,
+                 rate_5xx: float = 0.0,
+                 rate_truncate: float = 0.0,
+                 retry_after: float = 1.0,
+                 seed: int = 0):
+        self.matches = matches
+        self.opponents = opponents
+        self.live_rate = live_rate
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_truncate = rate_truncate
+        self.retry_after = retry_after
+        self.seed = seed
+        self.started_at = time.time()
+        # 最終試合 = 起動時刻 になるよう過去側に並べる
+        self.t0_ms = int(self.started_at * 1000) - matches * MATCH_INTERVAL_MS
+        self.rnd = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def visible_matches(self) -> int:
+        extra = int((time.time() - self.started_at) / 60.0 * self.live_rate) if self.live_rate > 0 else 0
+        return self.matches + extra
+
+    def roll(self) -> float:
+        with self.lock:
+            self.requests += 1
+            return self.rnd.random()
+
+
+@lru_cache(maxsize=64)
+def _player_points(seed: int, n: int, t0_ms: int) -> Tuple[dict, ...]:
+    return tuple(rank_points(n, seed, t0_ms=t0_ms))
+
+
+def _day_bounds_ms(date_from: Optional[str], date_to: Optional[str], tz) -> Tuple[Optional[int], Optional[int]]:
+    lo = hi = None
+    if date_from:
+        d = datetime.strptime(date_from[:10], "%Y-%m-%d").replace(tzinfo=tz)
+        lo = int(d.timestamp() * 1000)
+    if date_to:
+        d = datetime.strptime(date_to[:10], "%Y-%m-%d").replace(tzinfo=tz) + timedelta(days=1)
+        hi = int(d.timestamp() * 1000)
+    return lo, hi
+
+
+def _cookie_tz(cookie_header: Optional[str]):
+    m = re.search(r"(?:^|;\s*)timezone=([^;]+)", cookie_header or "")
+    name = urllib.parse.unquote(m.group(1)) if m else "Asia/Tokyo"
+    try:
+        from zoneinfo import ZoneInfo
+        return ZoneInfo(name)
+    except Exception:
+        return timezone(timedelta(hours=9))
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    config: MockConfig = MockConfig()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    # --- ルーティング ---
+    def do_GET(self):
+        cfg = self.config
+        if cfg.latency or cfg.jitter:
+            time.sleep(max(0.0, cfg.latency + random.uniform(-cfg.jitter, cfg.jitter)))
+
+        r = cfg.roll()
+        if r < cfg.rate_429:
+            return self._send_status(429, {"Retry-After": f"{cfg.retry_after:g}"})
+        r -= cfg.rate_429
+        if r < cfg.rate_5xx:
+            return self._send_status(random.choice((500, 502, 503)))
+        r -= cfg.rate_5xx
+        truncate = r < cfg.rate_truncate
+
+        parts = urllib.parse.urlsplit(self.path)
+        qs = dict(urllib.parse.parse_qsl(parts.query))
+        m = re.match(r"^/fighters/([^/]+)/(ranked_history|matchup_chart)/?$", parts.path)
+        if not m:
+            return self._send_status(404)
+        player, kind = m.groups()
+        tz = _cookie_tz(self.headers.get("Cookie"))
+        if kind == "ranked_history":
+            body = self._ranked_history(player, qs, tz)
+        else:
+            body = self._matchup_chart(player, qs)
+        self._send_body(body.encode("utf-8"), truncate=truncate)
+
+    def _ranked_history(self, player: str, qs: Dict[str, str], tz) -> str:
+        cfg = self.config
+        seed = _seed(cfg.seed, player, qs.get("home_character_id", ""))
+        pts = _player_points(seed, cfg.visible_matches(), cfg.t0_ms)
+        lo, hi = _day_bounds_ms(qs.get("played_from"), qs.get("played_to"), tz)
+        sel = [p for p in pts if (lo is None or p["x"] >= lo) and (hi is None or p["x"] < hi)]
+        return rank_history_page(points=sel)
+
+    def _matchup_chart(self, player: str, qs: Dict[str, str]) -> str:
+        cfg = self.config
+        seed = _seed(cfg.seed, player, qs.get("home_character_id", ""), qs.get("home_input_type_id", ""),
+                     qs.get("battle_type_id", ""), qs.get("played_from", ""), qs.get("played_to", ""))
+        # 期間指定があれば日数に比例して試合数を増減
+        scale = 1.0
+        if qs.get("played_from") and qs.get("played_to"):
+            try:
+                days = (datetime.strptime(qs["played_to"][:10], "%Y-%m-%d") -
+                        datetime.strptime(qs["played_from"][:10], "%Y-%m-%d")).days + 1
+                scale = max(0.0, days / 30.0)
+            except ValueError:
+                pass
+        return matchup_chart_page(rows=matchup_rows(cfg.opponents, seed, scale))
+
+    # --- 送信 ---
+    def _send_status(self, code: int, headers: Optional[Dict[str, str]] = None):
+        body = f"{code}\n".encode("utf-8")
+        self.send_response(code)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_body(self, body: bytes, truncate: bool = False):
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(body)))
+        if truncate:
+            # 宣言より短いボディを送って切断
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(body[:max(1, len(body) // 3)])
+            self.close_connection = True
+            return
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_mock_server(host: str = "127.0.0.1", port: int = 0, **config) -> Tuple[ThreadingHTTPServer, str]:
+    """別スレッドで起動して (server, base_url) を返す。config は MockConfig の引数。"""
+    handler = type("Handler", (MockHandler,), {"config": MockConfig(**config)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="SFBuff ローカル代替サーバ")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8000)
+    ap.add_argument("--matches", type=int, default=5000, help="プレイヤーごとの試合数（デフォルト:5000）")
+    ap.add_argument("--opponents", type=int, default=30, help="matchup 表の相手数（デフォルト:30）")
+    ap.add_argument("--live-rate", type=float, default=0.0, help="起動後に増える試合数 / 分")
+    ap.add_argument("--latency", type=float, default=0.0, help="応答遅延（秒）")
+    ap.add_argument("--jitter", type=float, default=0.0, help="遅延の揺らぎ ±秒")
+    ap.add_argument("--rate-429", type=float, default=0.0, help="429 を返す確率")
+    ap.add_argument("--rate-5xx", type=float, default=0.0, help="5xx を返す確率")
+    ap.add_argument("--rate-truncate", type=float, default=0.0, help="ボディを途中で切る確率")
+    ap.add_argument("--retry-after", type=float, default=1.0, help="429 の Retry-After 秒")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    config = MockConfig(matches=args.matches, opponents=args.opponents, live_rate=args.live_rate,
+                        latency=args.latency, jitter=args.jitter, rate_429=args.rate_429,
+                        rate_5xx=args.rate_5xx, rate_truncate=args.rate_truncate,
+                        retry_after=args.retry_after, seed=args.seed)
+    handler = type("Handler", (MockHandler,), {"config": config})
+    server = ThreadingHTTPServer((args.host, args.port), handler)
+    server.daemon_threads = True
+    print(f"[mock] listening on http://{args.host}:{server.server_address[1]}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    _cli()
@@ -0,0 +1,442 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History のグラフを matplotlib を使わずに描く（SVG は標準ライブラリだけ、PNG は Pillow）
+
+- plot_rank_history（fast_layout）と同じ図: 11x5 inch / 120 dpi、生データ＋SMA/EMA（シーズンごと）、
+  目盛りとシーズン境界の点線、グリッド、x/y の目盛り、日付ラベル（青・45度）、右下のスタンプ
+  * 色は matplotlib の既定の色の順番（tab10）を線1本ごとに進める（シーズンごとの線も1本と数える。matplotlib と同じ割り当て）
+  * y の範囲は描く線の最小〜最大に 5% の余白。目盛りは 1 / 2 / 2.5 / 5 / 10 刻みで 9 区間以内（AutoLocator 相当）
+- 平滑化は sfbuff_core の split_seasons_by_jump / moving_average / exponential_moving_average（NumPy も読み込まない）
+- 点が多いときは横1ピクセルの列ごとに先頭・最小・最大・末尾の4点だけ残す（M4。ラスタライズした見た目はほぼ変わらない）
+- 出力の形式は拡張子で決める（.svg → SVG、それ以外 → PNG）。PNG は Pillow で2倍の大きさに描いて縮小する（アンチエイリアス）
+- 凡例・タイトルは描かない（plot_rank_history も描いていない）
+
+使い方:
+  render_native(data, [50], "dist/rank.svg", ema_windows=[20], generated_at_str="2025-01-01 00:00:00 JST")
+  python sfbuff_rank_history.py 123456789 -c 5 --plot --ma 50 --renderer native --out dist/rank.svg
+"""
+
+import math
+import os
+from functools import lru_cache
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+from sfbuff_core import (
+    DPI,
+    FAST_LAYOUT_MARGINS,
+    FIGSIZE,
+    _parse_dt,
+    exponential_moving_average,
+    moving_average,
+    split_seasons_by_jump,
+)
+from sfbuff_profile import stage
+
+WIDTH = int(FIGSIZE[0] * DPI)
+HEIGHT = int(FIGSIZE[1] * DPI)
+
+# matplotlib の既定の色の順番（tab10）と、その他の色
+COLORS = ("#1f77b4", "#ff7f0e", "#2ca02c", "#d62728", "#9467bd",
+          "#8c564b", "#e377c2", "#7f7f7f", "#bcbd22", "#17becf")
+GRID_COLOR = "#b0b0b0"
+DATE_COLOR = "#1f77b4"
+FONT_FAMILY = "DejaVu Sans, Bitstream Vera Sans, Arial, sans-serif"
+
+# 大きさ（pt。matplotlib の既定値と draw_rank_history の指定）
+TICK_FONT_PT = 10.0
+LABEL_FONT_PT = 9.0
+TICK_LEN_PT = 3.5
+TICK_PAD_PT = 3.5
+DATE_PAD_PT = 26.0
+SPINE_PT = 0.8
+DOTTED = (1.0, 1.65)  # ":" の線と隙間（線幅に対する倍率）
+
+# DejaVu Sans の ascent / descent（フォントサイズに対する比）。文字の縦位置合わせに使う
+ASCENT = 0.76
+DESCENT = 0.24
+
+# PNG を何倍で描いてから縮小するか
+SUPERSAMPLE = 2
+
+# 描画要素
+#   ("line", [(x, y), ...], 色, 線幅px, 不透明度, 点線なら (線, 隙間) px / None)
+#   ("text", x, y, 文字列, 大きさpx, 色, 不透明度, "start"|"middle"|"end", 回転角（反時計回り、度）)  y はベースライン
+Item = Tuple[Any, ...]
+
+
+def _px(pt: float) -> float:
+    return pt * DPI / 72.0
+
+
+# ---------------- 目盛り ----------------
+def nice_ticks(vmin: float, vmax: float, nbins: int = 9) -> List[float]:
+    """[vmin, vmax] に入る目盛り（1 / 2 / 2.5 / 5 / 10 × 10^k 刻み、nbins 区間以内）。"""
+    if not vmax > vmin:
+        return [vmin]
+    scale = 10.0 ** math.floor(math.log10((vmax - vmin) / nbins))
+    for m in (1.0, 2.0, 2.5, 5.0, 10.0):
+        step = m * scale
+        lo = math.floor(vmin / step + 1e-9)
+        hi = math.ceil(vmax / step - 1e-9)
+        if hi - lo <= nbins:
+            break
+    first = math.ceil(vmin / step - 1e-9)
+    last = math.floor(vmax / step + 1e-9)
+    return [i * step for i in range(first, last + 1)]
+
+
+def _tick_format(ticks: Sequence[float]) -> str:
+    """目盛りの間隔を表せる最小の小数桁の書式。"""
+    step = abs(ticks[1] - ticks[0]) if len(ticks) > 1 else 1.0
+    for dec in range(0, 10):
+        if abs(round(step, dec) - step) < 1e-9 * max(1.0, step):
+            return f"{{:.{dec}f}}"
+    return "{:g}"
+
+
+def _label(value: Any, fmt: str = "%Y-%m-%d") -> str:
+    try:
+        return _parse_dt(value).strftime(fmt)
+    except Exception:
+        return ""
+
+
+# ---------------- 間引き（M4） ----------------
+def m4(x0: int, ys: Sequence[float], lo: float, hi: float, columns: int) -> List[Tuple[float, float]]:
+    """
+    x = x0, x0+1, ... の点列を、[lo, hi] を columns 列に分けた各列の先頭・最小・最大・末尾に減らす。
+    1列あたりの点数が 4 以下ならそのまま（シーズン1つ分などの短い点列も、列あたりの密度で判断する）。
+    """
+    n = len(ys)
+    per = (hi - lo) / columns if columns > 0 else 0.0  # 1列あたりの点数（x は1ずつ増える）
+    if per <= 4:
+        return [(x0 + i, y) for i, y in enumerate(ys)]
+    out: List[Tuple[float, float]] = []
+    i = 0
+    while i < n:
+        c = int((x0 + i - lo) / per)
+        j = min(n, max(i + 1, math.ceil(lo + (c + 1) * per - x0)))
+        seg = ys[i:j]
+        keep = {i, j - 1, i + seg.index(min(seg)), i + seg.index(max(seg))}
+        out.extend((x0 + k, ys[k]) for k in sorted(keep))
+        i = j
+    return out
+
+
+# ---------------- 図の組み立て ----------------
+def build_scene(data: List[dict],
+                ma_windows: List[int],
+                hide_raw: bool = False,
+                ema_windows: Optional[List[int]] = None,
+                season_threshold: Optional[float] = 40.0,
+                date_from: Optional[str] = None,
+                date_to: Optional[str] = None,
+                generated_at_str: Optional[str] = None,
+                hide_xaxis: bool = False,
+                downsample: Optional[int] = None) -> List[Item]:
+    """
+    描画要素のリスト（ピクセル座標、描く順）。引数は draw_rank_history と同じ意味。
+    downsample: None=軸の横幅ピクセルを列にして M4、0=間引かない、N=約 N 点（N/4 列）。
+    """
+    if not data:
+        raise ValueError("描画するデータが空です。")
+
+    with stage("smooth", rows=len(data)):
+        ys_all = [float(item["r"]) for item in data]
+        n = len(ys_all)
+        spans = split_seasons_by_jump(ys_all, season_threshold) if season_threshold else [(0, n)]
+        # (先頭の x, 値, 線幅pt, 不透明度)。matplotlib と同じ順番（生データ → SMA → EMA、それぞれシーズン順）
+        series: List[Tuple[int, List[float], float, float]] = []
+        if not hide_raw:
+            series += [(a + 1, ys_all[a:b], 1.0, 0.75) for a, b in spans if b > a]
+        for w in sorted(set(int(w) for w in ma_windows or [] if int(w) > 0)):
+            for a, b in spans:
+                if b - a >= w:
+                    series.append((a + w, moving_average(ys_all[a:b], w)[w - 1:], 2.0, 1.0))
+        for w in sorted(set(int(w) for w in ema_windows or [] if int(w) > 0)):
+            for a, b in spans:
+                if b > a:
+                    series.append((a + 1, exponential_moving_average(ys_all[a:b], w), 2.0, 1.0))
+
+    left = FAST_LAYOUT_MARGINS["left"] * WIDTH
+    right = FAST_LAYOUT_MARGINS["right"] * WIDTH
+    top = (1.0 - FAST_LAYOUT_MARGINS["top"]) * HEIGHT
+    bottom = (1.0 - FAST_LAYOUT_MARGINS["bottom"]) * HEIGHT
+
+    # 範囲: x は 1..N、y は描く線の最小〜最大 ± 5%
+    x_lo, x_hi = (1.0, float(n)) if n > 1 else (0.5, 1.5)
+    if series:
+        y_lo = min(min(ys) for _, ys, _, _ in series)
+        y_hi = max(max(ys) for _, ys, _, _ in series)
+    else:
+        y_lo, y_hi = 0.0, 1.0
+    if y_hi == y_lo:
+        y_lo, y_hi = y_lo - 1.0, y_hi + 1.0
+    pad = (y_hi - y_lo) * 0.05
+    y_lo, y_hi = y_lo - pad, y_hi + pad
+
+    sx = (right - left) / (x_hi - x_lo)
+    sy = (bottom - top) / (y_hi - y_lo)
+
+    def X(x: float) -> float:
+        return left + (x - x_lo) * sx
+
+    def Y(y: float) -> float:
+        return bottom - (y - y_lo) * sy
+
+    def vline(x: float, color: str, width_pt: float, alpha: float, dotted: bool) -> Item:
+        w = _px(width_pt)
+        dash = (DOTTED[0] * w, DOTTED[1] * w) if dotted else None
+        return ("line", [(X(x), top), (X(x), bottom)], color, w, alpha, dash)
+
+    x_ticks = nice_ticks(x_lo, x_hi)
+    y_ticks = nice_ticks(y_lo, y_hi)
+    items: List[Item] = []
+
+    # 目盛りの点線（先頭・末尾を含む。目盛りが少なければ 10 等分）
+    tick_positions = [int(round(t)) for t in x_ticks if 1 <= t <= n]
+    if len(tick_positions) < 8:
+        tick_positions = [int(round(1 + (n - 1) * i / 9)) for i in range(10)]
+    positions = sorted(set([1, n] + tick_positions))
+    items += [vline(pos, COLORS[0], 0.5, 0.25, True) for pos in positions]
+
+    # グリッド
+    items += [("line", [(left, Y(t)), (right, Y(t))], GRID_COLOR, _px(2.0), 0.1, None) for t in y_ticks]
+    if not hide_xaxis:
+        items += [vline(t, GRID_COLOR, 2.0, 0.1, False) for t in x_ticks]
+
+    # 線（色は1本ごとに次へ）
+    columns = 0
+    if downsample is None:
+        columns = int(right - left)
+    elif downsample > 0:
+        columns = max(1, downsample // 4)
+    with stage("downsample", rows=n):
+        for i, (x0, ys, width_pt, alpha) in enumerate(series):
+            pts = [(X(x), Y(y)) for x, y in m4(x0, ys, x_lo, x_hi, columns)]
+            items.append(("line", pts, COLORS[i % len(COLORS)], _px(width_pt), alpha, None))
+
+    # シーズン境界
+    items += [vline(a, COLORS[0], 1.0, 0.4, True) for a, _ in spans[1:] if 1 <= a <= n]
+
+    # 枠と目盛り
+    spine = _px(SPINE_PT)
+    items.append(("line", [(left, top), (right, top), (right, bottom), (left, bottom), (left, top)],
+                  "#000000", spine, 1.0, None))
+    tick_len = _px(TICK_LEN_PT)
+    tick_size = _px(TICK_FONT_PT)
+    fmt = _tick_format(y_ticks)
+    for t in y_ticks:
+        items.append(("line", [(left - tick_len, Y(t)), (left, Y(t))], "#000000", spine, 1.0, None))
+        items.append(("text", left - tick_len - _px(TICK_PAD_PT), Y(t) + 0.36 * tick_size,
+                      fmt.format(t).replace("-", "−"), tick_size, "#000000", 1.0, "end", 0))
+    if not hide_xaxis:
+        fmt = _tick_format(x_ticks)
+        for t in x_ticks:
+            items.append(("line", [(X(t), bottom), (X(t), bottom + tick_len)], "#000000", spine, 1.0, None))
+            items.append(("text", X(t), bottom + tick_len + _px(TICK_PAD_PT) + ASCENT * tick_size,
+                          fmt.format(t).replace("-", "−"), tick_size, "#000000", 1.0, "middle", 0))
+
+    # 日付ラベル（45度、右上の角を目盛りの位置に合わせる）
+    label_size = _px(LABEL_FONT_PT)
+    r = math.sqrt(0.5) * label_size
+    for pos in positions:
+        label = _label(data[pos - 1]["d"])
+        if label:
+            items.append(("text", X(pos) - DESCENT * r, bottom + _px(DATE_PAD_PT) + ASCENT * r,
+                          label, label_size, DATE_COLOR, 0.9, "end", 45))
+
+    # 右下スタンプ
+    disp_from = date_from or _label(data[0]["d"]) or "—"
+    disp_to = date_to or _label(data[-1]["d"]) or "—"
+    last_match = _label(data[-1]["d"], "%Y-%m-%d %H:%M") or "—"
+    stamp = (f"Generated: {generated_at_str or ''}  |  "
+             f"Range: {disp_from} — {disp_to}  |  "
+             f"Last Match: {last_match}")
+    items.append(("text", 0.995 * WIDTH, 0.98 * HEIGHT - DESCENT * label_size,
+                  stamp, label_size, "#000000", 0.75, "end", 0))
+    return items
+
+
+# ---------------- SVG ----------------
+def to_svg(items: List[Item]) -> str:
+    out = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{WIDTH}" height="{HEIGHT}" '
+           f'viewBox="0 0 {WIDTH} {HEIGHT}" font-family="{FONT_FAMILY}">',
+           '<rect width="100%" height="100%" fill="#ffffff"/>']
+    for item in items:
+        if item[0] == "line":
+            _, pts, color, width, alpha, dash = item
+            attrs = f'fill="none" stroke="{color}" stroke-width="{width:.2f}"'
+            if alpha < 1.0:
+                attrs += f' stroke-opacity="{alpha:g}"'
+            if dash:
+                attrs += f' stroke-dasharray="{dash[0]:.2f},{dash[1]:.2f}"'
+            else:
+                attrs += ' stroke-linejoin="round" stroke-linecap="square"'
+            points = " ".join(f"{x:.1f},{y:.1f}" for x, y in pts)
+            out.append(f'<polyline points="{points}" {attrs}/>')
+        else:
+            _, x, y, text, size, color, alpha, anchor, rotate = item
+            attrs = f'x="{x:.1f}" y="{y:.1f}" font-size="{size:.2f}" fill="{color}" text-anchor="{anchor}"'
+            if alpha < 1.0:
+                attrs += f' fill-opacity="{alpha:g}"'
+            if rotate:
+                attrs += f' transform="rotate({-rotate:g} {x:.1f} {y:.1f})"'
+            out.append(f"<text {attrs}>{escape(text)}</text>")
+    out.append("</svg>")
+    return "\n".join(out) + "\n"
+
+
+# ---------------- PNG（Pillow） ----------------
+@lru_cache(maxsize=8)
+def _font(size: int):
+    """DejaVu Sans（システム → matplotlib 同梱のファイル。matplotlib は import しない）→ Pillow の既定フォント。"""
+    from PIL import ImageFont
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        pass
+    import importlib.util
+    spec = importlib.util.find_spec("matplotlib")
+    if spec is not None and spec.origin:
+        path = os.path.join(os.path.dirname(spec.origin), "mpl-data", "fonts", "ttf", "DejaVuSans.ttf")
+        if os.path.exists(path):
+            return ImageFont.truetype(path, size)
+    return ImageFont.load_default(size)
+
+
+def _rgb(color: str) -> Tuple[int, int, int]:
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def _dashes(p0: Tuple[float, float], p1: Tuple[float, float],
+            on: float, off: float) -> Iterator[List[Tuple[float, float]]]:
+    """直線 p0→p1 を点線の線分に分ける。"""
+    length = math.hypot(p1[0] - p0[0], p1[1] - p0[1])
+    if length == 0:
+        return
+    ux, uy = (p1[0] - p0[0]) / length, (p1[1] - p0[1]) / length
+    t = 0.0
+    while t < length:
+        e = min(length, t + on)
+        yield [(p0[0] + ux * t, p0[1] + uy * t), (p0[0] + ux * e, p0[1] + uy * e)]
+        t = e + off
+
+
+def _vertical_dash_mask(length: int, width: int, on: float, off: float, value: int):
+    """縦の点線のマスク（1列分の濃さを作って横に伸ばす。点の数だけ line を呼ばない）。"""
+    from PIL import Image
+    period = on + off
+    column = bytes(value if (y % period) < on else 0 for y in range(length))
+    return Image.frombytes("L", (1, length), column).resize((width, length), Image.NEAREST)
+
+
+def to_png(items: List[Item], path: str) -> None:
+    try:
+        from PIL import Image, ImageDraw
+    except ImportError:
+        raise RuntimeError("PNG の出力には Pillow が必要です（pip install pillow）。SVG なら --out を .svg にしてください")
+    ss = SUPERSAMPLE
+    img = Image.new("RGB", (WIDTH * ss, HEIGHT * ss), "white")
+    draw = ImageDraw.Draw(img)
+    for item in items:
+        if item[0] == "line":
+            _, pts, color, width, alpha, dash = item
+            pts = [(x * ss, y * ss) for x, y in pts]
+            w = max(1, int(round(width * ss)))
+            if dash and pts[0][0] == pts[-1][0]:
+                y0 = int(round(min(pts[0][1], pts[-1][1])))
+                mask = _vertical_dash_mask(int(round(abs(pts[-1][1] - pts[0][1]))), w,
+                                           dash[0] * ss, dash[1] * ss, int(255 * alpha))
+                img.paste(_rgb(color), (int(round(pts[0][0] - w / 2.0)), y0), mask)
+                continue
+            segs = list(_dashes(pts[0], pts[-1], dash[0] * ss, dash[1] * ss)) if dash else [pts]
+            # 継ぎ目は丸めない（joint="curve" は頂点ごとに円を描くので遅い。点が密なので見た目は変わらない）
+            if alpha >= 1.0:
+                for seg in segs:
+                    draw.line(seg, fill=_rgb(color), width=w)
+                continue
+            # 半透明: 線の範囲だけのマスクに描いて、色を不透明度つきで重ねる（重なった部分が濃くならない）
+            x0 = int(min(x for x, _ in pts)) - w
+            y0 = int(min(y for _, y in pts)) - w
+            x1 = int(max(x for x, _ in pts)) + w + 1
+            y1 = int(max(y for _, y in pts)) + w + 1
+            mask = Image.new("L", (x1 - x0, y1 - y0), 0)
+            mdraw = ImageDraw.Draw(mask)
+            for seg in segs:
+                mdraw.line([(x - x0, y - y0) for x, y in seg], fill=int(255 * alpha), width=w)
+            img.paste(_rgb(color), (x0, y0), mask)
+        else:
+            _, x, y, text, size, color, alpha, anchor, rotate = item
+            font = _font(int(round(size * ss)))
+            pil_anchor = {"start": "ls", "middle": "ms", "end": "rs"}[anchor]
+            if alpha >= 1.0 and not rotate:
+                draw.text((x * ss, y * ss), text, fill=_rgb(color), font=font, anchor=pil_anchor)
+                continue
+            # マスクに横書きで描き、必要なら回転してから貼る（基準点の位置を回転後に合わせる）
+            bx0, by0, bx1, by1 = font.getbbox(text, anchor=pil_anchor)
+            mask = Image.new("L", (bx1 - bx0 + 2, by1 - by0 + 2), 0)
+            ax, ay = 1 - bx0, 1 - by0
+            ImageDraw.Draw(mask).text((ax, ay), text, fill=int(255 * alpha), font=font, anchor=pil_anchor)
+            if rotate:
+                cx, cy = mask.width / 2.0, mask.height / 2.0
+                rot = mask.rotate(rotate, resample=Image.BICUBIC, expand=True)
+                th = math.radians(rotate)
+                dx, dy = ax - cx, ay - cy
+                ax = rot.width / 2.0 + dx * math.cos(th) + dy * math.sin(th)
+                ay = rot.height / 2.0 - dx * math.sin(th) + dy * math.cos(th)
+                mask = rot
+            img.paste(_rgb(color), (int(round(x * ss - ax)), int(round(y * ss - ay))), mask)
+    img.reduce(ss).save(path)
+
+
+# ---------------- 入口 ----------------
+def render_native(
+    data: List[dict],
+    ma_windows: List[int],
+    out_path: str,
+    hide_raw: bool = False,
+    title: Optional[str] = None,
+    ema_windows: Optional[List[int]] = None,
+    season_threshold: Optional[float] = 40.0,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    generated_at_str: Optional[str] = None,
+    hide_xaxis: bool = False,
+    downsample: Optional[int] = None,
+    memo=None,
+) -> None:
+    """
+    plot_rank_history（fast_layout=True）と同じ図を out_path に保存（.svg → SVG、それ以外 → PNG）。
+    引数は plot_rank_history と同じ（show / fast_layout は無い。title は plot_rank_history と同じく描かない）。
+    memo（sfbuff_memo.StageMemo）を渡すと、点列と描画オプションが前回と同じなら前回の出力をコピーするだけ。
+    """
+    if not data:
+        raise ValueError("描画するデータが空です。")
+
+    ext = os.path.splitext(out_path)[1]
+    render_key = None
+    if memo is not None:
+        from sfbuff_memo import digest_data, render_key_options
+        render_key = memo.key("render", digest_data(data), render_key_options(dict(
+            renderer="native", ma_windows=ma_windows, hide_raw=hide_raw, title=title, ema_windows=ema_windows,
+            season_threshold=season_threshold, date_from=date_from, date_to=date_to,
+            hide_xaxis=hide_xaxis, downsample=downsample,
+        )))
+        if memo.copy_out("render", render_key, ext, out_path):
+            return
+
+    with stage("render.draw", rows=len(data)):
+        items = build_scene(data, ma_windows, hide_raw=hide_raw, ema_windows=ema_windows,
+                            season_threshold=season_threshold, date_from=date_from, date_to=date_to,
+                            generated_at_str=generated_at_str, hide_xaxis=hide_xaxis, downsample=downsample)
+    with stage("render.savefig"):
+        if ext.lower() == ".svg":
+            with open(out_path, "w", encoding="utf-8") as f:
+                f.write(to_svg(items))
+        else:
+            to_png(items, out_path)
+    if render_key is not None:
+        memo.save_file("render", render_key, ext, out_path)
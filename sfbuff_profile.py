@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+処理段階ごとの計測（所要時間・バイト数・行数）
+
+- 段階名は fetch / decode / parse / aggregate / smooth / render / write（細かく見たいところは "render.savefig" のようにドット区切り）
+- 無効時（デフォルト）は stage() が共有の何もしないコンテキストを返すだけなので、ほぼコストなし
+- 有効時は段階ごとに 呼び出し回数・合計秒・最大秒・バイト数・行数 をスレッド安全に積算
+- report() で JSON 向けの dict、to_prometheus() で Prometheus のテキスト形式を返す
+
+使い方:
+  from sfbuff_profile import PROFILER, stage
+  PROFILER.enable()
+  with stage("fetch") as st:
+      resp = sess.get(url)
+      st.bytes = len(resp.content)
+  PROFILER.write_report("dist/profile.json")
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class _NullStage:
+    """無効時に返す共有コンテキスト。bytes / rows を代入されても捨てるだけ。"""
+
+    bytes = 0
+    rows = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+
+_NULL = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("prof", "name", "bytes", "rows", "t0")
+
+    def __init__(self, prof: "Profiler", name: str, nbytes: int, rows: int):
+        self.prof = prof
+        self.name = name
+        self.bytes = nbytes
+        self.rows = rows
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof.record(self.name, time.perf_counter() - self.t0, self.bytes, self.rows)
+        return False
+
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self._started = time.perf_counter()
+
+    def enable(self, on: bool = True) -> None:
+        self.enabled = on
+        if on:
+            self._started = time.perf_counter()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+        self._started = time.perf_counter()
+
+    # ---------------- 計測 ----------------
+    def stage(self, name: str, nbytes: int = 0, rows: int = 0):
+        """with で囲んだ区間を name として計測。無効時は何もしない共有オブジェクト。"""
+        if not self.enabled:
+            return _NULL
+        return _Stage(self, name, nbytes, rows)
+
+    def record(self, name: str, seconds: float, nbytes: int = 0, rows: int = 0) -> None:
+        with self._lock:
+            s = self._stats.get(name)
+            if s is None:
+                s = self._stats[name] = {"count": 0, "seconds": 0.0, "max": 0.0, "bytes": 0, "rows": 0}
+            s["count"] += 1
+            s["seconds"] += seconds
+            if seconds > s["max"]:
+                s["max"] = seconds
+            s["bytes"] += nbytes or 0
+            s["rows"] += rows or 0
+
+    # ---------------- 出力 ----------------
+    def report(self) -> Dict[str, Any]:
+        """{"wall_sec", "stages": {name: {count, total_sec, mean_ms, max_ms, bytes, rows}}}"""
+        with self._lock:
+            stats = {k: dict(v) for k, v in self._stats.items()}
+        stages = {}
+        for name in sorted(stats):
+            s = stats[name]
+            stages[name] = {
+                "count": s["count"],
+                "total_sec": round(s["seconds"], 6),
+                "mean_ms": round(s["seconds"] / s["count"] * 1000, 3) if s["count"] else None,
+                "max_ms": round(s["max"] * 1000, 3),
+                "bytes": s["bytes"],
+                "rows": s["rows"],
+            }
+        return {"wall_sec": round(time.perf_counter() - self._started, 3), "stages": stages}
+
+    def to_prometheus(self, prefix: str = "sfbuff", extra: Optional[Dict[str, float]] = None) -> str:
+        """Prometheus のテキスト形式。extra は {メトリクス名: 値} の追加ゲージ。"""
+        with self._lock:
+            stats = {k: dict(v) for k, v in self._stats.items()}
+        metrics = (
+            ("stage_calls_total", "counter", "段階の呼び出し回数", "count"),
+            ("stage_seconds_total", "counter", "段階の合計所要秒", "seconds"),
+            ("stage_seconds_max", "gauge", "段階の最大所要秒", "max"),
+            ("stage_bytes_total", "counter", "段階で扱ったバイト数", "bytes"),
+            ("stage_rows_total", "counter", "段階で扱った行数", "rows"),
+        )
+        lines = []
+        for metric, kind, help_text, field in metrics:
+            lines.append(f"# HELP {prefix}_{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}_{metric} {kind}")
+            for name in sorted(stats):
+                lines.append(f'{prefix}_{metric}{{stage="{name}"}} {stats[name][field]:g}')
+        for name, value in (extra or {}).items():
+            lines.append(f"# TYPE {prefix}_{name} gauge")
+            lines.append(f"{prefix}_{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, path: str) -> None:
+        """path が "-" なら stderr へ。"""
+        _write_text(path, json.dumps(self.report(), ensure_ascii=False, indent=1) + "\n")
+
+    def write_prometheus(self, path: str, extra: Optional[Dict[str, float]] = None) -> None:
+        _write_text(path, self.to_prometheus(extra=extra))
+
+
+def _write_text(path: str, text: str) -> None:
+    if path == "-":
+        sys.stderr.write(text)
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+
+# プロセス共通
+PROFILER = Profiler()
+stage = PROFILER.stage
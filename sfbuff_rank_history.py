@@ -2,160 +2,72 @@
 # -*- coding: utf-8 -*-
 
 import argparse
-import bs4
-import html
 import json
-import requests
+import os
 import sys
-import urllib.parse
-from typing import List, Optional, Tuple
+import time
+from typing import List, Optional
 from datetime import datetime
 
-
-# ----------------------------------------------------------------------
-def build_url(player_or_url: str,
-              character_id: Optional[int] = None,
-              date_from: Optional[str] = None,
-              date_to: Optional[str] = None) -> str:
-    """プレイヤーIDから検索条件付きURLを生成（既にURLならそのまま返す）。"""
-    if player_or_url.startswith("http"):
-        return player_or_url
-
-    qs = {}
-    if character_id is not None:
-        qs["home_character_id"] = str(character_id)
-    if date_from:
-        qs["played_from"] = date_from
-    if date_to:
-        qs["played_to"] = date_to
-    query = urllib.parse.urlencode(qs, safe="~")
-    return f"https://sfbuff.site/fighters/{player_or_url}/ranked_history" + ("?" + query if query else "")
+# 重い依存（requests / bs4 / NumPy / matplotlib）は使う経路に入ったときだけ読み込む
+from sfbuff_core import (  # noqa: F401  (従来の名前で再エクスポート)
+    DPI,
+    FAST_LAYOUT_MARGINS,
+    FIGSIZE,
+    RANK_BASE_URL as BASE_URL,
+    _parse_dt,
+    _rebase_url,
+    exponential_moving_average,
+    moving_average,
+    new_session,
+    rank_points,
+    split_seasons_by_jump,
+)
+from sfbuff_core import rank_history_url as build_url
+from sfbuff_extract import BACKENDS, extract_chart
+from sfbuff_http import add_http_args, client_from_args, default_client, format_http_stats
+from sfbuff_profile import PROFILER, stage
 
 
 # ----------------------------------------------------------------------
-def scrape_rank_history(url: str, tz: str = "Asia/Tokyo") -> List[dict]:
-    """SFBuffのRanked Historyからデータを抽出（LP/MR両対応版）"""
-    headers = {"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64)"}
-    sess = requests.Session()
-    sess.headers.update(headers)
-    sess.cookies.set("timezone", tz)
-
-    res = sess.get(url, timeout=20)
+def scrape_rank_history(url: str, tz: str = "Asia/Tokyo", session=None,
+                        extractor: str = "auto", memo=None) -> List[dict]:
+    """
+    SFBuffのRanked Historyからデータを抽出（LP/MR両対応版）
+    session を渡した場合はそれを使う（HttpClient / キャッシュ付き Session など。timezone cookie は渡す側で設定）。
+    省略時はプロセス共有の HttpClient（接続プール＋リトライ）を使う。
+    extractor は sfbuff_extract のバックエンド名（auto / fast / bs4）。
+    memo（sfbuff_memo.StageMemo）を渡すと、本文が前回と同じページはパースせず前回の点列を返す。
+    """
+    sess = session if session is not None else default_client(tz)
+
+    res = sess.get(url, timeout=getattr(sess, "timeout", 20))
     res.raise_for_status()
-    html_text = res.text
+    if memo is not None:
+        key = memo.key("parse", res.content, extractor)
+        points = memo.load_json("parse", key)
+        if points is not None:
+            return points
+    with stage("decode", len(res.content)):
+        html_text = res.text
 
-    soup = bs4.BeautifulSoup(html_text, "html.parser")
     # data-chartjs-data-value 属性を持つdivを探す
-    div = soup.select_one('div[data-chartjs-data-value]')
-    
-    if not div:
-        raise RuntimeError("グラフデータ(data-chartjs-data-value)が見つかりませんでした。")
+    chart = extract_chart(html_text, backend=extractor)
 
-    raw = div.get("data-chartjs-data-value")
-    chart = json.loads(html.unescape(raw))
-    
-    datasets = chart.get("data", {}).get("datasets", [])
-    
-    # MR(マスターレート)のデータセットを優先的に探す
-    # yAxisID が 'mr' を含むもの、またはラベルが 'MR' のものを探す
-    ds = next((d for d in datasets if "mr" in d.get("yAxisID", "").lower() or d.get("label") == "MR"), None)
-    
-    # もしMRが見つからない（ダイヤ以下など）場合は LP を探す
-    if not ds:
-        ds = next((d for d in datasets if "lp" in d.get("yAxisID", "").lower() or d.get("label") == "LP"), None)
-
-    if not ds or "data" not in ds:
-        raise RuntimeError("有効なMRまたはLPのデータセットが見つかりませんでした。")
+    if chart is None:
+        raise RuntimeError("グラフデータ(data-chartjs-data-value)が見つかりませんでした。")
 
-    # データの抽出 (x: 日時, y: レート)
-    # yがNone（試合はあるがMRが動いていない等）のデータを除外してリスト化
-    return [{"d": p["x"], "r": p["y"]} for p in ds["data"] if p.get("y") is not None]
+    # MR（無ければ LP）のデータセットから (日時, レート) を取り出す
+    with stage("parse.points") as st:
+        points = rank_points(chart)
+        st.rows = len(points)
+    if memo is not None:
+        memo.save_json("parse", key, points)
+    return points
 
 
 # ========================= 解析/描画ユーティリティ =========================
 
-def _parse_dt(val) -> datetime:
-    """x が ISO文字列 / エポック（μs/ms/秒）のどれでも解釈（必要時に使用）。"""
-    # 数値
-    if isinstance(val, (int, float)):
-        ts = float(val)
-        if ts >= 1e15:      # microseconds
-            ts /= 1_000_000.0
-        elif ts >= 1e12:    # milliseconds
-            ts /= 1_000.0
-        # else: seconds
-        return datetime.fromtimestamp(ts)
-    # 文字列
-    if isinstance(val, str):
-        s = val.strip()
-        if s.isdigit():
-            ts = float(s)
-            if ts >= 1e15:
-                ts /= 1_000_000.0
-            elif ts >= 1e12:
-                ts /= 1_000.0
-            return datetime.fromtimestamp(ts)
-        try:
-            return datetime.fromisoformat(s.replace("Z", "+00:00"))
-        except Exception:
-            pass
-        try:
-            return datetime.strptime(s[:10], "%Y-%m-%d")
-        except Exception:
-            pass
-    raise ValueError(f"日時の解釈に失敗しました: {val!r}")
-
-
-def moving_average(series: List[float], n: int) -> List[Optional[float]]:
-    """直近 n 試合の単純移動平均（不足部は None）。"""
-    if n <= 0:
-        raise ValueError("移動平均の窓幅 n は 1 以上で指定してください。")
-    ma: List[Optional[float]] = [None] * len(series)
-    if not series:
-        return ma
-    csum = [0.0]
-    for v in series:
-        csum.append(csum[-1] + float(v))
-    for i in range(n - 1, len(series)):
-        s = csum[i + 1] - csum[i + 1 - n]
-        ma[i] = s / n
-    return ma
-
-
-def exponential_moving_average(series: List[float], n: int) -> List[Optional[float]]:
-    """EMA(n)（見やすさ重視で全点に値を出す）。"""
-    if n <= 0:
-        raise ValueError("EMA の窓幅 n は 1 以上で指定してください。")
-    if not series:
-        return []
-    alpha = 2.0 / (n + 1.0)
-    ema: List[Optional[float]] = [None] * len(series)
-    s0 = sum(series[:n]) / n if len(series) >= n else float(series[0])
-    ema[0] = s0
-    for i in range(1, len(series)):
-        prev = ema[i - 1] if ema[i - 1] is not None else s0
-        ema[i] = (series[i] - prev) * alpha + prev
-    return ema
-
-
-def split_seasons_by_jump(ys: List[float], threshold: float) -> List[Tuple[int, int]]:
-    """
-    前試合との差が threshold 以上（絶対値）なら、そこでシーズン切替とみなす。
-    返り値: [(start_idx, end_idx_excl), ...] 例: [(0, 120), (120, 245), ...]
-    """
-    if not ys:
-        return []
-    spans: List[Tuple[int, int]] = []
-    start = 0
-    for i in range(1, len(ys)):
-        if abs(ys[i] - ys[i - 1]) >= threshold:
-            if i - start > 0:
-                spans.append((start, i))  # [start, i)
-            start = i
-    spans.append((start, len(ys)))
-    return spans
-
-
 # ----------------------------------------------------------------------
 def _auto_label_every(n_matches: int) -> int:
     """（フォールバック用）試合数から日付ラベル間隔を決める。"""
@@ -207,32 +119,125 @@ def plot_rank_history(
     date_to: Optional[str] = None,
     generated_at_str: Optional[str] = None,
     hide_xaxis: bool = False,
+    fast_layout: bool = False,
+    downsample: Optional[int] = None,
+    memo=None,
 ) -> None:
     """
     横軸=試合番号で、生データ＋SMA(必須)＋EMA(任意)を描画。
     シーズン切替（大ジャンプ）は自動検出し、各シーズン内で独立に平滑化。
+    fast_layout=True なら固定レイアウトで描き、tight_layout / bbox_inches="tight" の再描画を省く。
+    downsample は描画前の間引き（None=軸の横幅ピクセル数で自動、0=間引かない、N=目標点数）。
+    memo（sfbuff_memo.StageMemo）を渡すと、点列と描画オプションが前回と同じなら前回の PNG をコピーするだけ
+    （生成日時はキーに含めないので、スタンプは前回描いたときのまま）。show=True のときは使わない。
     """
+    if not data:
+        raise ValueError("描画するデータが空です。")
+
+    data_key = render_key = None
+    if memo is not None and not show:
+        from sfbuff_memo import digest_data, render_key_options
+        data_key = digest_data(data)
+        render_key = memo.key("render", data_key, render_key_options(dict(
+            ma_windows=ma_windows, hide_raw=hide_raw, title=title, ema_windows=ema_windows,
+            season_threshold=season_threshold, date_from=date_from, date_to=date_to,
+            hide_xaxis=hide_xaxis, fast_layout=fast_layout, downsample=downsample,
+        )))
+        if memo.copy_out("render", render_key, os.path.splitext(out_path)[1], out_path):
+            return
+
     import matplotlib.pyplot as plt
 
+    fig, ax = plt.subplots(figsize=FIGSIZE, dpi=DPI)
+    draw_rank_history(
+        fig, ax, data, ma_windows,
+        hide_raw=hide_raw, ema_windows=ema_windows, season_threshold=season_threshold,
+        date_from=date_from, date_to=date_to, generated_at_str=generated_at_str,
+        hide_xaxis=hide_xaxis, fast_layout=fast_layout, downsample=downsample,
+        memo=memo, data_key=data_key,
+    )
+
+    with stage("render.savefig"):
+        fig.savefig(out_path, bbox_inches=None if fast_layout else "tight")
+    if render_key is not None:
+        memo.save_file("render", render_key, os.path.splitext(out_path)[1], out_path)
+    if show:
+        plt.show()
+    plt.close(fig)
+
+
+def draw_rank_history(
+    fig,
+    ax,
+    data: List[dict],
+    ma_windows: List[int],
+    hide_raw: bool = False,
+    ema_windows: Optional[List[int]] = None,
+    season_threshold: Optional[float] = 40.0,
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    generated_at_str: Optional[str] = None,
+    hide_xaxis: bool = False,
+    fast_layout: bool = False,
+    downsample: Optional[int] = None,
+    memo=None,
+    data_key: Optional[str] = None,
+) -> None:
+    """
+    与えられた fig / ax に描画する（保存はしない）。バッチ描画で Figure を使い回すため分離。
+    fast_layout=True のときは:
+      - tight_layout（全体の再描画）をせず FAST_LAYOUT_MARGINS で配置
+      - 日付ラベルを1つずつ ax.text で置かず、副目盛りのラベルとしてまとめて設定
+    downsample: 各系列を ax.plot に渡す前に LTTB で間引く目標点数（sfbuff_downsample 参照）。
+      None なら軸の横幅（ピクセル）を目標にし、点数がその AUTO_FACTOR 倍を超えるときだけ間引く。0 で無効。
+      N を指定したときは点数が N を超えれば間引く。
+    memo（sfbuff_memo.StageMemo）を渡すと、シーズン区間と SMA/EMA を点列・窓幅・閾値のハッシュで保存し、
+      同じ入力なら計算を省く。data_key は点列のハッシュ（呼び出し側で計算済みなら渡す。省略時はここで計算）。
+    """
     if not data:
         raise ValueError("描画するデータが空です。")
 
-    xs_all = list(range(1, len(data) + 1))
-    ys_all = [float(item["r"]) for item in data]
+    from sfbuff_rolling import detect_seasons, pack_stats, rolling_stats, to_arrays, unpack_stats
+    from sfbuff_timecol import TimeColumn
+
+    # 配列化は1回だけ（日時も取り込み時にまとめて epoch 化）
+    with stage("smooth", rows=len(data)):
+        xs_all, ys_all = to_arrays(data)
+        times = TimeColumn.from_values([item["d"] for item in data])
+
+        cached = smooth_key = None
+        if memo is not None:
+            from sfbuff_memo import digest_data
+            smooth_key = memo.key("smooth", data_key or digest_data(data),
+                                  ma_windows or [], ema_windows or [], season_threshold)
+            cached = memo.load_arrays("smooth", smooth_key)
+        if cached is not None:
+            spans, stats = unpack_stats(cached)
+        else:
+            # シーズン分割
+            spans = detect_seasons(ys_all, season_threshold)
+
+            # 全シーズン × 全窓の SMA/EMA をまとめて計算
+            stats = rolling_stats(ys_all, spans, ma_windows or [], ema_windows or [])
+            if smooth_key is not None:
+                memo.save_arrays("smooth", smooth_key, pack_stats(spans, stats))
+
+    # 描画用の間引き（シーズンごとに独立、各シーズンの先頭・末尾・最大・最小は残す）
+    raw_segs = [(xs_all[a:b], ys_all[a:b]) for a, b in spans if b - a > 0]
+    if downsample is None or downsample > 0:
+        from sfbuff_downsample import AUTO_FACTOR, downsample_segments, figure_width_px
+        target = downsample or figure_width_px(fig, ax)
+        factor = 1 if downsample else AUTO_FACTOR
+        with stage("downsample", rows=len(data)):
+            raw_segs = downsample_segments(raw_segs, target, factor)
+            for key in ("sma", "ema"):
+                stats[key] = {n: downsample_segments(segs, target, factor) for n, segs in stats[key].items()}
+    t_draw = time.perf_counter()
 
     # 期間表示用
-    try:
-        first_dt = _parse_dt(data[0]["d"])
-        last_dt = _parse_dt(data[-1]["d"])
-    except Exception:
-        first_dt = last_dt = None
-    disp_from = date_from or (first_dt.strftime("%Y-%m-%d") if first_dt else "—")
-    disp_to = date_to or (last_dt.strftime("%Y-%m-%d") if last_dt else "—")
-
-    # シーズン分割
-    spans = split_seasons_by_jump(ys_all, season_threshold) if season_threshold else [(0, len(ys_all))]
+    disp_from = date_from or times.label(0) or "—"
+    disp_to = date_to or times.label(len(times) - 1) or "—"
 
-    fig, ax = plt.subplots(figsize=(11, 5), dpi=120)
 
     # 補助線（グリッド）を有効化
     ax.grid(True, axis="x", linewidth=2, alpha=0.1)
@@ -241,42 +246,26 @@ def plot_rank_history(
     # 生データ
     if not hide_raw:
         first_label_done = False
-        for (a, b) in spans:
-            if b - a <= 0:
-                continue
-            ax.plot(xs_all[a:b], ys_all[a:b],
+        for xs, ys in raw_segs:
+            ax.plot(xs, ys,
                     linewidth=1.0, alpha=0.75,
                     label=("Rating (raw)" if not first_label_done else None))
             first_label_done = True
 
     # SMA
-    uniq_ma = sorted(set(int(n) for n in (ma_windows or []) if int(n) > 0))
-    for n in uniq_ma:
+    for n, segs in stats["sma"].items():
         first_leg = True
-        for (a, b) in spans:
-            seg = ys_all[a:b]
-            if not seg:
-                continue
-            ma = moving_average(seg, n)
-            xs = [xs_all[a + i] for i, v in enumerate(ma) if v is not None]
-            ys = [v for v in ma if v is not None]
-            if xs:
-                ax.plot(xs, ys, linewidth=2.0, label=f"MA({n})" if first_leg else None)
-                first_leg = False
+        for xs, ys in segs:
+            ax.plot(xs, ys, linewidth=2.0, label=f"MA({n})" if first_leg else None)
+            first_leg = False
 
     # EMA
-    if ema_windows:
-        for n in sorted(set(int(w) for w in ema_windows if int(w) > 0)):
-            first_leg = True
-            for (a, b) in spans:
-                seg = ys_all[a:b]
-                if not seg:
-                    continue
-                ema = exponential_moving_average(seg, n)
-                xs = [xs_all[a + i] for i in range(len(ema))]
-                ax.plot(xs, ema, linewidth=2.0,
-                        label=f"EMA({n})" if first_leg else None)
-                first_leg = False
+    for n, segs in stats["ema"].items():
+        first_leg = True
+        for xs, ys in segs:
+            ax.plot(xs, ys, linewidth=2.0,
+                    label=f"EMA({n})" if first_leg else None)
+            first_leg = False
 
     # シーズン境界
     if len(spans) > 1:
@@ -291,7 +280,10 @@ def plot_rank_history(
     ax.margins(x=0)
 
     # 一度レイアウトを確定させる
-    fig.tight_layout()
+    if fast_layout:
+        fig.subplots_adjust(**FAST_LAYOUT_MARGINS)
+    else:
+        fig.tight_layout()
 
     # 1. matplotlibが自動で計算した目盛り位置をすべて取得
     tick_positions = [int(round(t)) for t in ax.get_xticks() if 1 <= t <= len(xs_all)]
@@ -316,28 +308,30 @@ def plot_rank_history(
         ax.axvline(x=pos, linestyle=":", linewidth=0.5, alpha=0.25, zorder=0)
 
     # 日付ラベル（青・45度）。y は軸座標で -0.12 くらい（必要なら微調整）
-    for pos in positions:
-        try:
-            dt = _parse_dt(data[pos - 1]["d"])
-            label = dt.strftime("%Y-%m-%d")
-        except Exception:
-            label = ""
-        if not label:
-            continue
-        ax.text(
-            pos, -0.12, label,
-            transform=xtrans,
-            rotation=45, ha="right", va="top",
-            fontsize=9, alpha=0.9, color="#1f77b4",
-            clip_on=False,
-        )
+    labels = [(pos, times.label(pos - 1)) for pos in positions]
+    labels = [(pos, label) for pos, label in labels if label]
+
+    if fast_layout:
+        # 副目盛りのラベルとして一括設定（主目盛りと同じ位置でも消されないようにする）
+        ax.xaxis.remove_overlapping_locs = False
+        ax.set_xticks([pos for pos, _ in labels], [label for _, label in labels], minor=True)
+        ax.tick_params(axis="x", which="minor", length=0, pad=26, labelsize=9,
+                       labelrotation=45, labelcolor="#1f77b4")
+        for t in ax.get_xticklabels(minor=True):
+            t.set_horizontalalignment("right")
+            t.set_alpha(0.9)
+    else:
+        for pos, label in labels:
+            ax.text(
+                pos, -0.12, label,
+                transform=xtrans,
+                rotation=45, ha="right", va="top",
+                fontsize=9, alpha=0.9, color="#1f77b4",
+                clip_on=False,
+            )
 
     # ====== 右下スタンプ ======
-    try:
-        last_match_dt = _parse_dt(data[-1]["d"])
-        last_match_str = last_match_dt.strftime("%Y-%m-%d %H:%M")
-    except Exception:
-        last_match_str = "—"
+    last_match_str = times.label(len(times) - 1, "%Y-%m-%d %H:%M") or "—"
 
     stamp = (
         f"Generated: {generated_at_str or ''}  |  "
@@ -350,10 +344,8 @@ def plot_rank_history(
         ax.set_xticks([])   # 目盛りを消す
         ax.set_xlabel("")   # ラベルも消す 
 
-    fig.savefig(out_path, bbox_inches="tight")
-    if show:
-        plt.show()
-    plt.close(fig)
+    if PROFILER.enabled:
+        PROFILER.record("render.draw", time.perf_counter() - t_draw, rows=len(data))
 
 
 # ========================= CLI =========================
@@ -367,7 +359,9 @@ def _cli():
     p.add_argument("--plot", action="store_true", help="グラフを作成してファイルに保存します。")
     p.add_argument("--ma", type=int, action="append", help="移動平均の窓幅。複数指定可。--plot 時必須。")
     p.add_argument("--ema", type=int, action="append", default=[], help="EMAの窓幅。複数指定可。")
-    p.add_argument("--out", default="rank_history.png", help="出力 PNG パス")
+    p.add_argument("--out", default="rank_history.png", help="出力 PNG パス（.svg なら SVG）")
+    p.add_argument("--renderer", default="matplotlib", choices=["matplotlib", "native"],
+                   help="描画方式（native=matplotlib を読み込まずに SVG / PNG を直接書く。PNG は Pillow が必要）")
     p.add_argument("--show", action="store_true", help="保存後にウィンドウ表示")
     p.add_argument("--hide-raw", action="store_true", help="生データ線を非表示")
     p.add_argument("--title", default=None, help="グラフタイトル")
@@ -376,7 +370,26 @@ def _cli():
     p.add_argument("--no-season-split", action="store_true", help="シーズン分割を無効化")
     p.add_argument("--stamp-tz", default="Asia/Tokyo", help="生成日時のタイムゾーン")
     p.add_argument("--hide-x", action="store_true", help="横軸の試合数を非表示にする")
-
+    p.add_argument("--downsample", type=int, default=None,
+                   help="描画前に各線をこの点数程度へ間引く（省略時は図の横幅ピクセル数で自動、0=間引かない）")
+    p.add_argument("--base-url", help=f"{BASE_URL} の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    p.add_argument("--extractor", default="auto", choices=["auto"] + list(BACKENDS),
+                   help="グラフデータの抽出方式（auto=高速スキャン→失敗時BeautifulSoup）")
+    p.add_argument("--store", help="履歴の保存先ディレクトリ。指定時は保存済み以降だけを取得して追記（差分同期）")
+    p.add_argument("--archive", help="列指向アーカイブの保存先。取得結果を (ID, キャラ) ごとに書き込む")
+    p.add_argument("--archive-only", action="store_true",
+                   help="取得せず --archive から読み込む（--from/--to で期間を切り出し）")
+    p.add_argument("--format", default="json", choices=["json", "jsonl", "csv"],
+                   help="stdout の形式（jsonl/csv は固定列＋クエリ条件付きで1点ずつ流す）")
+    p.add_argument("--shard-days", type=int, default=0,
+                   help="--from..--to をこの日数ごとに分けて並列取得してつなぐ（長い履歴向け。0=分けない）")
+    p.add_argument("--workers", type=int, default=4, help="--shard-days 時の同時取得数（デフォ:4）")
+    add_http_args(p)
+    p.add_argument("--cache-dir", help="HTTPキャッシュの保存先（指定時のみ有効）")
+    p.add_argument("--cache-max-mb", type=float, default=256, help="キャッシュの上限サイズ MB（デフォ:256）")
+    p.add_argument("--cache-ttl", type=float, default=300, help="未確定期間の再検証間隔 秒（デフォ:300）")
+    p.add_argument("--memo-dir", help="パース・平滑化・描画の結果の保存先。入力が前回と同じ段階は保存済みの結果を使う")
+    p.add_argument("--profile", help="段階ごとの所要時間・バイト数・行数を JSON で保存（- で stderr）")
 
     args = p.parse_args()
 
@@ -389,11 +402,76 @@ def _cli():
             if v is None or v <= 0:
                 p.error(f"{opt_name} の値は正の整数で指定してください: {v}")
 
+    if args.renderer == "native" and args.show:
+        p.error("--show は --renderer matplotlib のときだけ使えます")
+
+    if args.archive_only and not args.archive:
+        p.error("--archive-only には --archive の指定が必要です")
+
+    if args.shard_days < 0:
+        p.error("--shard-days は 0 以上で指定してください")
+    if args.shard_days and (not args.date_from or args.player_or_url.startswith("http")):
+        p.error("--shard-days はプレイヤーID と --from を指定したときだけ使えます")
+    if args.shard_days and (args.store or args.archive_only):
+        p.error("--shard-days は --store / --archive-only と併用できません")
+
     if args.date_to is None:
         args.date_to = datetime.today().strftime("%Y-%m-%d")
-
-    url = build_url(args.player_or_url, args.character, args.date_from, args.date_to)
-    data = scrape_rank_history(url)
+    if args.profile:
+        PROFILER.enable()
+
+    url = build_url(args.player_or_url, args.character, args.date_from, args.date_to, base_url=args.base_url)
+    # URL 指定でも保存先のキー（プレイヤー, キャラ）を取れるように
+    if args.player_or_url.startswith("http") and (args.store or args.archive):
+        from sfbuff_rank_store import parse_player_url
+        player, character = parse_player_url(args.player_or_url)
+    else:
+        player, character = args.player_or_url, args.character
+
+    sess = client = client_from_args(args, pool_size=max(16, args.workers))
+    cache = None
+    if args.cache_dir:
+        from sfbuff_cache import CachedSession, HttpCache
+        cache = HttpCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl)
+        sess = CachedSession(sess, cache)
+    memo = None
+    if args.memo_dir:
+        from sfbuff_memo import StageMemo
+        memo = StageMemo(args.memo_dir)
+    if args.archive_only:
+        from sfbuff_archive import RankArchive
+        data = RankArchive(args.archive).read_records(player, character,
+                                                      date_from=args.date_from, date_to=args.date_to)
+    elif args.store:
+        from sfbuff_rank_store import RankHistoryStore, sync_rank_history
+        store = RankHistoryStore(args.store)
+        added = sync_rank_history(store, player, character,
+                                  date_from=args.date_from, date_to=args.date_to, session=sess,
+                                  extractor=args.extractor, base_url=args.base_url)
+        print(f"[sync] {player} (character={character}): +{len(added)} points", file=sys.stderr)
+        data = store.load(player, character)
+    elif args.shard_days:
+        from sfbuff_rank_shards import iter_rank_shards
+        shards = iter_rank_shards(player, character, args.date_from, args.date_to, args.shard_days,
+                                  args.workers, session=sess, extractor=args.extractor, base_url=args.base_url)
+        if args.format != "json" and not (args.plot or args.archive):
+            # 全体を溜めずにシャードごとに流す（メモリは並列数 × シャード分まで）
+            from sfbuff_stream import RANK_FIELDS, rank_records, stream_records
+            query = {"player": player, "character": character, "from": args.date_from, "to": args.date_to}
+            with stage("write"):
+                n = stream_records(None, RANK_FIELDS, args.format,
+                                   (rec for points in shards for rec in rank_records(query, points)))
+            print(f"[shards] {n} points", file=sys.stderr)
+            _finish(args, client, cache)
+            return
+        data = [pt for points in shards for pt in points]
+    else:
+        data = scrape_rank_history(url, session=sess, extractor=args.extractor, memo=memo)
+
+    if args.archive and not args.archive_only:
+        from sfbuff_archive import RankArchive
+        with stage("write.archive", rows=len(data)):
+            RankArchive(args.archive).write(player, character, data)
 
     try:
         from zoneinfo import ZoneInfo
@@ -402,17 +480,22 @@ def _cli():
     except Exception:
         generated_at_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
-    # JSONはstdoutへ
-    json.dump(data, sys.stdout, ensure_ascii=False)
+    # JSONはstdoutへ（jsonl/csv は1点ずつ）
+    with stage("write", rows=len(data)):
+        if args.format == "json":
+            json.dump(data, sys.stdout, ensure_ascii=False)
+        else:
+            from sfbuff_stream import RANK_FIELDS, rank_records, stream_records
+            query = {"player": player, "character": character, "from": args.date_from, "to": args.date_to}
+            stream_records(None, RANK_FIELDS, args.format, rank_records(query, data))
 
     if args.plot:
         title = args.title or "Ranked History with Moving Averages"
         season_thr = None if args.no_season_split else args.season_threshold
-        plot_rank_history(
+        opts = dict(
             data=data,
             ma_windows=args.ma,
             out_path=args.out,
-            show=args.show,
             hide_raw=args.hide_raw,
             title=title,
             ema_windows=args.ema,
@@ -421,7 +504,33 @@ def _cli():
             date_to=args.date_to,
             generated_at_str=generated_at_str,
             hide_xaxis=args.hide_x,
+            downsample=args.downsample,
+            memo=memo,
         )
+        if args.renderer == "native":
+            from sfbuff_native_chart import render_native
+            render_native(**opts)
+        else:
+            plot_rank_history(show=args.show, **opts)
+    _finish(args, client, cache, memo)
+
+
+def _finish(args, client, cache=None, memo=None) -> None:
+    """取得・キャッシュ・スナップショット・メモの統計を stderr に出し、--profile を書き出す（どの経路でも最後に1回）。"""
+    if cache is not None:
+        from sfbuff_cache import format_stats
+        print(format_stats(cache.stats), file=sys.stderr)
+    http_stats = client.stats()
+    if http_stats["retries"] or http_stats["gave_up"]:
+        print(format_http_stats(http_stats), file=sys.stderr)
+    if client.snapshots is not None:
+        from sfbuff_snapshots import format_snapshot_stats
+        print(format_snapshot_stats(client.snapshots.stats), file=sys.stderr)
+    if memo is not None:
+        from sfbuff_memo import format_memo_stats
+        print(format_memo_stats(memo.stats), file=sys.stderr)
+    if args.profile:
+        PROFILER.write_report(args.profile)
 
 
 # ----------------------------------------------------------------------
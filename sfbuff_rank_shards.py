@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+
+"""
+長い Ranked History の期間分割取得（日数ごとのシャードを並列取得して時系列順につなぐ）
+
+- played_from..played_to を shard_days 日ずつの連続した窓に分け、窓ごとのページを並列に取得
+- 1ページ分の HTML / JSON は取得したスレッドの中で点列まで落としてから捨てるので、
+  同時に持つのは「並列数 × シャード1つ分」まで（全期間を1ページで取ると、その巨大な属性値を丸ごと抱える）
+- シャードは時系列順に並べ、境界の重複（前のシャードの最終点以前の点）を dedupe_after で除いてつなぐ
+- 1ページ全体で MR の系列があれば MR が選ばれるのに合わせ、使う系列（MR / LP）は最初に決める。
+  新しいシャードから順に点のあるものを1つ取得し、その系列で全体を決める（MR は一度付けばそれ以降のページに必ずある
+  ので、最新の窓に MR が無ければ全期間 LP）。決まったら残りは古い順にそのまま流し、違う系列のシャードは捨てる
+- 点の無いシャード（グラフ自体が無いページ）は空として扱う。全シャードが空なら1回取得と同じ例外を出す
+- HTTP キャッシュ（CachedSession）と組み合わせると、過去のシャードは閉じた期間として再利用される
+
+使い方:
+  points = fetch_rank_history_sharded("3629769034", 5, "2023-06-01", "2025-08-31", shard_days=60, workers=4)
+  for points in iter_rank_shards(...):   # シャードごとに時系列順（jsonl/csv へそのまま流す用）
+      ...
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import date, timedelta
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sfbuff_core import _parse_dt, rank_history_url, rank_series
+from sfbuff_extract import extract_chart
+from sfbuff_http import default_client
+from sfbuff_profile import stage
+from sfbuff_rank_store import dedupe_after
+
+DEFAULT_SHARD_DAYS = 60
+
+Window = Tuple[str, str]
+Shard = Tuple[Optional[str], List[dict]]  # (系列 "MR" / "LP" / None, 点列)
+
+
+# ---------------- 期間の分割 ----------------
+def shard_windows(date_from: str, date_to: str, shard_days: int = DEFAULT_SHARD_DAYS) -> List[Window]:
+    """[date_from, date_to]（両端含む）を shard_days 日ずつの窓に分割（古い順、最後の窓は切り詰め）。"""
+    if shard_days <= 0:
+        raise ValueError("shard_days は 1 以上で指定してください。")
+    start = date.fromisoformat(date_from[:10])
+    end = date.fromisoformat(date_to[:10])
+    if end < start:
+        raise ValueError(f"期間が逆です: {date_from} > {date_to}")
+    windows: List[Window] = []
+    cur = start
+    while cur <= end:
+        last = min(cur + timedelta(days=shard_days - 1), end)
+        windows.append((cur.isoformat(), last.isoformat()))
+        cur = last + timedelta(days=1)
+    return windows
+
+
+# ---------------- 1シャード ----------------
+def fetch_shard(url: str, session=None, extractor: str = "auto",
+                tz: str = "Asia/Tokyo") -> Tuple[Optional[str], List[dict]]:
+    """
+    1ページ分を取得して (系列 "MR" / "LP", 点列) を返す。グラフが無いページは (None, [])。
+    HTML とデコード前の JSON はこの関数の中で捨てる。
+    """
+    sess = session if session is not None else default_client(tz)
+    res = sess.get(url, timeout=getattr(sess, "timeout", 20))
+    res.raise_for_status()
+    with stage("decode", len(res.content)):
+        html_text = res.text
+    chart = extract_chart(html_text, backend=extractor)
+    del html_text, res
+    if chart is None:
+        return None, []
+    try:
+        with stage("parse.points") as st:
+            kind, points = rank_series(chart)
+            st.rows = len(points)
+    except RuntimeError:
+        return None, []
+    return kind, points
+
+
+# ---------------- つなぎ合わせ ----------------
+def _stitch(last: Optional[dict], points: List[dict]) -> List[dict]:
+    """前のシャードの最終点 last 以前の点を除く（重ならなければそのまま）。"""
+    if last is None or not points:
+        return points
+    if _parse_dt(points[0]["d"]).timestamp() > _parse_dt(last["d"]).timestamp():
+        return points
+    return dedupe_after(points, last)
+
+
+def _probe_kind(urls: List[str], session, extractor: str, tz: str) -> Tuple[Optional[str], Dict[int, Shard]]:
+    """新しいシャードから順に取得し、最初に点のあったシャードの系列を返す（取得したシャードも返して再利用する）。"""
+    probed: Dict[int, Shard] = {}
+    for i in range(len(urls) - 1, -1, -1):
+        probed[i] = fetch_shard(urls[i], session, extractor, tz)
+        if probed[i][0] is not None:
+            return probed[i][0], probed
+    return None, probed
+
+
+def iter_rank_shards(player: str,
+                     character_id: Optional[int],
+                     date_from: str,
+                     date_to: str,
+                     shard_days: int = DEFAULT_SHARD_DAYS,
+                     workers: int = 4,
+                     session=None,
+                     extractor: str = "auto",
+                     base_url: Optional[str] = None,
+                     tz: str = "Asia/Tokyo") -> Iterator[List[dict]]:
+    """
+    シャードを並列に取得し、重複を除いた点列をシャードの古い順に取得でき次第 yield する（空のシャードは出さない）。
+    系列（MR / LP）は先に最新側のシャードで決める。取得中・出力待ちのシャードは最大 workers 個
+    （ほかに系列を決めるときに取得した最新側のシャード1つを持つ）。
+    """
+    windows = shard_windows(date_from, date_to, shard_days)
+    urls = [rank_history_url(player, character_id, w_from, w_to, base_url=base_url) for w_from, w_to in windows]
+    workers = max(1, workers)
+
+    kind, probed = _probe_kind(urls, session, extractor, tz)
+    if kind is None:
+        raise RuntimeError("グラフデータ(data-chartjs-data-value)が見つかりませんでした。")
+
+    done: Dict[int, Shard] = {}
+    last: Optional[dict] = None
+    next_emit = 0
+    next_submit = 0
+
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        running = {}
+        while next_emit < len(urls):
+            # 「取得中＋出力待ち」が workers を超えないように投入（先頭が遅いと後ろが溜まり続けるのを防ぐ）
+            while next_submit < len(urls) and len(running) + len(done) < workers:
+                if next_submit not in probed:
+                    running[ex.submit(fetch_shard, urls[next_submit], session, extractor, tz)] = next_submit
+                next_submit += 1
+            if next_emit not in probed and next_emit not in done:
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done[running.pop(fut)] = fut.result()
+
+            while next_emit in done or next_emit in probed:
+                shard_kind, points = done.pop(next_emit) if next_emit in done else probed.pop(next_emit)
+                next_emit += 1
+                if shard_kind != kind:
+                    continue  # 空のシャード / 使わない系列
+                points = _stitch(last, points)
+                if points:
+                    last = points[-1]
+                    yield points
+
+
+def fetch_rank_history_sharded(player: str,
+                               character_id: Optional[int],
+                               date_from: str,
+                               date_to: str,
+                               shard_days: int = DEFAULT_SHARD_DAYS,
+                               workers: int = 4,
+                               session=None,
+                               extractor: str = "auto",
+                               base_url: Optional[str] = None,
+                               tz: str = "Asia/Tokyo") -> List[dict]:
+    """iter_rank_shards をつないだリスト（1回で全期間を取った scrape_rank_history と同じ点列）。"""
+    out: List[dict] = []
+    for points in iter_rank_shards(player, character_id, date_from, date_to, shard_days, workers,
+                                   session=session, extractor=extractor, base_url=base_url, tz=tz):
+        out.extend(points)
+    return out
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History のローカル保存 + 差分同期
+
+- (プレイヤー, キャラ) ごとに 1 ファイル（JSONL: 1行 = {"d": ..., "r": ...}）
+- 同期時は保存済みの最終点だけを読み、その日付から今日までを取得
+- 境界（最終点と同じ日）の重複を除いて追記するので、最新済みのプレイヤーは
+  「1日分の小さなリクエスト1回」だけで済み、過去分を読み直したりパースし直したりしない
+
+使い方:
+  store = RankHistoryStore("dist/history")
+  added = sync_rank_history(store, "3629769034", character_id=5)
+"""
+
+import json
+import os
+import re
+import urllib.parse
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sfbuff_core import _parse_dt
+from sfbuff_profile import stage
+from sfbuff_rank_history import build_url, scrape_rank_history
+
+
+# ---------------- 保存 ----------------
+class RankHistoryStore:
+    """(player, character) ごとの JSONL ファイル群。"""
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, player: str, character_id: Optional[int]) -> str:
+        ch = "all" if character_id is None else str(int(character_id))
+        return os.path.join(self.root, f"{player}_{ch}.jsonl")
+
+    def load(self, player: str, character_id: Optional[int]) -> List[dict]:
+        path = self.path(player, character_id)
+        if not os.path.exists(path):
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def last_point(self, player: str, character_id: Optional[int]) -> Optional[dict]:
+        """末尾から遡って最終行だけを読む（全体は読まない）。"""
+        path = self.path(player, character_id)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            return None
+        if size == 0:
+            return None
+        with open(path, "rb") as f:
+            block = 4096
+            pos = size
+            buf = b""
+            while pos > 0:
+                step = min(block, pos)
+                pos -= step
+                f.seek(pos)
+                buf = f.read(step) + buf
+                lines = [ln for ln in buf.split(b"\n") if ln.strip()]
+                # 先頭行は途中で切れている可能性があるので、2行以上あるか先頭まで読んだら確定
+                if len(lines) >= 2 or (pos == 0 and lines):
+                    return json.loads(lines[-1].decode("utf-8"))
+        return None
+
+    def append(self, player: str, character_id: Optional[int], points: List[dict]) -> None:
+        if not points:
+            return
+        path = self.path(player, character_id)
+        with open(path, "a", encoding="utf-8") as f:
+            for p in points:
+                f.write(json.dumps(p, ensure_ascii=False) + "\n")
+
+
+# ---------------- 同期 ----------------
+def _ts(val) -> float:
+    return _parse_dt(val).timestamp()
+
+
+def dedupe_after(points: List[dict], last: dict) -> List[dict]:
+    """
+    取得した points から、保存済み最終点 last 以前のものを除く。
+    最終点と同一の点（d と r が一致）が見つかればその直後から、
+    見つからなければ時刻が last より新しいものだけを残す。
+    """
+    for i in range(len(points) - 1, -1, -1):
+        if points[i].get("d") == last.get("d") and points[i].get("r") == last.get("r"):
+            return points[i + 1:]
+    last_ts = _ts(last["d"])
+    return [p for p in points if _ts(p["d"]) > last_ts]
+
+
+def parse_player_url(url: str) -> Tuple[str, Optional[int]]:
+    """ranked_history の URL から (player, home_character_id) を取り出す。"""
+    parts = urllib.parse.urlsplit(url)
+    m = re.search(r"/fighters/([^/]+)/", parts.path)
+    if not m:
+        raise ValueError(f"URL からプレイヤーIDを取得できません: {url}")
+    qs = dict(urllib.parse.parse_qsl(parts.query))
+    ch = qs.get("home_character_id")
+    return m.group(1), (int(ch) if ch not in (None, "") else None)
+
+
+def _site_date(value, tz: str) -> str:
+    """
+    保存済みの日時をサイト側（timezone cookie の tz）の日付 YYYY-MM-DD にする。
+    エポック値はこのマシンのローカル日付ではなく tz の日付。オフセットなしの文字列はサイトの表示どおりとみなす。
+    """
+    dt = _parse_dt(value)
+    is_epoch = isinstance(value, (int, float)) or (isinstance(value, str) and value.strip().isdigit())
+    if is_epoch or dt.tzinfo is not None:
+        try:
+            from zoneinfo import ZoneInfo
+            dt = dt.astimezone(ZoneInfo(tz))
+        except Exception:
+            dt -= timedelta(days=1)  # tz が使えないときは1日戻して取り直す（重複は dedupe_after で除去）
+    return dt.strftime("%Y-%m-%d")
+
+
+def sync_rank_history(store: RankHistoryStore,
+                      player: str,
+                      character_id: Optional[int] = None,
+                      date_from: Optional[str] = None,
+                      date_to: Optional[str] = None,
+                      tz: str = "Asia/Tokyo",
+                      session=None,
+                      extractor: str = "auto",
+                      base_url: Optional[str] = None) -> List[dict]:
+    """
+    保存済み最終点より新しい試合だけを取得して追記し、追加した点を返す。
+    初回（保存なし）は date_from..date_to を丸ごと取得。
+    """
+    last = store.last_point(player, character_id)
+    if last is not None:
+        # 最終点の（サイトの tz での）日付から取り直す（同日内の重複は dedupe_after で除去）
+        date_from = _site_date(last["d"], tz)
+    if date_to is None:
+        date_to = datetime.today().strftime("%Y-%m-%d")
+
+    url = build_url(player, character_id, date_from, date_to, base_url=base_url)
+    points = scrape_rank_history(url, tz=tz, session=session, extractor=extractor)
+    if last is not None:
+        points = dedupe_after(points, last)
+
+    with stage("write.store", rows=len(points)):
+        store.append(player, character_id, points)
+    return points
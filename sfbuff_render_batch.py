@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History の PNG 一括描画
+
+- 入力: sfbuff_rank_history.py の出力 JSON（[{"d", "r"}, ...]）や --store の JSONL を複数
+- プロセスプールで並列描画。各ワーカーは matplotlib を1回だけ import し、
+  Figure/Axes を1組だけ作って使い回す（毎回 ax.clear() して描き直す）
+- 描画は fast_layout（tight_layout と bbox_inches="tight" の再描画なし、日付は副目盛りラベル）
+- --memo-dir 指定時は入力ファイルの内容ハッシュ＋描画オプションで前回の PNG を探し、あればコピーするだけ
+  （判定は親プロセスで行い、描き直すものが無ければワーカーも matplotlib も起動しない）。
+  描き直す分も平滑化の結果は同じディレクトリに保存・再利用する（sfbuff_memo）
+- --renderer native なら matplotlib を使わず sfbuff_native_chart で描く（ワーカーも matplotlib を読み込まない）。
+  --ext svg で SVG（matplotlib でも native でも）
+
+使い方:
+  python sfbuff_render_batch.py dist/*.json --out-dir dist/png --ma 50 --ema 20 --workers 8
+  python sfbuff_render_batch.py --store dist/history --out-dir dist/png --ma 50
+  python sfbuff_render_batch.py --store dist/history --out-dir dist/png --ma 50 --memo-dir dist/memo
+  python sfbuff_render_batch.py --store dist/history --out-dir dist/svg --ma 50 --renderer native --ext svg
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# ワーカー内で使い回す Figure / Axes
+_fig = None
+_ax = None
+
+# ワーカー内で使い回す StageMemo（保存先ディレクトリごと）
+_memos: Dict[str, Any] = {}
+
+
+# ---------------- 入力 ----------------
+def load_history(path: str) -> List[dict]:
+    """JSON 配列（CLI 出力）と JSONL（--store）のどちらも読む。"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            return [json.loads(line) for line in f if line.strip()]
+        return json.load(f)
+
+
+def collect_inputs(paths: List[str], store: Optional[str]) -> List[str]:
+    files: List[str] = []
+    for p in paths:
+        files.extend(sorted(glob.glob(p)) or [p])
+    if store:
+        files.extend(sorted(glob.glob(os.path.join(store, "*.jsonl"))))
+    return files
+
+
+# ---------------- ワーカー ----------------
+def _init_worker() -> None:
+    """各ワーカープロセスで1回だけ: Agg で matplotlib を読み込み、Figure を作る。"""
+    global _fig, _ax
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from sfbuff_core import DPI, FIGSIZE
+    _fig, _ax = plt.subplots(figsize=FIGSIZE, dpi=DPI)
+
+
+def _reset_figure() -> None:
+    _ax.clear()
+    for t in list(_fig.texts):
+        t.remove()
+
+
+def _memo(root: str):
+    memo = _memos.get(root)
+    if memo is None:
+        from sfbuff_memo import StageMemo
+        memo = _memos[root] = StageMemo(root)
+    return memo
+
+
+def render_one(task: Tuple) -> Tuple[str, Optional[str], float]:
+    """
+    (入力, 出力, 描画オプション[, (メモの保存先, 入力のハッシュ, 描画のキー)]) を受けて PNG / SVG を保存。
+    描画オプションの "renderer" が "native" なら sfbuff_native_chart で描く（matplotlib は読み込まない）。
+    返り値: (出力, エラー or None, 所要秒)。
+    """
+    from sfbuff_profile import stage
+
+    in_path, out_path, opts = task[:3]
+    memo_task = task[3] if len(task) > 3 else None
+    opts = dict(opts)
+    renderer = opts.pop("renderer", "matplotlib")
+    t0 = time.perf_counter()
+    try:
+        data = load_history(in_path)
+        memo = data_key = None
+        if memo_task is not None:
+            memo, data_key = _memo(memo_task[0]), memo_task[1]
+        if renderer == "native":
+            from sfbuff_native_chart import render_native
+            render_native(data, out_path=out_path, **opts)
+        else:
+            from sfbuff_rank_history import draw_rank_history
+            if _fig is None:
+                _init_worker()
+            _reset_figure()
+            draw_rank_history(_fig, _ax, data, fast_layout=True, memo=memo, data_key=data_key, **opts)
+            with stage("render.savefig"):
+                _fig.savefig(out_path)
+        if memo is not None:
+            memo.save_file("render", memo_task[2], os.path.splitext(out_path)[1], out_path)
+        return out_path, None, time.perf_counter() - t0
+    except Exception as e:
+        return out_path, f"{type(e).__name__}: {e}", time.perf_counter() - t0
+
+
+def render_batch(inputs: List[str],
+                 out_dir: str,
+                 opts: Dict[str, Any],
+                 workers: Optional[int] = None,
+                 memo_dir: Optional[str] = None,
+                 ext: str = "png") -> Dict[str, Any]:
+    """
+    inputs を out_dir/<basename>.<ext>（png / svg）に描画。workers=1 ならプロセスを作らずその場で描く。
+    opts["renderer"] が "native" なら matplotlib を使わない（省略時は matplotlib）。
+    memo_dir を渡すと、入力ファイルと描画オプション（生成日時を除く）が前回と同じものは保存済みの出力をコピーする。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    tasks = [(p, os.path.join(out_dir, os.path.splitext(os.path.basename(p))[0] + "." + ext), opts)
+             for p in inputs]
+    t0 = time.perf_counter()
+    reused = 0
+    memo = None
+    if memo_dir:
+        from sfbuff_memo import digest_file, render_key_options
+        memo = _memo(memo_dir)
+        key_opts = render_key_options(dict(opts, fast_layout=True))
+        todo = []
+        for in_path, out_path, _ in tasks:
+            data_key = digest_file(in_path)
+            render_key = memo.key("render", data_key, key_opts)
+            if memo.copy_out("render", render_key, os.path.splitext(out_path)[1], out_path):
+                reused += 1
+            else:
+                todo.append((in_path, out_path, opts, (memo_dir, data_key, render_key)))
+        tasks = todo
+    if not tasks:
+        results = []
+    elif workers == 1:
+        results = [render_one(t) for t in tasks]
+    else:
+        # matplotlib はそれで描くときだけワーカーの起動時に読み込む
+        init = None if opts.get("renderer") == "native" else _init_worker
+        with ProcessPoolExecutor(max_workers=workers, initializer=init) as ex:
+            chunk = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+            results = list(ex.map(render_one, tasks, chunksize=chunk))
+    elapsed = time.perf_counter() - t0
+    errors = [(out, err) for out, err, _ in results if err]
+    return {
+        "charts": len(results) + reused,
+        "rendered": len(results),
+        "reused": reused,
+        "memo": memo.stats if memo is not None else None,
+        "errors": errors,
+        "elapsed": round(elapsed, 3),
+        "charts_per_min": round((len(results) + reused) / elapsed * 60, 1) if elapsed > 0 else None,
+    }
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="Ranked History の PNG 一括描画")
+    ap.add_argument("inputs", nargs="*", help="履歴 JSON / JSONL（glob 可）")
+    ap.add_argument("--store", help="sfbuff_rank_history.py --store の保存先（*.jsonl を全部描く）")
+    ap.add_argument("--out-dir", required=True, help="PNG の出力先ディレクトリ")
+    ap.add_argument("--workers", type=int, default=None, help="プロセス数（デフォルト: CPU 数）")
+    ap.add_argument("--ma", type=int, action="append", default=[], help="移動平均の窓幅。複数指定可。")
+    ap.add_argument("--ema", type=int, action="append", default=[], help="EMAの窓幅。複数指定可。")
+    ap.add_argument("--hide-raw", action="store_true", help="生データ線を非表示")
+    ap.add_argument("--season-threshold", type=float, default=40.0,
+                    help="差がこの値以上ならシーズン切替とみなす（デフォ:40）")
+    ap.add_argument("--no-season-split", action="store_true", help="シーズン分割を無効化")
+    ap.add_argument("--stamp-tz", default="Asia/Tokyo", help="生成日時のタイムゾーン")
+    ap.add_argument("--hide-x", action="store_true", help="横軸の試合数を非表示にする")
+    ap.add_argument("--downsample", type=int, default=None,
+                    help="描画前に各線をこの点数程度へ間引く（省略時は図の横幅ピクセル数で自動、0=間引かない）")
+    ap.add_argument("--renderer", default="matplotlib", choices=["matplotlib", "native"],
+                    help="描画方式（native=matplotlib を読み込まずに SVG / PNG を直接書く。PNG は Pillow が必要）")
+    ap.add_argument("--ext", default="png", choices=["png", "svg"], help="出力形式（デフォルト:png）")
+    ap.add_argument("--memo-dir", help="平滑化・描画の結果の保存先。入力と描画オプションが前回と同じなら PNG をコピーするだけ")
+    args = ap.parse_args()
+
+    if not (args.ma or args.ema):
+        ap.error("--ma または --ema を少なくとも1つ指定してください")
+    inputs = collect_inputs(args.inputs, args.store)
+    if not inputs:
+        ap.error("描画する入力がありません")
+
+    try:
+        from zoneinfo import ZoneInfo
+        generated_at_str = datetime.now(ZoneInfo(args.stamp_tz)).strftime("%Y-%m-%d %H:%M:%S %Z")
+    except Exception:
+        generated_at_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    opts = {
+        "ma_windows": args.ma,
+        "ema_windows": args.ema,
+        "hide_raw": args.hide_raw,
+        "season_threshold": None if args.no_season_split else args.season_threshold,
+        "generated_at_str": generated_at_str,
+        "hide_xaxis": args.hide_x,
+        "downsample": args.downsample,
+        "renderer": args.renderer,
+    }
+    stats = render_batch(inputs, args.out_dir, opts, workers=args.workers, memo_dir=args.memo_dir, ext=args.ext)
+    for out, err in stats["errors"]:
+        print(f"[render] {out}: {err}", file=sys.stderr)
+    print(f"[render] {stats['charts']} charts in {stats['elapsed']:.2f}s "
+          f"({stats['charts_per_min']} charts/min), rendered={stats['rendered']} reused={stats['reused']} "
+          f"errors={len(stats['errors'])}", file=sys.stderr)
+    if stats["memo"] is not None:
+        from sfbuff_memo import format_memo_stats
+        print(format_memo_stats(stats["memo"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _cli()
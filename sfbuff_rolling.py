@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History 用の NumPy 版ローリング統計エンジン
+
+- 履歴を一度だけ配列化（xs=試合番号 1..N, ys=レート）
+- シーズン切替（前試合との差が threshold 以上）をベクトル演算で検出
+- 全シーズン × 全 SMA/EMA 窓を 1 回の呼び出しでまとめて計算し、
+  描画にそのまま渡せる (x配列, y配列) のリストで返す
+
+数値は sfbuff_rank_history の moving_average / exponential_moving_average /
+split_seasons_by_jump と同一（SMA は同じ順序の累積和、EMA は同じ漸化式で計算）。
+"""
+
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+Series = Tuple[np.ndarray, np.ndarray]  # (xs, ys)
+
+
+# ---------------- 配列化 ----------------
+def to_arrays(data: Sequence[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """[{"d", "r"}, ...] → (xs: 1..N の int64, ys: float64)。"""
+    ys = np.fromiter((float(item["r"]) for item in data), dtype=np.float64, count=len(data))
+    xs = np.arange(1, len(ys) + 1, dtype=np.int64)
+    return xs, ys
+
+
+# ---------------- シーズン検出 ----------------
+def detect_seasons(ys: np.ndarray, threshold: Optional[float]) -> List[Tuple[int, int]]:
+    """split_seasons_by_jump のベクトル版。threshold が None/0 なら全体を1シーズン。"""
+    n = len(ys)
+    if n == 0:
+        return []
+    if not threshold:
+        return [(0, n)]
+    cuts = (np.flatnonzero(np.abs(np.diff(ys)) >= threshold) + 1).tolist()
+    starts = [0] + cuts
+    ends = cuts + [n]
+    return list(zip(starts, ends))
+
+
+# ---------------- 平滑化 ----------------
+def sma(ys: np.ndarray, n: int) -> np.ndarray:
+    """moving_average と同じ値。不足部は NaN。"""
+    if n <= 0:
+        raise ValueError("移動平均の窓幅 n は 1 以上で指定してください。")
+    out = np.full(len(ys), np.nan)
+    if len(ys) >= n:
+        csum = np.concatenate(([0.0], np.cumsum(ys)))  # np.cumsum は先頭から順に加算（Python の累積と同じ丸め）
+        out[n - 1:] = (csum[n:] - csum[:-n]) / n
+    return out
+
+
+def ema(ys: np.ndarray, n: int) -> np.ndarray:
+    """
+    exponential_moving_average と同じ値（全点に値を出す）。
+    EMA は前の値に依存する漸化式なので、1本の素の float ループで計算する（丸めも元実装と一致）。
+    """
+    if n <= 0:
+        raise ValueError("EMA の窓幅 n は 1 以上で指定してください。")
+    if len(ys) == 0:
+        return np.empty(0)
+    series = ys.tolist()
+    alpha = 2.0 / (n + 1.0)
+    prev = float(np.cumsum(ys[:n])[-1]) / n if len(series) >= n else float(series[0])
+    out = [prev] * len(series)
+    for i in range(1, len(series)):
+        prev = (series[i] - prev) * alpha + prev
+        out[i] = prev
+    return np.asarray(out)
+
+
+def rolling_stats(ys: np.ndarray,
+                  spans: List[Tuple[int, int]],
+                  ma_windows: Sequence[int] = (),
+                  ema_windows: Sequence[int] = ()) -> Dict[str, Dict[int, List[Series]]]:
+    """
+    全シーズン × 全窓をまとめて計算。
+    返り値: {"sma": {n: [(xs, ys), ...シーズン順]}, "ema": {n: [...]}}
+      xs は 1 始まりの試合番号。SMA は窓が埋まっていない先頭部分を除いた配列。
+    """
+    uniq_ma = sorted(set(int(n) for n in ma_windows if int(n) > 0))
+    uniq_ema = sorted(set(int(n) for n in ema_windows if int(n) > 0))
+    out: Dict[str, Dict[int, List[Series]]] = {
+        "sma": {n: [] for n in uniq_ma},
+        "ema": {n: [] for n in uniq_ema},
+    }
+    for a, b in spans:
+        seg = ys[a:b]
+        if len(seg) == 0:
+            continue
+        if uniq_ma:
+            csum = np.concatenate(([0.0], np.cumsum(seg)))
+            for n in uniq_ma:
+                if len(seg) >= n:
+                    out["sma"][n].append((np.arange(a + n, b + 1), (csum[n:] - csum[:-n]) / n))
+        for n in uniq_ema:
+            out["ema"][n].append((np.arange(a + 1, b + 1), ema(seg, n)))
+    return out
+
+
+# ---------------- 保存用の変換（sfbuff_memo の smooth 段階） ----------------
+def pack_stats(spans: List[Tuple[int, int]],
+               stats: Dict[str, Dict[int, List[Series]]]) -> Dict[str, np.ndarray]:
+    """シーズン区間と rolling_stats の結果を np.savez に渡せる名前付き配列にする。"""
+    arrays: Dict[str, np.ndarray] = {"spans": np.asarray(spans, dtype=np.int64).reshape(-1, 2)}
+    for kind in ("sma", "ema"):
+        arrays[f"{kind}_windows"] = np.asarray(sorted(stats[kind]), dtype=np.int64)
+        for n, segs in stats[kind].items():
+            arrays[f"{kind}_{n}_count"] = np.asarray(len(segs))
+            for i, (xs, ys) in enumerate(segs):
+                arrays[f"{kind}_{n}_{i}_x"] = xs
+                arrays[f"{kind}_{n}_{i}_y"] = ys
+    return arrays
+
+
+def unpack_stats(arrays: Dict[str, np.ndarray]) -> Tuple[List[Tuple[int, int]], Dict[str, Dict[int, List[Series]]]]:
+    """pack_stats の逆。"""
+    spans = [(int(a), int(b)) for a, b in arrays["spans"]]
+    stats: Dict[str, Dict[int, List[Series]]] = {}
+    for kind in ("sma", "ema"):
+        stats[kind] = {}
+        for n in arrays[f"{kind}_windows"].tolist():
+            count = int(arrays[f"{kind}_{n}_count"])
+            stats[kind][n] = [(arrays[f"{kind}_{n}_{i}_x"], arrays[f"{kind}_{n}_{i}_y"]) for i in range(count)]
+    return spans, stats
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""
+Matchup の1行を表すコンパクトな型（__slots__ ＋ 相手名・C/M のインターン）
+
+- parse_matchup_table / merge_inputs はこの型の行を返す（1行 = dict 1つより数分の1のメモリ）
+  * キー文字列を行ごとに持たない（列は __slots__ の固定枠）
+  * 相手名・C/M は sys.intern で同じ文字列オブジェクトを共有（数万ページ分でも名前は数十個）
+- Mapping なので row["wins"] / row.get("diff") / dict(row) / "control" in row など従来の dict と同じように読める
+  （dict との == も中身で比較）。json.dump には default=row_json_default を渡すか to_dict() で変換
+- 設定していない列（C/M 統合後の control など）はキーとしても存在しない → to_dict() は従来の dict と同じ形
+
+使い方:
+  row = MatchupRow("Ken", "C", total=10, wins=6, losses=4, draws=0, diff=2, win_rate=60.0)
+  row["win_rate"], row.to_dict()
+  json.dumps(rows, default=row_json_default)
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+# 列（dict 形式のキーの順番もこれ）
+FIELDS = ("opponent", "control", "total", "wins", "losses", "draws", "diff", "win_rate")
+_FIELD_SET = frozenset(FIELDS)
+
+_MISSING = object()
+_intern = sys.intern
+
+
+class MatchupRow(Mapping):
+    """相手×入力タイプの1行。control を省略すると control 列の無い行（C/M 統合後）になる。"""
+
+    __slots__ = FIELDS
+
+    def __init__(self,
+                 opponent: str,
+                 control: Any = _MISSING,
+                 total: Optional[int] = None,
+                 wins: Optional[int] = None,
+                 losses: Optional[int] = None,
+                 draws: Optional[int] = None,
+                 diff: Optional[int] = None,
+                 win_rate: Optional[float] = None):
+        self.opponent = _intern(opponent) if opponent.__class__ is str else opponent
+        if control is not _MISSING:
+            self.control = _intern(control) if control.__class__ is str else control
+        self.total = total
+        self.wins = wins
+        self.losses = losses
+        self.draws = draws
+        self.diff = diff
+        self.win_rate = win_rate
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "MatchupRow":
+        """dict 形式の行から作る（FIELDS 以外のキーは捨てる）。"""
+        return cls(d.get("opponent") or "", d.get("control", _MISSING),
+                   d.get("total"), d.get("wins"), d.get("losses"), d.get("draws"),
+                   d.get("diff"), d.get("win_rate"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        """従来の dict 形式（設定されている列だけ、FIELDS の順）。"""
+        # 書き出しのたびに呼ばれるので、ループせず dict リテラルで作る
+        try:
+            control = self.control
+        except AttributeError:
+            return {"opponent": self.opponent, "total": self.total, "wins": self.wins, "losses": self.losses,
+                    "draws": self.draws, "diff": self.diff, "win_rate": self.win_rate}
+        return {"opponent": self.opponent, "control": control, "total": self.total, "wins": self.wins,
+                "losses": self.losses, "draws": self.draws, "diff": self.diff, "win_rate": self.win_rate}
+
+    # ---------------- Mapping ----------------
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            v = getattr(self, key, _MISSING)
+            if v is not _MISSING:
+                return v
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key not in _FIELD_SET:
+            raise KeyError(f"MatchupRow に無い列です: {key}")
+        if key in ("opponent", "control") and value.__class__ is str:
+            value = _intern(value)
+        setattr(self, key, value)
+
+    def __iter__(self) -> Iterator[str]:
+        for k in FIELDS:
+            if getattr(self, k, _MISSING) is not _MISSING:
+                yield k
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __contains__(self, key: object) -> bool:
+        return key in _FIELD_SET and getattr(self, key, _MISSING) is not _MISSING
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in _FIELD_SET:
+            v = getattr(self, key, _MISSING)
+            if v is not _MISSING:
+                return v
+        return default
+
+    def __repr__(self) -> str:
+        return f"MatchupRow({self.to_dict()!r})"
+
+    def __reduce__(self):
+        # プロセスプール（sfbuff_snapshots の再パースなど）で送れるように
+        return (_row_from_dict, (self.to_dict(),))
+
+
+def _row_from_dict(d: Dict[str, Any]) -> MatchupRow:
+    return MatchupRow.from_dict(d)
+
+
+def row_json_default(obj: Any) -> Any:
+    """json.dump(..., default=row_json_default) 用。MatchupRow を dict にする。"""
+    if isinstance(obj, MatchupRow):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def row_fields(rows: Sequence[Any]) -> Optional[List[str]]:
+    """
+    行が全部同じ形の MatchupRow なら列名のリスト（全行を dict として走査しなくても決まる）。
+    control は型の上で省略可能な唯一の列なので、その有無だけを見る。
+    dict が混ざっている・control の有る行と無い行が混ざっているときは None。
+    """
+    shapes = set()
+    for r in rows:
+        if type(r) is not MatchupRow:
+            return None
+        shapes.add(hasattr(r, "control"))
+    if len(shapes) != 1:
+        return None
+    has_control = shapes.pop()
+    return [k for k in FIELDS if has_control or k != "control"]
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SFBuff ローカル JSON API（取得結果のメモリ LRU ＋ 同時リクエストの一本化）
+
+- GET /rank_history?player=ID&character=5&from=YYYY-MM-DD&to=YYYY-MM-DD
+    → {"query", "url", "points": [{"d", "r"}, ...]}（scrape_rank_history と同じ点）
+- GET /matchup?player=ID&character=5&input_type=0&battle_type=1&from=...&to=...&merge=1
+    → {"query", "url", "rows": [...]}（parse_page と同じ行。merge=1 で C/M を統合）
+- GET /stats（キャッシュ・一本化・HTTP の統計）/ GET /metrics（Prometheus テキスト）/ GET /healthz
+
+- 応答は JSON にエンコード済みのバイト列をメモリ LRU に置く（上限はバイト数と件数）
+  played_to が今日より前の「閉じた期間」は期限なし、それ以外は --ttl 秒で取り直す
+- 同じ URL への取得が同時に来たら、1本だけ上流に取りに行き、残りはその結果を待って使う
+  （matchup の merge あり / なしも同じ取得を共有する）。応答ヘッダ X-Cache は hit / miss / shared
+- スレッドで捌く（ThreadingHTTPServer）。上流への通信は HttpClient（接続プール＋レート制限＋リトライ）を共有
+
+使い方:
+  python sfbuff_server.py --port 8080
+  curl 'http://127.0.0.1:8080/matchup?player=3629769034&character=5&from=2025-08-01&to=2025-08-31&merge=1'
+  python sfbuff_server.py --port 8080 --base-url http://127.0.0.1:8000 --cache-mb 512 --ttl 60
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sfbuff_core import matchup_chart_url, merge_inputs, rank_history_url, site_today
+from sfbuff_http import HttpClient, add_http_args, client_from_args, format_http_stats
+from sfbuff_profile import PROFILER
+from sfbuff_rows import row_json_default
+
+DEFAULT_CACHE_MB = 256
+DEFAULT_MAX_ENTRIES = 4096
+DEFAULT_TTL = 300.0
+
+
+# ---------------- メモリ LRU ----------------
+class LRUCache:
+    """
+    バイト列を置く LRU。合計バイト数と件数の両方に上限。
+    put 時に expires（monotonic 秒、None=無期限）を付け、期限切れは get でミス扱いにして捨てる。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MB * 1024 * 1024, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._items: "OrderedDict[Any, Tuple[bytes, Optional[float]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+    def get(self, key) -> Optional[bytes]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.stats["misses"] += 1
+                return None
+            body, expires = item
+            if expires is not None and time.monotonic() >= expires:
+                self._drop_locked(key)
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return None
+            self._items.move_to_end(key)
+            self.stats["hits"] += 1
+            return body
+
+    def put(self, key, body: bytes, ttl: Optional[float]) -> None:
+        """ttl 秒だけ有効（None なら無期限）。1件で上限を超えるものは置かない。"""
+        if len(body) > self.max_bytes:
+            return
+        expires = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            if key in self._items:
+                self._drop_locked(key)
+            self._items[key] = (body, expires)
+            self._bytes += len(body)
+            while self._items and (self._bytes > self.max_bytes or len(self._items) > self.max_entries):
+                old = next(iter(self._items))
+                self._drop_locked(old)
+                self.stats["evictions"] += 1
+
+    def _drop_locked(self, key) -> None:
+        body, _ = self._items.pop(key)
+        self._bytes -= len(body)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self._bytes = 0
+
+
+# ---------------- 同時リクエストの一本化 ----------------
+class _Call:
+    __slots__ = ("done", "value", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """同じ key の fn 呼び出しが重なったら、最初の1本だけ実行して結果（例外も）を全員に返す。"""
+
+    def __init__(self):
+        self._calls: Dict[Any, _Call] = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn: Callable[[], Any]) -> Tuple[Any, bool]:
+        """(結果, 他の呼び出しの結果を共有したか) を返す。"""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+        try:
+            call.value = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value, False
+
+
+# ---------------- API 本体 ----------------
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+def _encode(obj: Any) -> bytes:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=row_json_default).encode("utf-8")
+
+
+def _is_closed(date_to: Optional[str], tz: Optional[str]) -> bool:
+    """to がサイト側（tz）の今日より前なら結果は今後変わらない。このマシンの日付では判定しない。"""
+    if not date_to:
+        return False
+    return date.fromisoformat(date_to) < site_today(tz)
+
+
+class ApiService:
+    """クエリ → JSON バイト列。HTTP ハンドラから複数スレッドで呼ばれる。"""
+
+    def __init__(self,
+                 client: HttpClient,
+                 session=None,
+                 base_url: Optional[str] = None,
+                 extractor: str = "auto",
+                 ttl: float = DEFAULT_TTL,
+                 cache: Optional[LRUCache] = None):
+        self.client = client
+        self.tz = client.tz
+        self.session = session if session is not None else client
+        self.base_url = base_url
+        self.extractor = extractor
+        self.ttl = ttl
+        self.cache = cache if cache is not None else LRUCache()
+        self.flight = SingleFlight()
+        self._lock = threading.Lock()
+        self.counters = {"requests": 0, "upstream_fetches": 0, "upstream_errors": 0}
+
+    # ---------------- 上流 ----------------
+    def _fetch_rank(self, url: str):
+        from sfbuff_rank_history import scrape_rank_history
+        return scrape_rank_history(url, session=self.session, extractor=self.extractor)
+
+    def _fetch_matchup(self, url: str):
+        from sfbuff_matchup_chart import parse_page
+        resp = self.session.get(url)
+        resp.raise_for_status()
+        rows, _ = parse_page(resp.text, merge=False, extractor=self.extractor)
+        return rows
+
+    def _upstream(self, url: str, fetch: Callable[[str], Any]):
+        """同じ URL の取得は一本化。失敗は 502 にしてキャッシュしない。"""
+        def run():
+            with self._lock:
+                self.counters["upstream_fetches"] += 1
+            try:
+                return fetch(url)
+            except Exception as e:
+                with self._lock:
+                    self.counters["upstream_errors"] += 1
+                raise ApiError(502, f"上流の取得に失敗しました: {type(e).__name__}: {e}")
+        value, _ = self.flight.do(url, run)
+        return value
+
+    def _cached(self, key: Tuple, date_to: Optional[str], build: Callable[[], Any]) -> Tuple[bytes, str]:
+        """
+        (JSON バイト列, "hit" / "miss" / "shared") を返す。
+        ミス時の組み立て（取得＋エンコード）も key ごとに一本化する。上流の取得自体は URL ごとに一本化。
+        """
+        with self._lock:
+            self.counters["requests"] += 1
+        body = self.cache.get(key)
+        if body is not None:
+            return body, "hit"
+
+        def run():
+            out = _encode(build())
+            self.cache.put(key, out, None if _is_closed(date_to, self.tz) else self.ttl)
+            return out
+        body, shared = self.flight.do(key, run)
+        return body, "shared" if shared else "miss"
+
+    # ---------------- エンドポイント ----------------
+    def rank_history(self, q: Dict[str, Any]) -> Tuple[bytes, str]:
+        url = rank_history_url(q["player"], q["character"], q["from"], q["to"], base_url=self.base_url)
+
+        def build():
+            return {"query": q, "url": url, "points": self._upstream(url, self._fetch_rank)}
+        return self._cached(("rank_history", url), q["to"], build)
+
+    def matchup(self, q: Dict[str, Any]) -> Tuple[bytes, str]:
+        url = matchup_chart_url(q["player"], q["character"], q["input_type"], q["battle_type"],
+                                q["from"], q["to"], base_url=self.base_url)
+
+        def build():
+            rows = self._upstream(url, self._fetch_matchup)
+            if q["merge"]:
+                # parse_page(merge=True) と同じ並び（相手名 → diff 昇順）
+                rows = merge_inputs(rows)
+                rows.sort(key=lambda r: (r.get("diff") if r.get("diff") is not None else 0))
+            return {"query": q, "url": url, "rows": rows}
+        return self._cached(("matchup", url, q["merge"]), q["to"], build)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self.counters)
+        return {
+            "counters": counters,
+            "cache": dict(self.cache.stats, entries=len(self.cache), bytes=self.cache.total_bytes),
+            "single_flight": dict(self.flight.stats),
+            "http": self.client.stats(),
+        }
+
+    def metrics(self) -> str:
+        s = self.stats()
+        extra = {f"api_{k}": v for k, v in s["counters"].items()}
+        extra.update({f"cache_{k}": v for k, v in s["cache"].items()})
+        extra.update({f"single_flight_{k}": v for k, v in s["single_flight"].items()})
+        extra.update({f"http_{k}": v for k, v in s["http"].items() if v is not None})
+        return PROFILER.to_prometheus(extra=extra)
+
+
+# ---------------- クエリの検証 ----------------
+def _opt_int(qs: Dict[str, str], name: str, default: Optional[int] = None) -> Optional[int]:
+    v = qs.get(name)
+    if v is None or v == "":
+        return default
+    try:
+        return int(v)
+    except ValueError:
+        raise ApiError(400, f"{name} は整数で指定してください: {v!r}")
+
+
+def _opt_date(qs: Dict[str, str], name: str) -> Optional[str]:
+    v = qs.get(name)
+    if not v:
+        return None
+    try:
+        return date.fromisoformat(v).isoformat()
+    except ValueError:
+        raise ApiError(400, f"{name} は YYYY-MM-DD で指定してください: {v!r}")
+
+
+def parse_query(path: str, qs: Dict[str, str]) -> Dict[str, Any]:
+    player = (qs.get("player") or "").strip()
+    if not player or not player.isdigit():
+        raise ApiError(400, "player（数字のプレイヤーID）は必須です")
+    q: Dict[str, Any] = {
+        "player": player,
+        "character": _opt_int(qs, "character"),
+        "from": _opt_date(qs, "from"),
+        "to": _opt_date(qs, "to"),
+    }
+    if path == "/matchup":
+        q["input_type"] = _opt_int(qs, "input_type")
+        q["battle_type"] = _opt_int(qs, "battle_type", 1)
+        q["merge"] = qs.get("merge", "").lower() in ("1", "true", "yes")
+    return q
+
+
+# ---------------- HTTP ----------------
+class ApiHandler(BaseHTTPRequestHandler):
+    service: ApiService = None
+    protocol_version = "HTTP/1.1"
+    verbose = False
+
+    def log_message(self, fmt, *args):
+        if self.verbose:
+            sys.stderr.write("[api] %s %s\n" % (self.address_string(), fmt % args))
+
+    def do_GET(self):
+        parts = urllib.parse.urlsplit(self.path)
+        path = parts.path.rstrip("/") or "/"
+        qs = dict(urllib.parse.parse_qsl(parts.query))
+        try:
+            if path == "/rank_history":
+                body, cache = self.service.rank_history(parse_query(path, qs))
+                return self._send(200, body, cache=cache)
+            if path == "/matchup":
+                body, cache = self.service.matchup(parse_query(path, qs))
+                return self._send(200, body, cache=cache)
+            if path == "/stats":
+                return self._send(200, _encode(self.service.stats()))
+            if path == "/metrics":
+                return self._send(200, self.service.metrics().encode("utf-8"),
+                                  content_type="text/plain; version=0.0.4; charset=utf-8")
+            if path == "/healthz":
+                return self._send(200, b'{"ok":true}')
+            raise ApiError(404, f"未知のパスです: {path}")
+        except ApiError as e:
+            self._send(e.status, _encode({"error": str(e)}))
+
+    def _send(self, status: int, body: bytes, cache: Optional[str] = None,
+              content_type: str = "application/json; charset=utf-8") -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        if cache:
+            self.send_header("X-Cache", cache)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+
+def start_api_server(service: ApiService, host: str = "127.0.0.1", port: int = 0) -> Tuple[ApiServer, str]:
+    """別スレッドで起動して (server, base_url) を返す。"""
+    handler = type("Handler", (ApiHandler,), {"service": service})
+    server = ApiServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="SFBuff ローカル JSON API（メモリ LRU ＋ 同時取得の一本化）")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--base-url", help="sfbuff.site の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    ap.add_argument("--extractor", default="auto", choices=["auto", "fast", "bs4"],
+                    help="グラフデータの抽出方式（auto=高速スキャン→失敗時BeautifulSoup）")
+    ap.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB,
+                    help=f"応答キャッシュの上限 MB（デフォルト:{DEFAULT_CACHE_MB}）")
+    ap.add_argument("--cache-entries", type=int, default=DEFAULT_MAX_ENTRIES,
+                    help=f"応答キャッシュの上限件数（デフォルト:{DEFAULT_MAX_ENTRIES}）")
+    ap.add_argument("--ttl", type=float, default=DEFAULT_TTL,
+                    help=f"今日を含む期間の応答を使い回す秒数（閉じた期間は無期限。デフォルト:{DEFAULT_TTL:g}）")
+    add_http_args(ap)
+    ap.add_argument("--cache-dir", help="上流ページのディスクキャッシュ（ETag 再検証。指定時のみ有効）")
+    ap.add_argument("--profile", action="store_true", help="段階ごとの計測を有効にして /metrics に含める")
+    ap.add_argument("-v", "--verbose", action="store_true", help="リクエストごとにログを出す")
+    args = ap.parse_args()
+
+    if args.profile:
+        PROFILER.enable()
+    client = client_from_args(args, pool_size=32)
+    session = client
+    if args.cache_dir:
+        from sfbuff_cache import CachedSession, HttpCache
+        session = CachedSession(client, HttpCache(args.cache_dir))
+    service = ApiService(client, session=session, base_url=args.base_url, extractor=args.extractor, ttl=args.ttl,
+                         cache=LRUCache(int(args.cache_mb * 1024 * 1024), args.cache_entries))
+
+    handler = type("Handler", (ApiHandler,), {"service": service, "verbose": args.verbose})
+    server = ApiServer((args.host, args.port), handler)
+    print(f"[api] listening on http://{args.host}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        s = service.stats()
+        print("[api] requests={requests} upstream_fetches={upstream_fetches} upstream_errors={upstream_errors}"
+              .format(**s["counters"]), file=sys.stderr)
+        print(format_http_stats(s["http"]), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _cli()
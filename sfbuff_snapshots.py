@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+取得ページのスナップショット保存（内容ハッシュで重複排除・gzip 圧縮）と、保存済みページの一括再パース
+
+ディレクトリ構成:
+  objects/ab/<sha256>.html.gz … ページ本文（sha256 は圧縮前の本文のハッシュ。同じ内容は1つだけ）
+  manifest.jsonl              … 取得1回ごとに1行 {"url", "fetched_at", "sha256", "size", "kind", "tz"}
+
+- HttpClient(snapshots=SnapshotStore(...)) にすると、ネットワークから取得した 200 の本文を全部保存する
+  （CLI では --snapshot-dir。CachedSession のヒットや 304 は取得していないので保存しない）
+- 同じ内容のページは本文を書かず manifest に1行足すだけ（閉じた期間の再取得はほぼこれ）
+- 再パース（replay）は manifest を読み、ユニークな本文ごとにプロセスプールで
+  Ranked History（extract_chart → MR/LP 点列）/ Matchup（parse_page: 表 → Chart フォールバック）をやり直す。
+  ワーカーが自分で本文を読んで展開するので、プロセス間で送るのはパース結果だけ
+- パーサを直したら、サイトを取り直さずに過去の全ページへ当て直せる
+
+使い方:
+  python sfbuff_rank_history.py 123456789 -c 5 --snapshot-dir dist/snapshots > dist/result.json
+  python sfbuff_snapshots.py dist/snapshots --workers 8 > dist/replay.jsonl
+  python sfbuff_snapshots.py dist/snapshots --kind matchup_chart --since 2025-01-01 --merge-inputs
+  python sfbuff_snapshots.py dist/snapshots --summary
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from sfbuff_extract import BACKENDS, extract_chart
+from sfbuff_rows import row_json_default
+
+KINDS = ("ranked_history", "matchup_chart")
+
+
+def page_kind(url: str) -> str:
+    """URL のパス末尾からページの種類（ranked_history / matchup_chart / other）。"""
+    last = urllib.parse.urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+    return last if last in KINDS else "other"
+
+
+# ---------------- 保存 ----------------
+class SnapshotStore:
+    """スナップショットの保存先。複数スレッドの HttpClient から共有してよい。"""
+
+    def __init__(self, root: str, compresslevel: int = 6):
+        self.root = os.path.expanduser(root)
+        self.compresslevel = compresslevel
+        self.manifest_path = os.path.join(self.root, "manifest.jsonl")
+        self.stats: Dict[str, int] = {"pages": 0, "new_objects": 0, "dedup": 0, "bytes_in": 0, "bytes_stored": 0}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(self.root, "objects"), exist_ok=True)
+
+    def object_path(self, sha: str) -> str:
+        return os.path.join(self.root, "objects", sha[:2], sha + ".html.gz")
+
+    def put(self, url: str, body: bytes, tz: Optional[str] = None, fetched_at: Optional[str] = None) -> str:
+        """本文を保存（既にあれば書かない）して manifest に1行追記。返り値は sha256。"""
+        sha = hashlib.sha256(body).hexdigest()
+        path = self.object_path(sha)
+        stored = 0
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            data = gzip.compress(body, compresslevel=self.compresslevel, mtime=0)
+            # 一時ファイル名はスレッドごとに変える（同じ本文を同時に書いても壊れない）
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+            stored = len(data)
+        entry = {
+            "url": url,
+            "fetched_at": fetched_at or datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "sha256": sha,
+            "size": len(body),
+            "kind": page_kind(url),
+            "tz": tz,
+        }
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            # 1行を1回の write で追記（別プロセスが同じ manifest に書いても行が混ざらない）
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.stats["pages"] += 1
+            self.stats["bytes_in"] += len(body)
+            if stored:
+                self.stats["new_objects"] += 1
+                self.stats["bytes_stored"] += stored
+            else:
+                self.stats["dedup"] += 1
+        return sha
+
+    # ---------------- 読み込み ----------------
+    def read(self, sha: str) -> bytes:
+        with open(self.object_path(sha), "rb") as f:
+            return gzip.decompress(f.read())
+
+    def entries(self,
+                kind: Optional[str] = None,
+                since: Optional[str] = None,
+                until: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """manifest を古い順に。since / until（YYYY-MM-DD、両端含む）は fetched_at（UTC）の日付で絞る。"""
+        try:
+            f = open(self.manifest_path, "r", encoding="utf-8")
+        except FileNotFoundError:
+            return
+        with f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    e = json.loads(line)
+                except ValueError:
+                    continue  # 書き込み途中で落ちた最終行など
+                day = (e.get("fetched_at") or "")[:10]
+                if kind and e.get("kind") != kind:
+                    continue
+                if (since and day < since[:10]) or (until and day > until[:10]):
+                    continue
+                yield e
+
+    def summary(self) -> Dict[str, Any]:
+        """manifest と objects の集計（取得回数・ユニーク本文数・元サイズ・保存サイズ）。"""
+        fetches = 0
+        kinds: Dict[str, int] = {}
+        sizes: Dict[str, int] = {}
+        for e in self.entries():
+            fetches += 1
+            kinds[e.get("kind") or "other"] = kinds.get(e.get("kind") or "other", 0) + 1
+            sizes[e["sha256"]] = int(e.get("size") or 0)
+        stored = 0
+        for sha in sizes:
+            try:
+                stored += os.path.getsize(self.object_path(sha))
+            except OSError:
+                pass
+        return {
+            "fetches": fetches,
+            "objects": len(sizes),
+            "kinds": kinds,
+            "bytes_raw": sum(sizes.values()),
+            "bytes_stored": stored,
+        }
+
+
+def format_snapshot_stats(stats: Dict[str, int]) -> str:
+    return ("[snapshots] pages={pages} new={new_objects} dedup={dedup} "
+            "bytes_in={bytes_in} bytes_stored={bytes_stored}").format(**stats)
+
+
+# ---------------- 再パース（ワーカー） ----------------
+_store: Optional[SnapshotStore] = None
+_opts: Dict[str, Any] = {}
+
+
+def _init_worker(root: str, opts: Dict[str, Any]) -> None:
+    """各ワーカープロセスで1回だけ: 保存先と再パースのオプションを覚える。"""
+    global _store, _opts
+    _store, _opts = SnapshotStore(root), opts
+
+
+def parse_snapshot(html_text: str, kind: str, opts: Dict[str, Any]) -> Dict[str, Any]:
+    """1ページ分の HTML を種類に応じてパースし、出力レコードの中身（rows / points など）を返す。"""
+    extractor = opts.get("extractor", "auto")
+    if kind == "ranked_history":
+        from sfbuff_core import rank_series
+        chart = extract_chart(html_text, backend=extractor)
+        if chart is None:
+            raise RuntimeError("グラフデータ(data-chartjs-data-value)が見つかりませんでした。")
+        series, points = rank_series(chart)
+        return {"series": series, "points": points}
+    if kind == "matchup_chart":
+        from sfbuff_matchup_chart import parse_page
+        rows, chart = parse_page(html_text, merge=opts.get("merge", False), extractor=extractor,
+                                 with_chart=opts.get("with_chart", False))
+        out: Dict[str, Any] = {"rows": rows}
+        if opts.get("with_chart"):
+            out["chart"] = chart
+        return out
+    raise ValueError(f"再パースできないページです: {kind}")
+
+
+def replay_one(task: Tuple[str, str]) -> Dict[str, Any]:
+    """(sha256, 種類) を受けて本文を読み、パースした結果（失敗時は error）を返す。"""
+    sha, kind = task
+    t0 = time.perf_counter()
+    out: Dict[str, Any] = {"sha256": sha, "kind": kind}
+    try:
+        html_text = _store.read(sha).decode("utf-8", errors="replace")
+        out.update(parse_snapshot(html_text, kind, _opts))
+    except Exception as e:
+        out["error"] = f"{type(e).__name__}: {e}"
+    out["elapsed"] = round(time.perf_counter() - t0, 4)
+    return out
+
+
+# ---------------- 再パース ----------------
+def replay(store: SnapshotStore,
+           workers: Optional[int] = None,
+           kind: Optional[str] = None,
+           since: Optional[str] = None,
+           until: Optional[str] = None,
+           opts: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+    """
+    manifest のユニークな本文ごとに再パースし、初めて取得した順に yield する。
+    各レコードには同じ本文を取得した回の一覧 "fetches": [{"url", "fetched_at"}, ...] を付ける。
+    種類が other のページは対象外。workers=1 ならプロセスを作らずその場でパースする。
+    """
+    opts = dict(opts or {})
+    fetches: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+    for e in store.entries(kind=kind, since=since, until=until):
+        if e.get("kind") not in KINDS:
+            continue
+        fetches.setdefault((e["sha256"], e["kind"]), []).append({"url": e["url"], "fetched_at": e["fetched_at"]})
+    tasks = list(fetches)
+
+    if workers == 1:
+        _init_worker(store.root, opts)
+        results = map(replay_one, tasks)
+        for task, res in zip(tasks, results):
+            res["fetches"] = fetches[task]
+            yield res
+        return
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(store.root, opts)) as ex:
+        chunk = max(1, len(tasks) // ((workers or os.cpu_count() or 1) * 4))
+        for task, res in zip(tasks, ex.map(replay_one, tasks, chunksize=chunk)):
+            res["fetches"] = fetches[task]
+            yield res
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="保存済みスナップショット（--snapshot-dir）の一括再パース")
+    ap.add_argument("snapshot_dir", help="--snapshot-dir で保存したディレクトリ")
+    ap.add_argument("--kind", choices=list(KINDS), help="この種類のページだけ再パース")
+    ap.add_argument("--since", help="取得日（UTC）がこの日以降のものだけ (YYYY-MM-DD)")
+    ap.add_argument("--until", help="取得日（UTC）がこの日以前のものだけ (YYYY-MM-DD)")
+    ap.add_argument("--workers", type=int, default=None, help="プロセス数（デフォルト: CPU 数、1=プロセスを作らない）")
+    ap.add_argument("--extractor", default="auto", choices=["auto"] + list(BACKENDS),
+                    help="グラフデータ／表の切り出し方式（auto=高速スキャン→失敗時BeautifulSoup）")
+    ap.add_argument("--merge-inputs", action="store_true", help="Matchup の C/M を統合")
+    ap.add_argument("--with-chart", action="store_true", help="Matchup で表が取れても Chart JSON も出す")
+    ap.add_argument("--summary", action="store_true", help="再パースせず、件数とサイズだけ表示")
+    args = ap.parse_args()
+
+    store = SnapshotStore(args.snapshot_dir)
+    if args.summary:
+        json.dump(store.summary(), sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write("\n")
+        return
+
+    opts = {"extractor": args.extractor, "merge": args.merge_inputs, "with_chart": args.with_chart}
+    t0 = time.perf_counter()
+    pages = fetched = errors = 0
+    for rec in replay(store, args.workers, kind=args.kind, since=args.since, until=args.until, opts=opts):
+        pages += 1
+        fetched += len(rec["fetches"])
+        if "error" in rec:
+            errors += 1
+            print(f"[replay] {rec['fetches'][0]['url']}: {rec['error']}", file=sys.stderr)
+        sys.stdout.write(json.dumps(rec, ensure_ascii=False, default=row_json_default) + "\n")
+    elapsed = time.perf_counter() - t0
+    rate = f"{pages / elapsed:.1f}" if elapsed > 0 else "-"
+    print(f"[replay] {pages} pages ({fetched} fetches) in {elapsed:.2f}s ({rate} pages/s), errors={errors}",
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _cli()
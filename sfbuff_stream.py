@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+
+"""
+ストリーミング出力（JSONL / CSV）
+
+- レコード（Rank の1点 / Matchup の1行）にクエリ条件を付けて、生成された順にそのまま書き出す
+- スキーマ（列）は固定で先に宣言するので、CSV もヘッダを最初に書ける（全行を見て列を集める必要がない）
+- flush は flush_every 件ごと（省略時は端末なら1件ごと、パイプ・ファイルなら FLUSH_EVERY 件ごと）。
+  件数の多い出力で1件ごとに write のシステムコールを出さず、下流もまとまった単位ですぐ読み始められる
+- スキーマに無いキーは捨て、無いキーは JSONL では null、CSV では空欄
+
+使い方:
+  with open_output("-") as f:
+      w = RecordWriter(f, MATCHUP_FIELDS, fmt="jsonl")
+      w.write_many(matchup_records(query, rows))
+"""
+
+import csv
+import json
+import os
+import re
+import sys
+import urllib.parse
+from contextlib import contextmanager
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Sequence
+
+from sfbuff_rows import MatchupRow
+
+FORMATS = ("jsonl", "csv")
+
+# 出力先が端末でないときに flush する件数
+FLUSH_EVERY = 256
+
+# クエリ条件の列
+QUERY_FIELDS = ("player", "character", "input_type", "battle_type", "from", "to")
+
+# Ranked History: 1行=1試合
+RANK_FIELDS = ("player", "character", "from", "to", "d", "r")
+
+# Matchup: 1行=相手×入力タイプ（series/value は Chart フォールバック由来の行だけが持つ）
+MATCHUP_FIELDS = QUERY_FIELDS + (
+    "opponent", "control", "total", "wins", "losses", "draws", "diff", "win_rate", "series", "value",
+)
+
+
+# ---------------- クエリ ----------------
+def query_from_url(url: str) -> Dict[str, Any]:
+    """matchup_chart / ranked_history の URL からクエリ条件を取り出す（CLI 用）。"""
+    parts = urllib.parse.urlsplit(url)
+    m = re.search(r"/fighters/([^/]+)/", parts.path)
+    qs = dict(urllib.parse.parse_qsl(parts.query))
+
+    def _int(key: str) -> Optional[int]:
+        v = qs.get(key)
+        return int(v) if v not in (None, "") and v.lstrip("-").isdigit() else None
+
+    return {
+        "player": m.group(1) if m else None,
+        "character": _int("home_character_id"),
+        "input_type": _int("home_input_type_id"),
+        "battle_type": _int("battle_type_id"),
+        "from": qs.get("played_from"),
+        "to": qs.get("played_to"),
+    }
+
+
+# ---------------- レコード生成 ----------------
+def rank_records(query: Dict[str, Any], data: Iterable[dict]) -> Iterator[Dict[str, Any]]:
+    """[{"d", "r"}, ...] にクエリ条件を付けて1点ずつ返す。"""
+    tag = {k: query.get(k) for k in RANK_FIELDS[:4]}
+    for p in data:
+        rec = dict(tag)
+        rec["d"] = p["d"]
+        rec["r"] = p["r"]
+        yield rec
+
+
+def matchup_records(query: Dict[str, Any], rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    """Matchup の行にクエリ条件を付けて1行ずつ返す。"""
+    tag = {k: query.get(k) for k in QUERY_FIELDS}
+    for r in rows:
+        rec = dict(tag)
+        rec.update(r.to_dict() if type(r) is MatchupRow else r)
+        yield rec
+
+
+# ---------------- 書き出し ----------------
+@contextmanager
+def open_output(path: Optional[str]) -> Iterator[IO[str]]:
+    """path が None / "-" なら stdout（閉じない）。それ以外はファイルを開く。"""
+    if path in (None, "-"):
+        try:
+            yield sys.stdout
+        except BrokenPipeError:
+            # 下流（head 等）が先に閉じた。終了時の flush で再び落ちないよう stdout を捨て先に向ける
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        yield f
+
+
+class RecordWriter:
+    """固定スキーマで JSONL / CSV を1レコードずつ書く。"""
+
+    def __init__(self, f: IO[str], fields: Sequence[str], fmt: str = "jsonl", flush_every: Optional[int] = None):
+        if fmt not in FORMATS:
+            raise ValueError(f"未対応の出力形式です: {fmt}（{', '.join(FORMATS)}）")
+        self.f = f
+        self.fields = tuple(fields)
+        self.fmt = fmt
+        if flush_every is None:
+            flush_every = 1 if _isatty(f) else FLUSH_EVERY
+        self.flush_every = max(1, flush_every)
+        self.count = 0
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(f)
+            self._csv.writerow(self.fields)
+            f.flush()
+
+    def write(self, rec: Dict[str, Any]) -> None:
+        if self._csv is not None:
+            self._csv.writerow(["" if rec.get(k) is None else rec.get(k) for k in self.fields])
+        else:
+            self.f.write(json.dumps({k: rec.get(k) for k in self.fields}, ensure_ascii=False))
+            self.f.write("\n")
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.f.flush()
+
+    def write_many(self, recs: Iterable[Dict[str, Any]]) -> int:
+        n = 0
+        for rec in recs:
+            self.write(rec)
+            n += 1
+        return n
+
+    def flush(self) -> None:
+        self.f.flush()
+
+    def close(self) -> None:
+        self.f.flush()
+
+
+def _isatty(f: IO[str]) -> bool:
+    try:
+        return f.isatty()
+    except (AttributeError, ValueError):
+        return False
+
+
+def stream_records(path: Optional[str], fields: Sequence[str], fmt: str,
+                   recs: Iterable[Dict[str, Any]], flush_every: Optional[int] = None) -> int:
+    """recs を path（None / "-" は stdout）へ流し込み、書いた件数を返す。"""
+    with open_output(path) as f:
+        w = RecordWriter(f, fields, fmt=fmt, flush_every=flush_every)
+        w.write_many(recs)
+        w.close()
+    return w.count
+
@@ -0,0 +1,150 @@
+# -*- coding: utf-8 -*-
+
+"""
+Ranked History の時刻列（x）を一度だけ型付きの配列に変換する
+
+- _parse_dt は値ごとに「ISO文字列 / 秒 / ミリ秒 / マイクロ秒」を判定し直すが、
+  TimeColumn はデータセット単位で1回だけ判定し、epoch ミリ秒の int64 配列へまとめて変換する
+    * 数値（または数字だけの文字列）: 最大値の桁で単位を決めて一括換算
+    * 同じオフセット付きの ISO 文字列: オフセットを外して numpy の datetime64 で一括パース
+    * それ以外（ナイーブな ISO 等）: 値ごとの _parse_dt にフォールバック（それでも変換は取り込み時の1回だけ）
+- 日付ラベルは表示用タイムゾーンで作り、キャッシュする
+- 日付範囲の絞り込みは searchsorted（ソート済み前提）
+
+表示は _parse_dt と同じ: epoch 値とナイーブ ISO はローカル時刻、オフセット付き ISO はそのオフセットの時刻。
+"""
+
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Optional, Sequence, Tuple
+
+import numpy as np
+
+from sfbuff_core import _parse_dt
+
+# 変換できなかった値
+MISSING = np.iinfo(np.int64).min
+
+
+@lru_cache(maxsize=4096)
+def _format_ms(ms: int, tz: Optional[tzinfo], fmt: str) -> str:
+    return datetime.fromtimestamp(ms / 1000.0, tz).strftime(fmt)
+
+
+def _unit_factor(max_abs: float) -> float:
+    """epoch 値の単位 → ミリ秒への倍率（_parse_dt と同じ閾値）。"""
+    if max_abs >= 1e15:      # microseconds
+        return 1e-3
+    if max_abs >= 1e12:      # milliseconds
+        return 1.0
+    return 1e3               # seconds
+
+
+def _offset_suffix(s: str) -> Optional[Tuple[int, int]]:
+    """末尾の "Z" / "±HH:MM" を (接尾辞の長さ, オフセット分) で返す。無ければ None。"""
+    if s.endswith("Z"):
+        return 1, 0
+    tail = s[-6:]
+    if len(tail) == 6 and tail[0] in "+-" and tail[3] == ":" and tail[1:3].isdigit() and tail[4:].isdigit():
+        minutes = int(tail[1:3]) * 60 + int(tail[4:])
+        return 6, (-minutes if tail[0] == "-" else minutes)
+    return None
+
+
+class TimeColumn:
+    """epoch ミリ秒（int64）の列と、表示用タイムゾーン（None=ローカル）。"""
+
+    def __init__(self, ms: np.ndarray, tz: Optional[tzinfo] = None):
+        self.ms = np.asarray(ms, dtype=np.int64)
+        self.tz = tz
+
+    def __len__(self) -> int:
+        return len(self.ms)
+
+    # ---------------- 変換 ----------------
+    @classmethod
+    def from_values(cls, values: Sequence) -> "TimeColumn":
+        if len(values) == 0:
+            return cls(np.empty(0, dtype=np.int64))
+        first = values[0]
+
+        # 数値 / 数字だけの文字列
+        if isinstance(first, (int, float)) or (isinstance(first, str) and first.strip().isdigit()):
+            try:
+                arr = np.asarray(values, dtype=np.float64)
+                factor = _unit_factor(float(np.nanmax(np.abs(arr))))
+                return cls(np.round(arr * factor).astype(np.int64))
+            except (TypeError, ValueError):
+                return cls._from_values_slow(values)
+
+        # 共通オフセット付き ISO 文字列
+        if isinstance(first, str):
+            suf = _offset_suffix(first.strip())
+            if suf is not None:
+                cut, minutes = suf
+                try:
+                    if len({v[-cut:] for v in values}) == 1:
+                        arr = np.array([v[:-cut] for v in values], dtype="datetime64[ms]")
+                        ms = arr.astype(np.int64) - minutes * 60_000
+                        return cls(ms, timezone(timedelta(minutes=minutes)))
+                except (TypeError, ValueError):
+                    pass
+        return cls._from_values_slow(values)
+
+    @classmethod
+    def _from_values_slow(cls, values: Sequence) -> "TimeColumn":
+        """値ごとに _parse_dt（取り込み時の1回だけ）。表示 tz は最初に解釈できた値に合わせる。"""
+        ms = np.empty(len(values), dtype=np.int64)
+        tz = None
+        tz_set = False
+        for i, v in enumerate(values):
+            try:
+                dt = _parse_dt(v)
+            except Exception:
+                ms[i] = MISSING
+                continue
+            if not tz_set:
+                tz = dt.tzinfo
+                tz_set = True
+            ms[i] = int(round(dt.timestamp() * 1000))
+        return cls(ms, tz)
+
+    # ---------------- 参照 ----------------
+    def valid(self, i: int) -> bool:
+        return int(self.ms[i]) != MISSING
+
+    def to_datetime(self, i: int) -> datetime:
+        v = int(self.ms[i])
+        if v == MISSING:
+            raise ValueError(f"日時の解釈に失敗した行です: {i}")
+        return datetime.fromtimestamp(v / 1000.0, self.tz)
+
+    def label(self, i: int, fmt: str = "%Y-%m-%d") -> str:
+        """i 番目の日時を fmt で整形（キャッシュ付き）。解釈できない行は ""。"""
+        v = int(self.ms[i])
+        if v == MISSING:
+            return ""
+        return _format_ms(v, self.tz, fmt)
+
+    def slice_dates(self, date_from: Optional[str] = None, date_to: Optional[str] = None) -> Tuple[int, int]:
+        """表示 tz の日付で [date_from, date_to] に入る行の範囲 (lo, hi) を返す（ソート済み前提）。"""
+        lo, hi = 0, len(self.ms)
+        if date_from:
+            lo = int(np.searchsorted(self.ms, self._day_start_ms(date_from), side="left"))
+        if date_to:
+            end = (datetime.strptime(date_to[:10], "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            hi = int(np.searchsorted(self.ms, self._day_start_ms(end), side="left"))
+        return lo, hi
+
+    def _day_start_ms(self, day: str) -> int:
+        d = datetime.strptime(day[:10], "%Y-%m-%d")
+        if self.tz is not None:
+            d = d.replace(tzinfo=self.tz)
+        return int(d.timestamp() * 1000)
+
+
+def history_columns(data: Sequence[dict]) -> Tuple[TimeColumn, np.ndarray]:
+    """[{"d", "r"}, ...] → (TimeColumn, レートの float64 配列)。"""
+    tc = TimeColumn.from_values([p["d"] for p in data])
+    ratings = np.fromiter((float(p["r"]) for p in data), dtype=np.float64, count=len(data))
+    return tc, ratings
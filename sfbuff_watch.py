@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+SFBuff 常駐モード（ロスターを定期的に最新化）
+
+- roster(JSON) のプレイヤーごとに、Ranked History を --store へ差分同期（保存済み以降だけ取得）
+- 更新間隔はプレイヤーごとに自動調整: 新しい試合があれば最短間隔に戻し、無ければ backoff 倍ずつ延ばす（上限あり）
+- 点が増えたときだけ PNG を描き直す（matplotlib は初回の描画時に1回だけ読み込み、Figure を使い回す）
+- "matchup": true のプレイヤーは matchup_chart も取得し、行が変わったときだけ JSON を書き直す
+- 通信は HttpClient（接続プール＋レート制限＋リトライ）を全体で共有。--cache-dir 指定時は ETag で再検証
+- 状態（次回予定・間隔・最終更新）は out-dir/status.json に随時書き出す。Ctrl+C / SIGTERM で終了
+- --profile なら段階ごとの計測を status.json に含め、--metrics PATH なら同じ内容を Prometheus のテキスト形式で書き出す
+  （node_exporter の textfile collector 等で拾える）
+
+roster 例:
+  {
+    "players": ["3629769034", {"player": "123456789", "character": 5, "matchup": true}],
+    "from": "2025-01-01",
+    "plot": {"ma": [50], "ema": [20]}
+  }
+  - 文字列だけの要素はキャラ指定なし（全キャラ）。"plot" を省略すると描画しない
+
+使い方:
+  python sfbuff_watch.py roster.json --store dist/history --out-dir dist/watch
+  python sfbuff_watch.py roster.json --store dist/history --out-dir dist/watch --once   # 1巡だけ
+  python sfbuff_watch.py roster.json --store /tmp/h --out-dir /tmp/w --base-url http://127.0.0.1:8000 --min-interval 5
+"""
+
+import argparse
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import random
+import signal
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sfbuff_http import HttpClient, add_http_args, client_from_args, format_http_stats
+from sfbuff_profile import PROFILER, stage
+from sfbuff_rank_store import RankHistoryStore, sync_rank_history
+from sfbuff_rows import row_json_default
+
+
+# ---------------- roster ----------------
+class Entry:
+    """ロスターの1人分と、そのスケジュール状態。"""
+
+    def __init__(self, player: str, character: Optional[int] = None, matchup: bool = False,
+                 date_from: Optional[str] = None, interval: float = 60.0):
+        self.player = str(player)
+        self.character = character
+        self.matchup = matchup
+        self.date_from = date_from
+        self.interval = interval
+        self.next_due = 0.0
+        self.last_refresh: Optional[str] = None
+        self.last_added = 0
+        self.matchup_digest: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        return f"{self.player}:{'all' if self.character is None else self.character}"
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "interval": round(self.interval, 1),
+            "next_in": round(max(0.0, self.next_due - time.monotonic()), 1),
+            "last_refresh": self.last_refresh,
+            "last_added": self.last_added,
+            "error": self.error,
+        }
+
+
+def load_roster(path: str, min_interval: float) -> Tuple[List[Entry], Dict[str, Any]]:
+    """roster JSON → (エントリ, 描画オプション or {})。"""
+    with open(path, "r", encoding="utf-8") as f:
+        roster = json.load(f)
+    entries: List[Entry] = []
+    for p in roster.get("players") or []:
+        if isinstance(p, dict):
+            entries.append(Entry(p["player"], p.get("character"), bool(p.get("matchup", roster.get("matchup"))),
+                                 p.get("from", roster.get("from")), min_interval))
+        else:
+            entries.append(Entry(p, None, bool(roster.get("matchup")), roster.get("from"), min_interval))
+    return entries, roster.get("plot") or {}
+
+
+# ---------------- 常駐本体 ----------------
+class Watcher:
+    def __init__(self,
+                 entries: List[Entry],
+                 store: RankHistoryStore,
+                 out_dir: str,
+                 client: HttpClient,
+                 cache=None,
+                 plot_opts: Optional[Dict[str, Any]] = None,
+                 base_url: Optional[str] = None,
+                 extractor: str = "auto",
+                 min_interval: float = 60.0,
+                 max_interval: float = 3600.0,
+                 backoff: float = 2.0,
+                 workers: int = 4,
+                 metrics_path: Optional[str] = None):
+        self.entries = entries
+        self.store = store
+        self.out_dir = out_dir
+        self.client = client
+        self.cache = cache
+        self.plot_opts = plot_opts or {}
+        self.base_url = base_url
+        self.extractor = extractor
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.workers = max(1, workers)
+        self.metrics_path = metrics_path
+        self.stop = threading.Event()
+        self.counters = {"refreshes": 0, "points_added": 0, "plots": 0, "matchups_written": 0, "errors": 0}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _session(self):
+        if self.cache is None:
+            return self.client
+        from sfbuff_cache import CachedSession
+        return CachedSession(self.client, self.cache)
+
+    # ---------------- 1人分の更新（ワーカースレッド） ----------------
+    def refresh(self, e: Entry) -> Dict[str, Any]:
+        """差分同期（＋任意で matchup）。描画はしない（メインスレッドで行う）。"""
+        added = sync_rank_history(self.store, e.player, e.character, date_from=e.date_from,
+                                  session=self._session(), extractor=self.extractor, base_url=self.base_url)
+        result: Dict[str, Any] = {"added": len(added), "matchup_rows": None}
+        if e.matchup:
+            result["matchup_rows"] = self._fetch_matchup(e)
+        return result
+
+    def _fetch_matchup(self, e: Entry) -> List[Dict[str, Any]]:
+        from sfbuff_matchup_chart import build_url, parse_page
+        url = build_url(e.player, character_id=e.character, date_from=e.date_from, base_url=self.base_url)
+        resp = self._session().get(url)
+        resp.raise_for_status()
+        rows, _ = parse_page(resp.text, merge=False, extractor=self.extractor)
+        return rows
+
+    # ---------------- 出力（メインスレッド） ----------------
+    def _base_name(self, e: Entry) -> str:
+        return os.path.splitext(os.path.basename(self.store.path(e.player, e.character)))[0]
+
+    def _render(self, e: Entry) -> Optional[str]:
+        from sfbuff_render_batch import render_one
+        out_path = os.path.join(self.out_dir, self._base_name(e) + ".png")
+        opts = {
+            "ma_windows": self.plot_opts.get("ma") or [],
+            "ema_windows": self.plot_opts.get("ema") or [],
+            "hide_raw": bool(self.plot_opts.get("hide_raw")),
+            "season_threshold": self.plot_opts.get("season_threshold", 40.0),
+            "generated_at_str": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "hide_xaxis": bool(self.plot_opts.get("hide_x")),
+        }
+        _, err, _ = render_one((self.store.path(e.player, e.character), out_path, opts))
+        return err
+
+    def _write_matchup(self, e: Entry, rows: List[Dict[str, Any]]) -> bool:
+        """行が前回と変わったときだけ書き直す。書いたら True。"""
+        blob = json.dumps(rows, ensure_ascii=False, sort_keys=True, default=row_json_default)
+        digest = hashlib.sha1(blob.encode("utf-8")).hexdigest()
+        path = os.path.join(self.out_dir, self._base_name(e) + "_matchup.json")
+        if e.matchup_digest is None and os.path.exists(path):
+            # 再起動直後は前回書いたファイルと比べる
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    prev = json.dumps(json.load(f), ensure_ascii=False, sort_keys=True)
+                e.matchup_digest = hashlib.sha1(prev.encode("utf-8")).hexdigest()
+            except (OSError, ValueError):
+                pass
+        if digest == e.matchup_digest:
+            return False
+        with stage("write", len(blob), len(rows)):
+            tmp = path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(rows, f, ensure_ascii=False, default=row_json_default)
+            os.replace(tmp, path)
+        e.matchup_digest = digest
+        return True
+
+    def _finish(self, e: Entry, result: Optional[Dict[str, Any]], error: Optional[str]) -> None:
+        """結果を反映して次回の予定を決める。"""
+        self.counters["refreshes"] += 1
+        e.last_refresh = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        e.error = error
+        changed = False
+        if error:
+            self.counters["errors"] += 1
+            print(f"[watch] {e.key}: {error}", file=sys.stderr)
+        else:
+            e.last_added = result["added"]
+            self.counters["points_added"] += e.last_added
+            if e.last_added:
+                changed = True
+                if self.plot_opts:
+                    err = self._render(e)
+                    if err:
+                        print(f"[watch] {e.key}: 描画に失敗しました: {err}", file=sys.stderr)
+                    else:
+                        self.counters["plots"] += 1
+            if result["matchup_rows"] is not None and self._write_matchup(e, result["matchup_rows"]):
+                self.counters["matchups_written"] += 1
+                changed = True
+            if e.last_added:
+                print(f"[watch] {e.key}: +{e.last_added} points", file=sys.stderr)
+
+        # 動きがあれば最短間隔に戻し、無ければ（失敗も含めて）延ばす
+        e.interval = self.min_interval if changed else min(self.max_interval, e.interval * self.backoff)
+        e.next_due = time.monotonic() + e.interval * random.uniform(0.9, 1.1)
+
+    def write_status(self) -> None:
+        status = {
+            "updated_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "counters": self.counters,
+            "http": self.client.stats(),
+            "players": {e.key: e.status() for e in self.entries},
+        }
+        if self.cache is not None:
+            status["cache"] = dict(self.cache.stats)
+        if PROFILER.enabled:
+            status["profile"] = PROFILER.report()
+        path = os.path.join(self.out_dir, "status.json")
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(status, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+        if self.metrics_path:
+            extra = {f"watch_{k}": v for k, v in self.counters.items()}
+            extra.update({f"http_{k}": v for k, v in status["http"].items() if v is not None})
+            PROFILER.write_prometheus(self.metrics_path, extra=extra)
+
+    # ---------------- スケジューラ ----------------
+    def run(self, once: bool = False) -> None:
+        """期限の来たエントリから最大 workers 人ずつ更新。once=True なら全員1回ずつで終了。"""
+        seq = itertools.count()
+        now = time.monotonic()
+        heap = [(now, next(seq), e) for e in self.entries]
+        heapq.heapify(heap)
+        with ThreadPoolExecutor(max_workers=self.workers) as ex:
+            running: Dict[Any, Entry] = {}
+            while not self.stop.is_set():
+                now = time.monotonic()
+                while heap and heap[0][0] <= now and len(running) < self.workers:
+                    _, _, e = heapq.heappop(heap)
+                    running[ex.submit(self.refresh, e)] = e
+                if not running and not heap:
+                    break
+
+                # 次の期限か 1 秒のどちらか早い方まで待つ（stop を見るため長くは寝ない）
+                timeout = min(1.0, max(0.0, heap[0][0] - now)) if heap else 1.0
+                if running:
+                    done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        e = running.pop(fut)
+                        try:
+                            self._finish(e, fut.result(), None)
+                        except Exception as ex_:
+                            self._finish(e, None, f"{type(ex_).__name__}: {ex_}")
+                        if not once:
+                            heapq.heappush(heap, (e.next_due, next(seq), e))
+                    if done:
+                        self.write_status()
+                else:
+                    self.stop.wait(timeout)
+        self.write_status()
+
+
+# ---------------- CLI ----------------
+def _cli():
+    ap = argparse.ArgumentParser(description="SFBuff 常駐モード（ロスターを定期的に最新化）")
+    ap.add_argument("roster", help="roster JSON のパス")
+    ap.add_argument("--store", required=True, help="Ranked History の保存先（sfbuff_rank_history.py --store と共通）")
+    ap.add_argument("--out-dir", required=True, help="PNG / matchup JSON / status.json の出力先")
+    ap.add_argument("--min-interval", type=float, default=60, help="活発なプレイヤーの更新間隔 秒（デフォルト:60）")
+    ap.add_argument("--max-interval", type=float, default=3600, help="更新間隔の上限 秒（デフォルト:3600）")
+    ap.add_argument("--backoff", type=float, default=2.0, help="新しい試合が無いときに間隔を延ばす倍率（デフォルト:2）")
+    ap.add_argument("--workers", type=int, default=4, help="同時に更新する人数（デフォルト:4）")
+    ap.add_argument("--once", action="store_true", help="全員を1回ずつ更新して終了")
+    ap.add_argument("--base-url", help="sfbuff.site の代わりに使うベースURL（ローカルの代替サーバ向け）")
+    ap.add_argument("--extractor", default="auto", choices=["auto", "fast", "bs4"],
+                    help="グラフデータの抽出方式（auto=高速スキャン→失敗時BeautifulSoup）")
+    add_http_args(ap)
+    ap.add_argument("--cache-dir", help="HTTPキャッシュの保存先（matchup の再検証に使う。指定時のみ有効）")
+    ap.add_argument("--cache-max-mb", type=float, default=256, help="キャッシュの上限サイズ MB（デフォルト:256）")
+    ap.add_argument("--cache-ttl", type=float, default=0, help="未確定期間の再検証間隔 秒（デフォルト:0=毎回再検証）")
+    ap.add_argument("--profile", action="store_true", help="段階ごとの所要時間・バイト数・行数を status.json に含める")
+    ap.add_argument("--metrics", help="同じ計測と counters を Prometheus のテキスト形式で書き出すパス（更新のたびに上書き）")
+
+    args = ap.parse_args()
+    if args.min_interval <= 0 or args.max_interval < args.min_interval:
+        ap.error("--min-interval は正、--max-interval は --min-interval 以上で指定してください")
+
+    entries, plot_opts = load_roster(args.roster, args.min_interval)
+    if not entries:
+        ap.error("roster にプレイヤーがいません")
+
+    cache = None
+    if args.cache_dir:
+        from sfbuff_cache import HttpCache
+        cache = HttpCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024), ttl=args.cache_ttl)
+
+    if args.profile or args.metrics:
+        PROFILER.enable()
+    client = client_from_args(args, pool_size=max(16, args.workers))
+    watcher = Watcher(entries, RankHistoryStore(args.store), args.out_dir, client, cache=cache,
+                      plot_opts=plot_opts, base_url=args.base_url, extractor=args.extractor,
+                      min_interval=args.min_interval, max_interval=args.max_interval,
+                      backoff=args.backoff, workers=args.workers, metrics_path=args.metrics)
+
+    def _stop(signum, frame):
+        print("[watch] 終了します…", file=sys.stderr)
+        watcher.stop.set()
+
+    signal.signal(signal.SIGINT, _stop)
+    signal.signal(signal.SIGTERM, _stop)
+
+    print(f"[watch] {len(entries)} players, interval {args.min_interval:g}s..{args.max_interval:g}s", file=sys.stderr)
+    watcher.run(once=args.once)
+    c = watcher.counters
+    print(f"[watch] refreshes={c['refreshes']} points_added={c['points_added']} plots={c['plots']} "
+          f"matchups_written={c['matchups_written']} errors={c['errors']}", file=sys.stderr)
+    print(format_http_stats(client.stats()), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    _cli()
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+
+"""sfbuff_cache: 閉じた期間の判定はサイト側（timezone cookie）の日付で行うこと。"""
+
+import os
+import sys
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sfbuff_cache import is_closed_window  # noqa: E402
+from sfbuff_core import site_today  # noqa: E402
+
+
+def _url(played_to):
+    return f"https://www.streetfighter.com/6/buckler/profile/1/play?played_from=2026-01-01&played_to={played_to}"
+
+
+class IsClosedWindowTest(unittest.TestCase):
+    def test_today_in_site_timezone_is_open(self):
+        # UTC+14 と UTC-12 では日付が1日以上ずれる。どちらでもそのゾーンの「今日」で閉じるかが決まる
+        for tz in ("Etc/GMT-14", "Asia/Tokyo", "Etc/GMT+12"):
+            today = site_today(tz)
+            self.assertFalse(is_closed_window(_url(today.isoformat()), tz=tz), tz)
+            self.assertTrue(is_closed_window(_url((today - timedelta(days=1)).isoformat()), tz=tz), tz)
+
+    def test_window_ending_today_anywhere_is_open_in_lagging_zone(self):
+        # 一番進んでいるゾーンの今日は、遅れているゾーンではまだ閉じていない
+        latest = site_today("Etc/GMT-14")
+        self.assertFalse(is_closed_window(_url(latest.isoformat()), tz="Etc/GMT+12"))
+
+    def test_no_played_to_is_open(self):
+        self.assertFalse(is_closed_window("https://www.streetfighter.com/6/buckler/profile/1/play", tz="Asia/Tokyo"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+"""sfbuff_http: Retry-After の解釈と、その秒数をそのまま待つこと。"""
+
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sfbuff_http import HttpClient  # noqa: E402
+
+
+class _Handler(BaseHTTPRequestHandler):
+    """最初の fail 回は 503 + Retry-After、その後は 200。"""
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.hits += 1
+            fail = server.hits <= server.fail
+        if fail:
+            self.send_response(503)
+            self.send_header("Retry-After", server.retry_after)
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+class RecordingClient(HttpClient):
+    """待つ代わりに待ち時間を記録する。"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.slept = []
+
+    def _sleep(self, delay):
+        self.slept.append(delay)
+
+
+class RetryAfterTest(unittest.TestCase):
+    def _serve(self, retry_after, fail=1):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        server.lock = threading.Lock()
+        server.hits = 0
+        server.fail = fail
+        server.retry_after = retry_after
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return f"http://127.0.0.1:{server.server_address[1]}/"
+
+    def test_fractional_seconds(self):
+        client = RecordingClient(retries=2)
+        resp = client.get(self._serve("0.5"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(client.slept, [0.5])
+
+    def test_negative_seconds_wait_zero(self):
+        client = RecordingClient(retries=2)
+        self.assertEqual(client.get(self._serve("-3")).status_code, 200)
+        self.assertEqual(client.slept, [0.0])
+
+    def test_not_capped_by_max_backoff(self):
+        client = RecordingClient(retries=2, max_backoff=1.0)
+        self.assertEqual(client.get(self._serve("120")).status_code, 200)
+        self.assertEqual(client.slept, [120.0])
+
+    def test_gives_up_over_max_retry_after(self):
+        client = RecordingClient(retries=2, max_retry_after=60.0)
+        resp = client.get(self._serve("120"))
+        self.assertEqual(resp.status_code, 503)
+        self.assertEqual(client.slept, [])
+        self.assertEqual(client.stats()["gave_up"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
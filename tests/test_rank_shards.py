@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""sfbuff_rank_shards: 系列（MR / LP）の決め方と、シャードを取得でき次第流すこと。"""
+
+import html
+import json
+import os
+import sys
+import threading
+import unittest
+import urllib.parse
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sfbuff_rank_shards import fetch_rank_history_sharded, iter_rank_shards, shard_windows  # noqa: E402
+
+DAY_MS = 86_400_000
+T0_MS = 1_735_657_200_000  # 2025-01-01 00:00 JST
+
+
+def _page(kind, points):
+    datasets = [{"label": kind, "yAxisID": kind.lower(), "data": points}] if kind else []
+    chart = {"type": "line", "data": {"datasets": datasets}}
+    return ('<div data-controller="chartjs" data-chartjs-data-value="'
+            f'{html.escape(json.dumps(chart))}"></div>')
+
+
+class _Resp:
+    def __init__(self, text):
+        self.text = text
+        self.content = text.encode("utf-8")
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    """played_from ごとに (系列, 点列) を返す。block に入れた played_from は gate が開くまで返さない。"""
+
+    def __init__(self, pages, block=(), gate=None):
+        self.pages = pages
+        self.block = set(block)
+        self.gate = gate or threading.Event()
+        self.requested = []
+        self.finished = []
+        self.lock = threading.Lock()
+
+    def get(self, url, timeout=None):
+        played_from = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query))["played_from"]
+        with self.lock:
+            self.requested.append(played_from)
+        if played_from in self.block:
+            self.gate.wait(3)
+        with self.lock:
+            self.finished.append(played_from)
+        kind, points = self.pages.get(played_from, (None, []))
+        return _Resp(_page(kind, points))
+
+
+def _points(day, n, rating):
+    return [{"x": T0_MS + day * DAY_MS + i * 600_000, "y": rating + i} for i in range(n)]
+
+
+class IterRankShardsTest(unittest.TestCase):
+    def setUp(self):
+        # 5日ずつ 4 シャード（2025-01-01 .. 2025-01-20）
+        self.windows = shard_windows("2025-01-01", "2025-01-20", 5)
+        self.assertEqual(len(self.windows), 4)
+
+    def _iter(self, session, workers=2):
+        return iter_rank_shards("1", 5, "2025-01-01", "2025-01-20", shard_days=5, workers=workers,
+                                session=session)
+
+    def test_lp_only_streams_before_later_shards_finish(self):
+        pages = {w[0]: ("LP", _points(5 * i, 3, 1000 * (i + 1))) for i, w in enumerate(self.windows)}
+        session = FakeSession(pages, block=[self.windows[2][0]])
+        shards = self._iter(session)
+
+        first = next(shards)
+        self.assertNotIn(self.windows[2][0], session.finished)  # 3番目のシャードはまだ返っていない
+        self.assertEqual([p["r"] for p in first], [1000, 1001, 1002])
+
+        session.gate.set()
+        rest = [p["r"] for points in shards for p in points]
+        self.assertEqual(rest, [2000, 2001, 2002, 3000, 3001, 3002, 4000, 4001, 4002])
+        # 最新のシャードで系列を決めたあとは取り直さない
+        self.assertEqual(session.requested.count(self.windows[-1][0]), 1)
+
+    def test_mr_in_latest_shard_drops_lp_shards(self):
+        pages = {
+            self.windows[0][0]: ("LP", _points(0, 2, 100)),
+            self.windows[1][0]: ("LP", _points(5, 2, 200)),
+            self.windows[2][0]: ("MR", _points(10, 2, 1500)),
+            self.windows[3][0]: ("MR", _points(15, 2, 1600)),
+        }
+        points = fetch_rank_history_sharded("1", 5, "2025-01-01", "2025-01-20", shard_days=5, workers=2,
+                                            session=FakeSession(pages))
+        self.assertEqual([p["r"] for p in points], [1500, 1501, 1600, 1601])
+
+    def test_empty_latest_shards_probe_backwards(self):
+        pages = {
+            self.windows[0][0]: ("LP", _points(0, 2, 100)),
+            self.windows[1][0]: ("LP", _points(5, 2, 200)),
+        }
+        points = fetch_rank_history_sharded("1", 5, "2025-01-01", "2025-01-20", shard_days=5, workers=1,
+                                            session=FakeSession(pages))
+        self.assertEqual([p["r"] for p in points], [100, 101, 200, 201])
+
+    def test_no_chart_raises(self):
+        with self.assertRaises(RuntimeError):
+            list(self._iter(FakeSession({})))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+
+"""sfbuff_server: 閉じた期間だけ無期限にキャッシュし、その判定はサイト側（HttpClient の tz）の日付で行うこと。"""
+
+import os
+import sys
+import unittest
+from datetime import timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from sfbuff_core import site_today  # noqa: E402
+from sfbuff_server import ApiService, LRUCache  # noqa: E402
+
+
+class _Client:
+    def __init__(self, tz):
+        self.tz = tz
+
+
+class RecordingCache(LRUCache):
+    def __init__(self):
+        super().__init__()
+        self.ttls = {}
+
+    def put(self, key, body, ttl):
+        self.ttls[key] = ttl
+        super().put(key, body, ttl)
+
+
+class CachedTtlTest(unittest.TestCase):
+    def _ttl(self, tz, date_to):
+        cache = RecordingCache()
+        service = ApiService(_Client(tz), ttl=60.0, cache=cache)
+        service._cached(("k",), date_to, lambda: [])
+        return cache.ttls[("k",)]
+
+    def test_today_in_site_timezone_keeps_ttl(self):
+        for tz in ("Etc/GMT-14", "Asia/Tokyo", "Etc/GMT+12"):
+            today = site_today(tz)
+            self.assertEqual(self._ttl(tz, today.isoformat()), 60.0, tz)
+            self.assertIsNone(self._ttl(tz, (today - timedelta(days=1)).isoformat()), tz)
+
+    def test_window_ending_today_anywhere_is_open_in_lagging_zone(self):
+        self.assertEqual(self._ttl("Etc/GMT+12", site_today("Etc/GMT-14").isoformat()), 60.0)
+
+    def test_no_to_keeps_ttl(self):
+        self.assertEqual(self._ttl("Asia/Tokyo", None), 60.0)
+
+
+if __name__ == "__main__":
+    unittest.main()